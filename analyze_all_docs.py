@@ -3,8 +3,24 @@
 import sys
 import os
 import argparse
-import subprocess
-from typing import List
+import asyncio
+import random
+import time
+from typing import Any, List, Optional
+
+from modules import metrics
+from modules.adoc_parser import parse_adoc_document
+from modules.llm_cache import ResponseCache, DEFAULT_CACHE_PATH
+from analyze_docs import (
+    DEFAULT_MODEL,
+    STUB_MODEL,
+    PROMPT_TEMPLATE,
+    create_model,
+    extract_section_content,
+    analyze_code_async,
+    update_documentation_section,
+    write_file_atomic,
+)
 
 def find_adoc_files(folder_path: str) -> List[str]:
     """Find all .adoc files in the given directory and its subdirectories"""
@@ -18,43 +34,115 @@ def find_adoc_files(folder_path: str) -> List[str]:
     
     return sorted(adoc_files)  # Sort for consistent ordering
 
-def analyze_file(file_path: str, header: str) -> bool:
-    """Run analyze_docs.py on a single file"""
-    print(f"\nAnalyzing: {file_path}")
-    
-    cmd = [
-        './analyze_docs.py',
-        file_path,
-        '--header', header
-    ]
-    
+def has_documentation(file_path: str, header: str) -> bool:
+    """Check whether the header section exists and holds no TODO placeholder"""
+    doc = parse_adoc_document(file_path, quiet=True)
+    for section in doc['sections']:
+        if section['title'] == header:
+            return 'TODO' not in section['content']
+    return False
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Detect rate-limit and overload responses from the model client"""
+    status = getattr(error, 'status_code', None)
+    if status in (429, 529):
+        return True
+    name = type(error).__name__
+    return 'RateLimit' in name or 'Overloaded' in name
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read a Retry-After header from the error's HTTP response, if any"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print(result.stdout)
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+async def analyze_with_backoff(model: Any, code_content: str, header: str,
+                               max_retries: int, base_delay: float) -> str:
+    """Call the model, backing off exponentially (with jitter) on rate limits"""
+    for attempt in range(max_retries + 1):
+        try:
+            return await analyze_code_async(code_content, header, model)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_retries:
+                raise
+            delay = _retry_after(e) or base_delay * 2 ** attempt
+            delay += random.uniform(0, delay / 2)
+            print(f"Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            await asyncio.sleep(delay)
+
+async def analyze_file(file_path: str, header: str, model: Any,
+                       semaphore: asyncio.Semaphore, max_retries: int = 5,
+                       base_delay: float = 2.0,
+                       cache: Optional[ResponseCache] = None,
+                       model_name: str = DEFAULT_MODEL) -> bool:
+    """Analyze a single file in-process and write the result back atomically
+
+    With a cache, code that was analyzed before (by the same model and
+    prompt) reuses the stored analysis without calling the model.
+    """
+    try:
+        with open(file_path, 'r') as f:
+            content = f.read()
+
+        code_content = extract_section_content(content, 'Code')
+        if not code_content:
+            print(f"Error analyzing {file_path}: Code section not found")
+            return False
+
+        analysis = cache.get(model_name, PROMPT_TEMPLATE, code_content) if cache else None
+        if analysis is None:
+            async with semaphore:
+                analysis = await analyze_with_backoff(model, code_content, header,
+                                                      max_retries, base_delay)
+            if cache:
+                cache.put(model_name, PROMPT_TEMPLATE, code_content, analysis)
+
+        updated_content = update_documentation_section(content, analysis, header)
+        write_file_atomic(file_path, updated_content)
+        print(f"Updated {file_path}")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error analyzing {file_path}:")
-        print(e.stderr)
+    except Exception as e:
+        print(f"Error analyzing {file_path}: {e}")
         return False
 
+async def analyze_files(adoc_files: List[str], header: str, model: Any,
+                        concurrency: int, max_retries: int = 5,
+                        cache: Optional[ResponseCache] = None,
+                        model_name: str = DEFAULT_MODEL) -> List[bool]:
+    """Analyze files with at most `concurrency` requests in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [analyze_file(file_path, header, model, semaphore, max_retries,
+                          cache=cache, model_name=model_name)
+             for file_path in adoc_files]
+    return await asyncio.gather(*tasks)
+
 def main():
-    parser = argparse.ArgumentParser(description='Run analyze_docs.py on all .adoc files')
+    parser = argparse.ArgumentParser(description='Generate documentation for all .adoc files')
     parser.add_argument('--docs-dir', required=True, help='Directory containing .adoc files')
     parser.add_argument('--header', default='Documentation', help='Header section to analyze (default: Documentation)')
     parser.add_argument('--anthropic-key', help='Anthropic API key')
     parser.add_argument('--skip-existing', action='store_true', help='Skip files that already have documentation')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help=f"Model name, or '{STUB_MODEL}' for offline runs (default: {DEFAULT_MODEL})")
+    parser.add_argument('--concurrency', type=int, default=8, help='Maximum concurrent model requests (default: 8)')
+    parser.add_argument('--max-retries', type=int, default=5, help='Retries per file on rate-limit responses (default: 5)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help=f'Response cache file (default: {DEFAULT_CACHE_PATH})')
+    parser.add_argument('--no-cache', action='store_true', help='Always call the model')
+    parser.add_argument('--cache-max-mb', type=float, default=256, help='Evict least recently used responses beyond this size (default: 256)')
+    parser.add_argument('--invalidate-model', metavar='MODEL', help='Drop cached responses of MODEL before running')
+    parser.add_argument('--metrics', metavar='PATH', help='Record LLM call latencies and write them to PATH on exit')
+    parser.add_argument('--metrics-format', choices=metrics.FORMATS, default='json', help='Format of the --metrics report (default: json)')
     
     args = parser.parse_args()
+    if args.metrics:
+        metrics.report_at_exit(args.metrics, args.metrics_format)
     
     # Handle API key
     if args.anthropic_key:
         os.environ["ANTHROPIC_API_KEY"] = args.anthropic_key
-    elif "ANTHROPIC_API_KEY" not in os.environ:
+    elif "ANTHROPIC_API_KEY" not in os.environ and args.model != STUB_MODEL:
         print(
             "Error: Anthropic API key not provided. Use --anthropic-key or set ANTHROPIC_API_KEY environment variable"
         )
@@ -65,30 +153,42 @@ def main():
     adoc_files = find_adoc_files(args.docs_dir)
     print(f"Found {len(adoc_files)} .adoc files")
     
-    # Process each file
-    success_count = 0
     failure_count = 0
     skipped_count = 0
     
+    pending = []
     for file_path in adoc_files:
         if args.skip_existing:
             # Quick check for existing documentation
             try:
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                    if f"== {args.header}" in content and "TODO" not in content:
-                        print(f"\nSkipping {file_path} - already has documentation")
-                        skipped_count += 1
-                        continue
+                if has_documentation(file_path, args.header):
+                    print(f"\nSkipping {file_path} - already has documentation")
+                    skipped_count += 1
+                    continue
             except Exception as e:
                 print(f"Error reading {file_path}: {e}")
                 failure_count += 1
                 continue
-        
-        if analyze_file(file_path, args.header):
-            success_count += 1
-        else:
-            failure_count += 1
+        pending.append(file_path)
+    
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache, int(args.cache_max_mb * 1024 * 1024))
+        if args.invalidate_model:
+            removed = cache.invalidate(args.invalidate_model)
+            print(f"Removed {removed} cached responses for {args.invalidate_model}")
+    
+    # One model (and HTTP client) shared by every request; retries on
+    # rate limits are handled here so they respect the concurrency bound
+    model = create_model(args.model, max_retries=0)
+    start = time.perf_counter()
+    results = asyncio.run(analyze_files(pending, args.header, model,
+                                        max(1, args.concurrency), args.max_retries,
+                                        cache=cache, model_name=args.model))
+    elapsed = time.perf_counter() - start
+    
+    success_count = sum(results)
+    failure_count += len(results) - success_count
     
     # Print summary
     print("\n=== Analysis Summary ===")
@@ -97,9 +197,13 @@ def main():
     print(f"Failed to analyze: {failure_count}")
     if args.skip_existing:
         print(f"Skipped (existing docs): {skipped_count}")
+    print(f"Elapsed: {elapsed:.1f}s")
+    if cache:
+        cache.print_stats()
+        cache.close()
     
     if failure_count > 0:
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,44 @@
 #!/usr/bin/env python3
 import sys
 import argparse
-from typing import List, Tuple, Optional
-from langchain_anthropic import ChatAnthropic
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
+import asyncio
+import time
+from typing import Any, List, Tuple, Optional
 import os
+import tempfile
+
+from modules import metrics
+from modules.llm_cache import ResponseCache, DEFAULT_CACHE_PATH
+
+DEFAULT_MODEL = "claude-3-sonnet-20240229"
+STUB_MODEL = "stub"
+
+PROMPT_TEMPLATE = """You are analyzing code to generate documentation.
+    Please analyze the following code section of a project and provide a clear, concise documentation. It may include as needed:
+    1. Overview of what the code does
+    2. Arguments and inputs
+    3. Usage examples
+    4. Key functions and their purposes
+    5. Implementation details
+    6. Any notable patterns or algorithms used
+    7. Imports and project related files
+    8. Dependencies and requirements
+
+    DOCUMENTATION PRINCIPLES:
+    - Document ONLY what is explicitly present in the provided code
+    - Focus exclusively on observable functionality and implementation
+    - Make NO assumptions about external modules not defined in the code
+    - Avoid speculative language like "likely part of" or "probably connects to"
+    - If an import is used but not defined in the provided code, simply document the import name without speculation about its implementation
+    - When referencing imported modules, state only their observed usage without assumptions about their internal workings
+
+    Format your response in proper AsciiDoc format. Make the documentation technical but clear, concise, and accessible.
+    The user will start with the header to insert at, followed by the code. Do not include the header in your response, and only use level three headings (===) or lower.
+    The purpose is to provide concise, semantically closed information about this specific code section.
+
+    Code to analyze:
+    {content}
+    """
 
 
 def parse_section_path(path: str) -> List[str]:
@@ -59,46 +91,83 @@ def extract_section_content(file_content: str, section_name: str) -> Optional[st
     return "\n".join(content).strip()
 
 
-def analyze_code(content: str, header_name: str) -> str:
-    """Use Langchain with Claude to analyze the code content"""
-    model = ChatAnthropic(
-        model_name="claude-3-sonnet-20240229",
+class StubRateLimitError(Exception):
+    """Raised by StubModel to simulate a rate-limit response"""
+
+
+class StubModel:
+    """Offline stand-in for the chat model
+
+    Returns a short deterministic analysis after an optional delay, and can
+    fail every Nth call with a rate-limit error to exercise retries.
+    """
+
+    def __init__(self, delay: float = 0.0, rate_limit_every: int = 0):
+        self.delay = delay
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+
+    def _respond(self, prompt: str) -> str:
+        self.calls += 1
+        if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+            raise StubRateLimitError("429 rate limited (stub)")
+        code = prompt.split("Code to analyze:", 1)[-1].strip()
+        return (
+            "=== Overview\n\n"
+            f"Stub analysis of {len(code.splitlines())} lines of code."
+        )
+
+    def invoke(self, prompt: str) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt: str) -> str:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._respond(prompt)
+
+
+def create_model(model_name: str = DEFAULT_MODEL, max_retries: int = 3) -> Any:
+    """Create the chat model once so its HTTP clients can be reused
+
+    "stub" returns a StubModel that needs neither langchain nor an API key.
+    """
+    if model_name == STUB_MODEL:
+        return StubModel()
+
+    from langchain_anthropic import ChatAnthropic
+
+    return ChatAnthropic(
+        model_name=model_name,
         api_key=os.environ["ANTHROPIC_API_KEY"],
         max_tokens=1024,
         timeout=None,
-        max_retries=3,
+        max_retries=max_retries,
     )
 
-    template = """You are analyzing code to generate documentation.
-    Please analyze the following code section of a project and provide a clear, concise documentation. It may include as needed:
-    1. Overview of what the code does
-    2. Arguments and inputs
-    3. Usage examples
-    4. Key functions and their purposes
-    5. Implementation details
-    6. Any notable patterns or algorithms used
-    7. Imports and project related files
-    8. Dependencies and requirements
 
-    DOCUMENTATION PRINCIPLES:
-    - Document ONLY what is explicitly present in the provided code
-    - Focus exclusively on observable functionality and implementation
-    - Make NO assumptions about external modules not defined in the code
-    - Avoid speculative language like "likely part of" or "probably connects to"
-    - If an import is used but not defined in the provided code, simply document the import name without speculation about its implementation
-    - When referencing imported modules, state only their observed usage without assumptions about their internal workings
+def build_prompt(content: str) -> str:
+    """Fill the documentation prompt with the code to analyze"""
+    return PROMPT_TEMPLATE.format(content=content)
 
-    Format your response in proper AsciiDoc format. Make the documentation technical but clear, concise, and accessible.
-    The user will start with the header to insert at, followed by the code. Do not include the header in your response, and only use level three headings (===) or lower.
-    The purpose is to provide concise, semantically closed information about this specific code section.
 
-    Code to analyze:
-    {content}
-    """
-    prompt = ChatPromptTemplate.from_template(template)
-    user_input = f"== {header_name}\n{content}"
-    chain = {"content": RunnablePassthrough()} | prompt | model | StrOutputParser()
-    return chain.invoke({"content": content})
+def _response_text(response: Any) -> str:
+    """Return the text of a chat message (or a plain string)"""
+    return response if isinstance(response, str) else response.content
+
+
+def analyze_code(content: str, header_name: str, model: Any = None) -> str:
+    """Use Langchain with Claude to analyze the code content"""
+    model = model or create_model()
+    with metrics.call("llm"):
+        return _response_text(model.invoke(build_prompt(content)))
+
+
+async def analyze_code_async(content: str, header_name: str, model: Any) -> str:
+    """Async variant of analyze_code sharing one model across requests"""
+    with metrics.call("llm"):
+        return _response_text(await model.ainvoke(build_prompt(content)))
 
 
 def update_documentation_section(file_content: str, analysis: str, header: str) -> str:
@@ -128,6 +197,21 @@ def update_documentation_section(file_content: str, analysis: str, header: str)
     return "\n".join(new_lines)
 
 
+def write_file_atomic(file_path: str, content: str) -> None:
+    """Write a file via a temporary file and rename, so readers never see it half-written"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        if os.path.exists(file_path):
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Analyze code section and update documentation in AsciiDoc files"
@@ -136,13 +220,24 @@ def main():
     parser.add_argument("--anthropic-key", help="Anthropic API key")
     parser.add_argument("--header", help="Header name to insert the documentation at")
     parser.add_argument("--from-section", help="Section path to extract code from")
+    parser.add_argument(
+        "--model",
+        default=DEFAULT_MODEL,
+        help=f"Model name, or '{STUB_MODEL}' for offline runs (default: {DEFAULT_MODEL})",
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help=f"Response cache file (default: {DEFAULT_CACHE_PATH})",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Always call the model")
 
     args = parser.parse_args()
 
     # Set API key
     if args.anthropic_key:
         os.environ["ANTHROPIC_API_KEY"] = args.anthropic_key
-    elif "ANTHROPIC_API_KEY" not in os.environ:
+    elif "ANTHROPIC_API_KEY" not in os.environ and args.model != STUB_MODEL:
         print(
             "Error: Anthropic API key not provided. Use --anthropic-key or set ANTHROPIC_API_KEY environment variable"
         )
@@ -161,11 +256,20 @@ def main():
             print(f"Error: Code section not found in the file")
             sys.exit(1)
 
-        print(f"Found code section with {len(code_content.split('\n'))} lines")
+        print(f"Found code section with {len(code_content.splitlines())} lines")
 
         # Generate analysis of the code
         print("Analyzing code...")
-        analysis = analyze_code(code_content, args.header or "Code")
+        cache = None if args.no_cache else ResponseCache(args.cache)
+        analysis = cache and cache.get(args.model, PROMPT_TEMPLATE, code_content)
+        if analysis:
+            print("Using cached analysis")
+        else:
+            analysis = analyze_code(
+                code_content, args.header or "Code", create_model(args.model)
+            )
+            if cache:
+                cache.put(args.model, PROMPT_TEMPLATE, code_content, analysis)
         # print("Analysis:\n")
         # print(analysis)
 
@@ -176,8 +280,7 @@ def main():
         )
 
         # Write back to the file
-        with open(args.file, "w") as f:
-            f.write(updated_content)
+        write_file_atomic(args.file, updated_content)
         print("================New File====================")
         print(updated_content)
 
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+
+"""
+bench_pipeline.py - Time each stage of the AsciiDoc to Nostr pipeline
+
+Generates synthetic documents of increasing size and times every stage on
+its own: parsing, metadata extraction, section organization, signing,
+verification, NIP-19 encoding and publishing to an in-process relay.
+Reports throughput, peak traced memory and how each stage scales with
+section count, and saves the results as JSON so runs on different commits
+can be compared.
+
+Usage:
+  python -m benchmarks.bench_pipeline [--sections 10 100 1000] [options]
+  python -m benchmarks.bench_pipeline --compare benchmarks/results/<old>.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.corpus import write_corpus
+from modules.adoc_parser import parse_adoc_file
+from modules.event_creator import create_event
+from modules.event_encoder import encode_event_id
+from modules.event_publisher import publish_event, publish_events
+from modules.event_verifier import verify_event
+from modules.relay_simulator import RelaySimulator
+from nip62_converter import content_event_template, extract_metadata, organize_sections
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# A stage this much slower than the baseline counts as a regression
+DEFAULT_THRESHOLD = 0.10
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(RESULTS_DIR),
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def measure(
+    func: Callable,
+    items,
+    repeat: int,
+    setup: Optional[Callable] = None,
+):
+    """Time func (median of repeat runs), then trace one more run's memory
+
+    The pipeline's own progress output is discarded while measuring.
+
+    Args:
+        items: Items processed, or a function of the result that counts them
+
+    Returns:
+        (result of the last run, stage stats)
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = statistics.median(timings)
+    if callable(items):
+        items = items(result)
+    return result, {
+        "seconds": seconds,
+        "items": items,
+        "per_second": items / seconds if seconds else 0.0,
+        "peak_bytes": peak,
+    }
+
+
+def run_pipeline(path: str, relay: RelaySimulator, key: str, repeat: int) -> Dict:
+    """Run every stage once per repeat on one document"""
+    stages = {}
+
+    parsed, stages["parse_adoc_file"] = measure(
+        lambda: parse_adoc_file(path), lambda doc: len(doc["sections"]), repeat
+    )
+    sections = parsed["sections"]
+    _, stages["extract_metadata"] = measure(
+        lambda: extract_metadata(path), len(sections), repeat
+    )
+    organized, stages["organize_sections"] = measure(
+        lambda: organize_sections(parsed["title"], sections), len(sections), repeat
+    )
+
+    templates = [
+        content_event_template(section["content"], section["title"], l1["title"])
+        for l1 in organized
+        for section in l1["l2_sections"]
+    ]
+    events, stages["create_event"] = measure(
+        lambda: [
+            create_event(t["kind"], t["content"], t["tags"], key, decrypt=False)
+            for t in templates
+        ],
+        len(templates),
+        repeat,
+    )
+    _, stages["verify_event"] = measure(
+        lambda: [verify_event(event) for event in events], len(events), repeat
+    )
+    _, stages["encode_event_id"] = measure(
+        lambda: [encode_event_id(event, [relay.url]) for event in events],
+        len(events),
+        repeat,
+    )
+    # Each publish stage starts from an empty relay
+    _, stages["publish_event"] = measure(
+        lambda: [publish_event(event, [relay.url]) for event in events],
+        len(events),
+        repeat,
+        setup=relay.clear,
+    )
+    _, stages["publish_events"] = measure(
+        lambda: publish_events(events, [relay.url]),
+        len(events),
+        repeat,
+        setup=relay.clear,
+    )
+    return stages
+
+
+def scaling_exponents(runs: List[Dict]) -> Dict[str, float]:
+    """Least-squares slope of log(seconds) over log(sections) per stage
+
+    About 1 is linear; clearly above 1 means the stage grows faster than
+    the document.
+    """
+    exponents = {}
+    for stage in runs[0]["stages"]:
+        points = [
+            (math.log(run["sections"]), math.log(run["stages"][stage]["seconds"]))
+            for run in runs
+            if run["sections"] and run["stages"][stage]["seconds"] > 0
+        ]
+        if len(points) < 2:
+            continue
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        variance = sum((x - mean_x) ** 2 for x, _ in points)
+        if variance:
+            covariance = sum((x - mean_x) * (y - mean_y) for x, y in points)
+            exponents[stage] = covariance / variance
+    return exponents
+
+
+def print_report(results: Dict) -> None:
+    for run in results["runs"]:
+        print(
+            f"\n{run['sections']} sections, {run['file_bytes'] / 1024:.0f} KiB "
+            f"({run['events']} events):"
+        )
+        print(f"  {'stage':<20}{'seconds':>10}{'items/s':>12}{'peak KiB':>11}")
+        for stage, stats in run["stages"].items():
+            print(
+                f"  {stage:<20}{stats['seconds']:>10.4f}"
+                f"{stats['per_second']:>12.1f}{stats['peak_bytes'] / 1024:>11.1f}"
+            )
+    if results["scaling"]:
+        print("\nScaling exponent (1.0 = linear in section count):")
+        for stage, exponent in results["scaling"].items():
+            print(f"  {stage:<20}{exponent:>6.2f}")
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Stages slower than the baseline by more than threshold"""
+    regressions = []
+    old_runs = {run["sections"]: run for run in baseline["runs"]}
+    for run in results["runs"]:
+        old = old_runs.get(run["sections"])
+        if old is None:
+            continue
+        for stage, stats in run["stages"].items():
+            old_stats = old["stages"].get(stage)
+            if not old_stats or not old_stats["seconds"]:
+                continue
+            change = stats["seconds"] / old_stats["seconds"] - 1
+            if change > threshold:
+                regressions.append(
+                    f"{stage} at {run['sections']} sections: "
+                    f"{old_stats['seconds']:.4f}s -> {stats['seconds']:.4f}s "
+                    f"(+{change:.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark each stage of the AsciiDoc to Nostr pipeline"
+    )
+    parser.add_argument(
+        "--sections",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="Document sizes to run, in sections (default: 10 100 1000)",
+    )
+    parser.add_argument("--depth", type=int, default=2, help="Heading levels")
+    parser.add_argument(
+        "--body-size", type=int, default=2000, help="Characters per section"
+    )
+    parser.add_argument("--listings", type=int, default=1, help="Listings/section")
+    parser.add_argument("--images", type=int, default=1, help="Images per section")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per stage (median is kept)"
+    )
+    parser.add_argument(
+        "--output", help="JSON results path (default: benchmarks/results/<commit>.json)"
+    )
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Slowdown reported as a regression (default: {DEFAULT_THRESHOLD})",
+    )
+    args = parser.parse_args()
+
+    if args.compare and not os.path.exists(args.compare):
+        print(f"Error: Baseline not found: {args.compare}")
+        sys.exit(1)
+
+    key = os.urandom(32).hex()
+    params = {
+        "depth": args.depth,
+        "body_size": args.body_size,
+        "listings": args.listings,
+        "images": args.images,
+        "seed": args.seed,
+    }
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": dict(params, repeat=args.repeat),
+        "runs": [],
+    }
+
+    relay = RelaySimulator(verify=False).start_in_thread()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for sections in args.sections:
+                path = os.path.join(tmp, f"corpus-{sections}.adoc")
+                file_bytes = write_corpus(path, sections=sections, **params)
+                print(f"Benchmarking {sections} sections ({file_bytes} bytes)...")
+                stages = run_pipeline(path, relay, key, args.repeat)
+                results["runs"].append(
+                    {
+                        "sections": sections,
+                        "file_bytes": file_bytes,
+                        "events": stages["create_event"]["items"],
+                        "stages": stages,
+                    }
+                )
+    finally:
+        relay.stop_thread()
+
+    results["scaling"] = scaling_exponents(results["runs"])
+    print_report(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions against {baseline.get('commit') or args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {baseline.get('commit') or args.compare}")
+
+
+if __name__ == "__main__":
+    main()
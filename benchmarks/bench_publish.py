@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+"""
+bench_publish.py - Load-test the publish and delete paths against a local relay
+
+Signs a batch of section events up front, then times each path against
+the in-process relay simulator: publish_event (one call per event), the
+batched publish_events pipeline, publishing kind 1987 embeddings, and
+delete_events streaming those sections into NIP-09 deletion requests.
+Latency, rate limits, size limits and dropped messages can be injected to
+see how retries behave.
+
+Usage:
+  python -m benchmarks.bench_publish [--events 5000] [--latency 0.02] [options]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from delete_events import delete_events_async
+from modules.event_creator import create_events
+from modules.event_embedder import embedding_template
+from modules.event_publisher import publish_event, publish_events_async
+from modules.event_signer import get_public_key
+from modules.relay_pool import RelayPool
+from modules.relay_simulator import RelaySimulator
+from modules.vector_codec import ENCODINGS, INT8
+
+SECTION_KIND = 30041
+
+
+def section_templates(count: int, body_size: int) -> List[Dict]:
+    body = ("relay event signature section index " * (body_size // 36 + 1))[:body_size]
+    return [
+        {
+            "kind": SECTION_KIND,
+            "content": f"{i} {body}",
+            "tags": [["d", f"bench-section-{i}"], ["title", f"Section {i}"]],
+        }
+        for i in range(count)
+    ]
+
+
+def timed(func: Callable):
+    """Run func with its progress output discarded; returns (result, seconds)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
+
+
+def publish_batch(
+    url: str, events: List[Dict], timeout: float, max_retries: int, delay: float
+) -> Dict:
+    async def run():
+        async with RelayPool([url], timeout=timeout) as pool:
+            return await publish_events_async(pool, events, max_retries, delay)
+
+    return asyncio.run(run())
+
+
+def report(name: str, count: int, seconds: float, accepted: int, relay) -> Dict:
+    rate = count / seconds if seconds else 0.0
+    print(
+        f"  {name:<16}{count:>7} events {seconds:>8.3f}s {rate:>10.1f}/s "
+        f"accepted {accepted}"
+    )
+    return {
+        "events": count,
+        "seconds": seconds,
+        "per_second": rate,
+        "accepted": accepted,
+        "relay": dict(relay.stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test publishing and deletion against a local relay"
+    )
+    parser.add_argument("--events", type=int, default=2000, help="Events per path")
+    parser.add_argument(
+        "--single",
+        type=int,
+        default=200,
+        help="Events sent through publish_event one call at a time (default: 200)",
+    )
+    parser.add_argument(
+        "--body-size", type=int, default=1000, help="Characters per section"
+    )
+    parser.add_argument(
+        "--dimensions", type=int, default=384, help="Embedding dimensions"
+    )
+    parser.add_argument(
+        "--encoding", choices=ENCODINGS, default=INT8, help="Embedding encoding"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=50, help="Events per deletion request"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=5.0, help="Seconds to wait for an OK"
+    )
+    parser.add_argument("--max-retries", type=int, default=3, help="Publish attempts")
+    parser.add_argument(
+        "--delay", type=float, default=0.5, help="Base seconds of the retry backoff"
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Reply latency")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latency jitter")
+    parser.add_argument(
+        "--max-message-bytes", type=int, default=0, help="Relay message size limit"
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Relay EVENTs/s per connection"
+    )
+    parser.add_argument("--burst", type=int, default=0, help="Rate limit burst")
+    parser.add_argument(
+        "--drop-rate", type=float, default=0.0, help="Fraction of messages dropped"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Have the relay check signatures (shares the CPU with the client)",
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.single > args.events:
+        print("Error: --single cannot exceed --events")
+        sys.exit(1)
+
+    key = os.urandom(32).hex()
+    pubkey = get_public_key(key)
+    relay = RelaySimulator(
+        verify=args.verify,
+        latency=args.latency,
+        jitter=args.jitter,
+        max_message_bytes=args.max_message_bytes,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    ).start_in_thread()
+
+    print(f"Signing {args.events} section events...")
+    sections, seconds = timed(
+        lambda: create_events(
+            section_templates(args.events, args.body_size), key, decrypt=False
+        )
+    )
+    print(f"Signed in {seconds:.2f}s ({args.events / seconds:.0f}/s)")
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.events, args.dimensions), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    embeddings, seconds = timed(
+        lambda: create_events(
+            [
+                embedding_template(section, vector, relay.url, "bench", args.encoding)
+                for section, vector in zip(sections, vectors)
+            ],
+            key,
+            decrypt=False,
+        )
+    )
+    print(f"Signed {len(embeddings)} embeddings in {seconds:.2f}s")
+
+    results = {"params": vars(args), "paths": {}}
+    paths = results["paths"]
+    print(f"\nPublishing to {relay.url}:")
+    try:
+        relay.clear()
+        single = sections[: args.single]
+        outcomes, seconds = timed(
+            lambda: [
+                publish_event(event, [relay.url], args.max_retries, args.delay)
+                for event in single
+            ]
+        )
+        paths["publish_event"] = report(
+            "publish_event", len(single), seconds, sum(outcomes), relay
+        )
+
+        relay.clear()
+        outcomes, seconds = timed(
+            lambda: publish_batch(
+                relay.url, sections, args.timeout, args.max_retries, args.delay
+            )
+        )
+        accepted = sum(1 for r in outcomes.values() if r[relay.url][0])
+        paths["publish_events"] = report(
+            "publish_events", len(sections), seconds, accepted, relay
+        )
+
+        outcomes, seconds = timed(
+            lambda: publish_batch(
+                relay.url, embeddings, args.timeout, args.max_retries, args.delay
+            )
+        )
+        accepted = sum(1 for r in outcomes.values() if r[relay.url][0])
+        paths["embeddings"] = report(
+            "embeddings", len(embeddings), seconds, accepted, relay
+        )
+
+        stored = sum(1 for e in relay.events.values() if e["kind"] == SECTION_KIND)
+        (found, published, failed), seconds = timed(
+            lambda: asyncio.run(
+                delete_events_async(
+                    relay.url,
+                    SECTION_KIND,
+                    pubkey,
+                    key,
+                    batch_size=args.batch_size,
+                )
+            )
+        )
+        remaining = sum(1 for e in relay.events.values() if e["kind"] == SECTION_KIND)
+        paths["delete_events"] = report(
+            "delete_events", found, seconds, stored - remaining, relay
+        )
+        paths["delete_events"].update(
+            {"requests": published, "failed_requests": failed, "remaining": remaining}
+        )
+    finally:
+        relay.stop_thread()
+
+    print(f"\nRelay: {json.dumps(relay.stats)}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+corpus.py - Generate synthetic AsciiDoc documents for benchmarking
+
+Documents have a title, a metadata preamble and a configurable number of
+sections nested up to a given depth, each with a body of roughly the
+requested size, listing blocks (containing heading-like lines that must
+not be parsed as sections) and images. The same parameters and seed
+always produce the same document.
+
+Usage:
+  python -m benchmarks.corpus --sections 500 --output corpus.adoc [options]
+"""
+
+import argparse
+import random
+from typing import List
+
+WORDS = (
+    "relay event signature section index publication nostr document "
+    "chapter reference metadata content kind author tag coordinate "
+    "protocol client message filter subscription verify hash key"
+).split()
+
+
+def _paragraph(rng: random.Random, size: int) -> str:
+    words: List[str] = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+
+def _listing(rng: random.Random, index: int) -> str:
+    lines = [f"def handler_{index}(event):"]
+    lines += [f"    {rng.choice(WORDS)} = event[{n}]" for n in range(rng.randint(3, 8))]
+    # Looks like a heading, but is inside a listing block
+    lines.append("== not a section")
+    return "[source,python]\n----\n" + "\n".join(lines) + "\n----"
+
+
+def generate_adoc(
+    sections: int = 100,
+    depth: int = 2,
+    body_size: int = 2000,
+    listings: int = 1,
+    images: int = 1,
+    seed: int = 0,
+) -> str:
+    """Build a synthetic AsciiDoc document
+
+    Args:
+        sections: Number of section headings below the title
+        depth: Heading levels used below the title (1 = only "==")
+        body_size: Approximate characters of prose per section
+        listings: Listing blocks per section
+        images: Images per section
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    lines = [
+        f"= Benchmark Document {seed}",
+        "image::https://example.com/cover.jpg[]",
+        ":author: Benchmark Author",
+        ":tags: benchmark, synthetic, corpus",
+        ":published: 2024-01-01",
+        ":language: en",
+        "",
+        _paragraph(rng, 200),
+        "",
+    ]
+
+    level = 2
+    for index in range(sections):
+        if index:
+            level = rng.randint(2, min(level + 1, depth + 1))
+        lines.append(f"{'=' * level} Section {index + 1}")
+        lines.append("")
+        remaining = body_size
+        paragraph_count = max(1, body_size // 500)
+        for paragraph in range(paragraph_count):
+            lines.append(_paragraph(rng, remaining // (paragraph_count - paragraph)))
+            lines.append("")
+            remaining -= remaining // (paragraph_count - paragraph)
+            if paragraph < listings:
+                lines.append(_listing(rng, index))
+                lines.append("")
+        for extra in range(paragraph_count, listings):
+            lines.append(_listing(rng, index))
+            lines.append("")
+        for image in range(images):
+            lines.append(f"image::https://example.com/img/{index}-{image}.png[]")
+            lines.append("")
+
+    return "\n".join(lines)
+
+
+def write_corpus(path: str, **params) -> int:
+    """Write a generated document to path; returns its size in bytes"""
+    document = generate_adoc(**params).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(document)
+    return len(document)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic AsciiDoc file")
+    parser.add_argument("--output", required=True, help="Output .adoc path")
+    parser.add_argument("--sections", type=int, default=100, help="Section count")
+    parser.add_argument("--depth", type=int, default=2, help="Heading levels")
+    parser.add_argument(
+        "--body-size", type=int, default=2000, help="Characters per section"
+    )
+    parser.add_argument("--listings", type=int, default=1, help="Listings/section")
+    parser.add_argument("--images", type=int, default=1, help="Images per section")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    size = write_corpus(
+        args.output,
+        sections=args.sections,
+        depth=args.depth,
+        body_size=args.body_size,
+        listings=args.listings,
+        images=args.images,
+        seed=args.seed,
+    )
+    print(f"Wrote {args.output} ({args.sections} sections, {size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,33 @@
 import sys
 import argparse
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional, Tuple
 
 from nip62_converter import (
     create_event,
+    create_events,
     verify_event,
     create_section_tags,
     create_index_tags,
     add_reference_to_index,
     print_event_summary,
     encode_event_id,
-    publish_event,
+    publish_events,
     read_encrypted_key,
 )
-from modules.adoc_parser import parse_adoc_file
+from modules import metrics, profiler
+from modules.adoc_parser import parse_adoc_document
+from modules.event_bundle import (
+    bundle_header,
+    dependency_order,
+    save_bundle,
+    write_bundle,
+)
+from modules.event_publisher import publish_succeeded
+from modules.event_verifier import verify_events
+from modules.publish_journal import PublishJournal, publish_journaled
 
 
 def find_top_doc(folder_path: str, top_file: Optional[str]) -> Optional[str]:
@@ -27,33 +40,84 @@ def find_top_doc(folder_path: str, top_file: Optional[str]) -> Optional[str]:
     return top_path if os.path.exists(top_path) else None
 
 
-def parse_docs_folder(folder_path: str, top_file: Optional[str]) -> List[Dict]:
-    """Parse all .adoc files, preserving paths for naming"""
-    docs = []
-
+def _parse_doc(job: Tuple[str, str, bool]) -> Dict:
+    """Parse one file (runs in a worker process when parsing in parallel)"""
+    full_path, rel_path, is_top = job
+    start = time.perf_counter()
+    try:
+        doc = parse_adoc_document(full_path, quiet=True)
+        error = None
+    except Exception as e:
+        doc, error = {}, str(e)
+    return {
+        "content": doc.get("content", ""),
+        "file_path": full_path,
+        "rel_path": rel_path,
+        "sections": doc.get("sections", []),
+        "is_top": is_top,
+        "error": error,
+        "parse_time": time.perf_counter() - start,
+    }
+
+
+def _resolve_workers(workers: int) -> int:
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def parse_docs_folder(
+    folder_path: str, top_file: Optional[str], workers: int = 1
+) -> List[Dict]:
+    """Parse all .adoc files, preserving paths for naming
+
+    Files are returned sorted by relative path, so serial and parallel runs
+    produce the same documents in the same order.
+
+    Args:
+        workers: Parser processes; 1 parses serially, 0 uses every CPU
+    """
+    jobs = []
     for root, _, files in os.walk(folder_path):
         for file in files:
             if file.endswith(".adoc"):
                 full_path = os.path.join(root, file)
                 rel_path = os.path.relpath(full_path, folder_path)
-                try:
-                    doc = parse_adoc_file(full_path)
-                    # Store full document details
-                    docs.append(
-                        {
-                            "content": doc.get("content", ""),
-                            "file_path": full_path,
-                            "rel_path": rel_path,
-                            "sections": doc.get("sections", []),
-                            "is_top": bool(top_file and file == top_file),
-                        }
-                    )
-                except Exception as e:
-                    print(f"Warning: Failed to parse {full_path}: {e}")
+                jobs.append((full_path, rel_path, bool(top_file and file == top_file)))
+    jobs.sort(key=lambda job: job[1])
+
+    workers = min(_resolve_workers(workers), len(jobs)) if jobs else 1
+    if workers > 1:
+        chunk_size = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_doc, jobs, chunksize=chunk_size))
+    else:
+        parsed = [_parse_doc(job) for job in jobs]
 
+    docs = []
+    for doc in parsed:
+        if doc["error"] is not None:
+            print(f"Warning: Failed to parse {doc['file_path']}: {doc['error']}")
+        else:
+            docs.append(doc)
     return docs
 
 
+def print_parse_timings(docs: List[Dict], elapsed: float, slowest: int = 5) -> None:
+    """Summarize per-file parse times"""
+    if not docs:
+        return
+    times = sorted(docs, key=lambda doc: doc["parse_time"], reverse=True)
+    total = sum(doc["parse_time"] for doc in docs)
+    print(f"Parsed {len(docs)} files in {elapsed:.2f}s (parse time {total:.2f}s)")
+    print(
+        f"Per file: mean {total / len(docs) * 1000:.1f}ms, "
+        f"median {times[len(times) // 2]['parse_time'] * 1000:.1f}ms, "
+        f"max {times[0]['parse_time'] * 1000:.1f}ms"
+    )
+    print("Slowest files:")
+    for doc in times[:slowest]:
+        print(f"  {doc['parse_time'] * 1000:8.1f}ms  {doc['rel_path']}")
+
+
 def get_event_name(project_name: str, rel_path: str) -> str:
     """Create event name from project and relative path"""
     # Remove .adoc extension
@@ -72,9 +136,10 @@ def get_event_name(project_name: str, rel_path: str) -> str:
         return f"{project_name}-{parts[0]}-{parts[-1]}"
 
 
-def create_content_event(
-    doc: Dict, project_name: str, key: str, author: Optional[str] = None
+def content_event_template(
+    doc: Dict, project_name: str, author: Optional[str] = None
 ) -> Dict:
+    """Build the unsigned 30041 event for a document"""
     # Get event name from path
     event_name = get_event_name(project_name, doc["rel_path"])
     filename = os.path.basename(doc["file_path"])
@@ -99,17 +164,60 @@ def create_content_event(
     if author:
         tags.append(["author", author])
 
-    event = create_event(30041, "\n".join(content).strip(), tags, key)
-    if verify_event(event):
-        print(f"Created 30041 for {event_name}")
-        return {
-            "event": event,
-            "title": event_name,
-            "d_tag": next(tag[1] for tag in tags if tag[0] == "d"),
-        }
+    return {
+        "kind": 30041,
+        "content": "\n".join(content).strip(),
+        "tags": tags,
+        "title": event_name,
+    }
+
+
+def create_content_events(
+    docs: List[Dict],
+    project_name: str,
+    key: str,
+    author: Optional[str] = None,
+    workers: int = 1,
+) -> List[Dict]:
+    """Create and verify 30041 events for a list of documents in one batch
+
+    Templates are built in-process (joining section text is cheaper than
+    shipping documents to workers). With more than one worker, signing and
+    verification share one process pool; results keep the order of docs.
+    """
+    templates = [content_event_template(doc, project_name, author) for doc in docs]
+
+    workers = min(_resolve_workers(workers), len(docs)) if docs else 1
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            events = create_events(templates, key, workers=workers, executor=pool)
+            checks = verify_events(events, workers=workers, executor=pool)
     else:
-        print(f"Failed to verify event for {event_name}")
-        sys.exit(1)
+        events = create_events(templates, key, workers=workers)
+        checks = verify_events(events, workers=workers)
+
+    results = []
+    for template, event, check in zip(templates, events, checks):
+        event_name = template["title"]
+        if check["valid"]:
+            print(f"Created 30041 for {event_name}")
+            results.append(
+                {
+                    "event": event,
+                    "title": event_name,
+                    "d_tag": next(tag[1] for tag in event["tags"] if tag[0] == "d"),
+                }
+            )
+        else:
+            print(f"Failed to verify event for {event_name}")
+            sys.exit(1)
+    return results
+
+
+def create_content_event(
+    doc: Dict, project_name: str, key: str, author: Optional[str] = None
+) -> Dict:
+    return create_content_events([doc], project_name, key, author, workers=1)[0]
 
 
 def main():
@@ -125,8 +233,57 @@ def main():
         "--top-file",
         help="Optional: Name of the top-level documentation file (indluding .adoc extension) to process first from the root docs directory",
     )
+    parser.add_argument(
+        "--verify-mode",
+        choices=["ok", "req"],
+        default="req",
+        help="Publish confirmation: relay OK only, or OK plus one batched REQ "
+        "per relay that re-sends missing events (default: req)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes for parsing, building and signing (0 = all CPUs, default: 1)",
+    )
+    parser.add_argument(
+        "--journal",
+        help="Record publish outcomes to this journal so a failed or "
+        "interrupted publish can be finished with resume_publish.py",
+    )
+    parser.add_argument(
+        "--build-bundle",
+        metavar="PATH",
+        help="Sign the events and write them to a JSONL bundle ('-' for stdout) "
+        "instead of publishing; publish it later with publish_bundle.py",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="Record per-stage timings, call latencies, event sizes and relay "
+        "results, and write them to PATH on exit",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=metrics.FORMATS,
+        default="json",
+        help="Format of the --metrics report (default: json)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Profile each pipeline stage separately and write pstats files, "
+        "a speedscope flame graph and CPU/blocked time totals to DIR",
+    )
 
     args = parser.parse_args()
+    if args.build_bundle == "-":
+        # The bundle owns stdout; progress output goes to stderr
+        bundle_out, sys.stdout = sys.stdout, sys.stderr
+    if args.metrics:
+        metrics.report_at_exit(args.metrics, args.metrics_format)
+    if args.profile:
+        profiler.profile_at_exit(args.profile)
 
     # Determine project name
     if args.project:
@@ -152,7 +309,10 @@ def main():
 
     # Parse all docs
     print(f"\nScanning docs folder: {args.docs_dir}")
-    docs = parse_docs_folder(args.docs_dir, args.top_file)
+    parse_start = time.perf_counter()
+    with metrics.stage("parse_folder"):
+        docs = parse_docs_folder(args.docs_dir, args.top_file, args.workers)
+    print_parse_timings(docs, time.perf_counter() - parse_start)
 
     if not docs:
         print("Error: No .adoc files found!")
@@ -163,18 +323,26 @@ def main():
     all_references = []
 
     # Process docs in order: top doc (if exists) -> other docs
+    top_doc = None
     if args.top_file:
         top_doc = next((doc for doc in docs if doc.get("is_top")), None)
-        if top_doc:
-            top_event = create_content_event(top_doc, project_name, key, args.author)
-            all_events.append(("Top Content", top_event))
-            all_references.append(top_event)
-            print(f"Created top event: {top_event['title']}")
+    other_docs = [doc for doc in docs if not doc.get("is_top")]
+
+    # Sign every document in one batch
+    ordered_docs = ([top_doc] if top_doc else []) + other_docs
+    with metrics.stage("build"):
+        content_events = create_content_events(
+            ordered_docs, project_name, key, args.author, args.workers
+        )
+
+    if top_doc:
+        top_event = content_events.pop(0)
+        all_events.append(("Top Content", top_event))
+        all_references.append(top_event)
+        print(f"Created top event: {top_event['title']}")
 
     # Process all remaining docs
-    other_docs = [doc for doc in docs if not doc.get("is_top")]
-    for doc in other_docs:
-        event = create_content_event(doc, project_name, key, args.author)
+    for event in content_events:
         all_events.append(("Content", event))
         all_references.append(event)
 
@@ -198,6 +366,16 @@ def main():
         print("Failed to verify root index!")
         sys.exit(1)
 
+    if args.build_bundle:
+        events = dependency_order([event["event"] for _, event in all_events])
+        header = bundle_header(events, args.docs_dir, args.relays)
+        if args.build_bundle == "-":
+            count = write_bundle(bundle_out, header, events)
+        else:
+            count = save_bundle(args.build_bundle, header, events)
+        print(f"\nWrote {count} signed events to {args.build_bundle}")
+        return
+
     # Print summary
     print("\n=== Events Summary ===")
     for event_type, event in all_events:
@@ -211,12 +389,24 @@ def main():
 
     # Publish events in order: main -> others -> root
     print(f"\nPublishing events to relays: {', '.join(args.relays)}")
-    all_success = True
+    if args.journal:
+        journal = PublishJournal(args.journal)
+        journal.begin(
+            [event["event"] for _, event in all_events], args.relays, args.docs_dir
+        )
+        results = publish_journaled(journal, verify=args.verify_mode == "req")
+        journal.close()
+    else:
+        results = publish_events(
+            [event["event"] for _, event in all_events],
+            args.relays,
+            verify=args.verify_mode == "req",
+        )
 
+    all_success = True
     for event_type, event in all_events:
-        print(f"\nPublishing {event_type}...")
-        if not publish_event(event["event"], args.relays):
-            print(f"Failed to publish {event_type}!")
+        if not publish_succeeded(results[event["event"]["id"]]):
+            print(f"Failed to publish {event_type} {event['title']}!")
             all_success = False
 
     if all_success:
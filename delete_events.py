@@ -1,20 +1,36 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
 import json
-import subprocess
 import sys
 import os
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 
 # Import the modules from your existing codebase
 try:
+    from modules import metrics, profiler
     from modules.key_utils import read_encrypted_key
-    from modules.event_creator import create_event, decrypt_key
+    from modules.event_creator import create_event, create_events, decrypt_key
     from modules.event_verifier import verify_event
-    from modules.event_publisher import publish_event
-    from modules.event_utils import print_event_summary
+    from modules.event_publisher import publish_events_async, publish_succeeded
+    from modules.event_fetcher import (
+        DEFAULT_CHUNK_SIZE,
+        DEFAULT_PAGE_SIZE,
+        PaginationError,
+        event_coordinate,
+        fetch_references_async,
+        parse_a_tag,
+        parse_coordinate,
+        stream_events_paginated,
+        sync_to_store,
+    )
+    from modules.event_store import EventStore
+    from modules.event_publisher import publish_events
+    from modules.nip19 import decode
+    from modules.relay_pool import RelayPool
     from modules.event_encoder import encode_event_id
+    from modules.event_signer import get_public_key
 except ImportError:
     print("Error: Required modules not found.")
     print(
@@ -22,78 +38,73 @@ except ImportError:
     )
     sys.exit(1)
 
-
-def fetch_events_by_kind(
-    kind: int, relay: str, limit: int = 0, since: int = 0
-) -> List[Dict[str, Any]]:
-    """Fetch events of a specific kind from a relay.
+INDEX_KIND = 30040
+TRACEBACK_KIND = 30043
+EMBEDDING_KIND = 1987
+# Stay well under common relay message limits (strfry defaults to 128 KiB)
+DEFAULT_MAX_EVENT_BYTES = 65536
+# Serialized size of a deletion event without its tags and content
+_DELETION_OVERHEAD = 400
+
+
+async def stream_user_events(
+    pool: RelayPool,
+    kind: int,
+    pubkey: str,
+    since: int = 0,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    store: Optional[EventStore] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream all events of a kind by one author, newest first.
+
+    The authors filter is applied by the relay and results are paged
+    backward with until cursors until the relay has nothing older. With a
+    store, the relay is only asked for events newer than the last sync and
+    the events are then read back from the store.
 
     Args:
+        pool: Open relay pool
         kind: Event kind to fetch
-        relay: Relay URL to fetch from
-        limit: Maximum number of events to fetch (0 for all)
+        pubkey: Author whose events to fetch
         since: Unix timestamp, fetch events newer than this
-
-    Returns:
-        List of event dictionaries
+        page_size: Events requested per page
+        store: Optional local event store
     """
-    try:
-        cmd = ["nak", "req", "-k", str(kind)]
-        if limit > 0:
-            cmd.extend(["-l", str(limit)])
-        if since > 0:
-            cmd.extend(["-s", str(since)])
-        cmd.append(relay)
-
-        process = subprocess.run(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-
-        if process.returncode != 0:
-            raise Exception(f"Failed to fetch events: {process.stderr}")
-
-        # Parse JSON output
-        events = []
-        output_lines = process.stdout.strip().split("\n")
-
-        for line in output_lines:
-            if not line or line.startswith("connecting") or line.startswith("ok."):
-                continue
-
-            try:
-                event = json.loads(line)
-                events.append(event)
-            except json.JSONDecodeError:
-                print(f"Warning: Could not parse JSON: {line}")
-
-        return events
-    except Exception as e:
-        print(f"Error fetching events: {e}")
-        sys.exit(1)
+    query_filter = {"kinds": [kind], "authors": [pubkey]}
+    if store is not None:
+        with metrics.stage("fetch"):
+            new = await sync_to_store(pool, store, query_filter, page_size)
+        print(f"Debug: {new} new events of kind {kind} in the store")
+        events = store.iter_events([kind], [pubkey], since=since or None)
+        for event in events:
+            yield event
+        return
+
+    if since > 0:
+        query_filter["since"] = since
+    async for event in stream_events_paginated(pool, query_filter, page_size):
+        # Relays that ignore the authors filter must not get us to
+        # request deletions for someone else's events
+        if event.get("pubkey") == pubkey:
+            yield event
 
 
 def get_pubkey(key: str) -> str:
     """Get public key from private key."""
     try:
-        process = subprocess.run(
-            ["nak", "key", "public", key],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        if process.returncode != 0:
-            raise Exception(f"Failed to get pubkey: {process.stderr}")
-        return process.stdout.strip()
+        return get_public_key(key)
     except Exception as e:
         print(f"Error getting pubkey: {e}")
         sys.exit(1)
 
 
-def filter_events_by_pubkey(
-    events: List[Dict[str, Any]], pubkey: str
-) -> List[Dict[str, Any]]:
-    """Filter events to only include those from the specified pubkey."""
-    return [event for event in events if event.get("pubkey") == pubkey]
+def deletion_tags(refs: List[Tuple[List[str], int]]) -> List[List[str]]:
+    """Tags for a deletion request: the e/a references, then one k tag per kind"""
+    tags = [tag for tag, _ in refs]
+    # Add k tags for the kinds being deleted (per NIP-09)
+    for kind in dict.fromkeys(kind for _, kind in refs):
+        tags.append(["k", str(kind)])
+    return tags
 
 
 def create_deletion_request(
@@ -101,23 +112,260 @@ def create_deletion_request(
 ) -> Dict[str, Any]:
     """Create a NIP-09 deletion request for the specified events."""
     # Create tags for each event ID
-    tags = [["e", event_id] for event_id in event_ids]
-
-    # Add k tag for the kind being deleted (per NIP-09)
-    tags.append(["k", str(kind)])
+    tags = deletion_tags([(["e", event_id], kind) for event_id in event_ids])
 
     # Create the event
     event = create_event(5, reason, tags, key)
 
     # Verify it
     if verify_event(event):
-        print(f"Created deletion event: {event['id']}")
+        print(f"Created deletion event: {event['id']} ({len(event_ids)} events)")
         return event
     else:
         print("Failed to verify deletion event!")
         sys.exit(1)
 
 
+def batch_deletion_refs(
+    refs: List[Tuple[List[str], int]],
+    max_refs: int,
+    max_bytes: int = DEFAULT_MAX_EVENT_BYTES,
+    reason: str = "",
+) -> List[List[Tuple[List[str], int]]]:
+    """Split references into deletion requests that fit relay size limits"""
+    base_size = _DELETION_OVERHEAD + len(json.dumps(reason))
+    batches, current, kinds, size = [], [], set(), base_size
+    for tag, kind in refs:
+        added = len(json.dumps(tag)) + 1
+        if kind not in kinds:
+            added += len(json.dumps(["k", str(kind)])) + 1
+        if current and (len(current) >= max_refs or size + added > max_bytes):
+            batches.append(current)
+            current, kinds, size = [], set(), base_size
+            added = len(json.dumps(tag)) + len(json.dumps(["k", str(kind)])) + 2
+        current.append((tag, kind))
+        kinds.add(kind)
+        size += added
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def collect_publication_refs(
+    pool: RelayPool,
+    root_coordinate: str,
+    pubkey: str,
+    store: Optional[EventStore] = None,
+) -> List[Tuple[List[str], int]]:
+    """Walk a publication's index tree and list everything to delete.
+
+    Addressable events are referenced by coordinate, which covers every
+    version of them. Tracebacks and embeddings that point at the tree are
+    referenced by id. Dependents come first and the root index last, so a
+    partly failed run can be repeated from the same naddr.
+
+    Returns:
+        (tag, kind) pairs in deletion order
+    """
+    indexes, sections, section_ids = [], [], set()
+    seen = {root_coordinate}
+    pending = [root_coordinate]
+    while pending:
+        events, missing = await fetch_references_async(
+            pool,
+            [{"coordinate": coordinate, "id": ""} for coordinate in pending],
+            store=store,
+        )
+        for ref in missing:
+            print(f"Warning: Index {ref['coordinate']} not found")
+        pending = []
+        for index_event in events:
+            indexes.append(event_coordinate(index_event))
+            for tag in index_event["tags"]:
+                if tag[0] != "a" or len(tag) < 2 or tag[1] in seen:
+                    continue
+                ref = parse_a_tag(tag)
+                seen.add(ref["coordinate"])
+                kind, author, _ = parse_coordinate(ref["coordinate"])
+                if author != pubkey:
+                    print(f"Skipping {ref['coordinate']}: not signed by your key")
+                elif kind == INDEX_KIND:
+                    pending.append(ref["coordinate"])
+                else:
+                    sections.append(ref["coordinate"])
+                    if ref["id"]:
+                        section_ids.add(ref["id"])
+
+    # Tracebacks and embeddings pointing at any coordinate in the tree, plus
+    # embeddings that only carry the section's event id
+    dependents = {}
+    coordinates = sections + indexes
+    dependent_filters = [
+        {"kinds": [TRACEBACK_KIND, EMBEDDING_KIND], "authors": [pubkey], "#a": chunk}
+        for chunk in _chunks(coordinates)
+    ] + [
+        {"kinds": [EMBEDDING_KIND], "authors": [pubkey], "#e": chunk}
+        for chunk in _chunks(sorted(section_ids))
+    ]
+    for query_filter in dependent_filters:
+        async for event in stream_events_paginated(pool, query_filter):
+            dependents[event["id"]] = event["kind"]
+
+    refs = [(["e", event_id], kind) for event_id, kind in dependents.items()]
+    refs += [
+        (["a", coordinate], parse_coordinate(coordinate)[0]) for coordinate in sections
+    ]
+    refs += [(["a", coordinate], INDEX_KIND) for coordinate in reversed(indexes)]
+    return refs
+
+
+def _chunks(values: List[str], size: int = DEFAULT_CHUNK_SIZE) -> List[List[str]]:
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+def cascade_delete(
+    naddr: str,
+    relay: str,
+    pubkey: str,
+    key: str,
+    reason: str = "",
+    batch_size: int = 50,
+    max_bytes: int = DEFAULT_MAX_EVENT_BYTES,
+    dry_run: bool = False,
+    store: Optional[EventStore] = None,
+) -> None:
+    """Delete a publication, its whole index tree and its dependents"""
+    try:
+        decoded = decode(naddr)
+    except ValueError as e:
+        print(f"Error decoding naddr: {e}")
+        sys.exit(1)
+    if "identifier" not in decoded:
+        print("Error: --naddr must be an naddr")
+        sys.exit(1)
+    if decoded["pubkey"] != pubkey:
+        print("Error: The publication is not signed by your key")
+        sys.exit(1)
+    root = f"{decoded['kind']}:{decoded['pubkey']}:{decoded['identifier']}"
+
+    async def collect():
+        async with RelayPool([relay]) as pool:
+            return await collect_publication_refs(pool, root, pubkey, store)
+
+    print(f"\nWalking publication {root}...")
+    try:
+        with metrics.stage("fetch"):
+            refs = asyncio.run(collect())
+    except PaginationError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    coordinates = sum(1 for tag, _ in refs if tag[0] == "a")
+    print(
+        f"Found {coordinates} addressable events and "
+        f"{len(refs) - coordinates} dependent events"
+    )
+
+    batches = batch_deletion_refs(refs, batch_size, max_bytes, reason)
+    if dry_run:
+        print("\nReferences that would be deleted (dry run):")
+        for i, (tag, kind) in enumerate(refs, 1):
+            print(f"{i}. kind {kind}: {tag[0]} {tag[1]}")
+        print(f"\n{len(batches)} deletion request(s)")
+        sys.exit(0)
+
+    confirmation = input(
+        f"\nWill delete {len(refs)} references in {len(batches)} request(s). "
+        "Continue? (y/N): "
+    )
+    if confirmation.lower() != "y":
+        print("Operation cancelled.")
+        sys.exit(0)
+
+    templates = [
+        {"kind": 5, "content": reason, "tags": deletion_tags(batch)}
+        for batch in batches
+    ]
+    deletion_events = create_events(templates, key)
+    results = publish_events(deletion_events, [relay])
+    failed = 0
+    for event, batch in zip(deletion_events, batches):
+        if not publish_succeeded(results[event["id"]]):
+            failed += 1
+        elif store is not None:
+            store.remove([tag[1] for tag, _ in batch if tag[0] == "e"])
+            store.remove_coordinates([tag[1] for tag, _ in batch if tag[0] == "a"])
+    if failed:
+        print(f"\n{failed} of {len(deletion_events)} deletion request(s) failed.")
+    else:
+        print(f"\nPublished {len(deletion_events)} deletion request(s)")
+
+
+async def delete_events_async(
+    relay: str,
+    kind: int,
+    pubkey: str,
+    key: str,
+    reason: str = "",
+    since: int = 0,
+    limit: int = 0,
+    batch_size: int = 50,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    dry_run: bool = False,
+    store: Optional[EventStore] = None,
+) -> Tuple[int, int, int]:
+    """Stream events into deletion batches, publishing each as it fills.
+
+    At most one batch of ids and one page of events are held at a time.
+
+    Returns:
+        (events found, deletion requests published, deletion requests failed)
+    """
+    found = published = failed = 0
+    batch: List[str] = []
+    last_deletion = None
+
+    async def flush(pool: RelayPool) -> None:
+        nonlocal published, failed, last_deletion
+        deletion_event = create_deletion_request(batch, kind, reason, key)
+        results = await publish_events_async(pool, [deletion_event])
+        if publish_succeeded(results[deletion_event["id"]]):
+            published += 1
+            last_deletion = deletion_event
+            if store is not None:
+                store.remove(batch)
+        else:
+            print(f"Failed to publish deletion request {deletion_event['id']}")
+            failed += 1
+        print(f"Deleted {found} events so far ({published} request(s))")
+        batch.clear()
+
+    async with RelayPool([relay]) as pool:
+        async for event in stream_user_events(
+            pool, kind, pubkey, since, page_size, store
+        ):
+            found += 1
+            if dry_run:
+                content = event.get("content", "")
+                content_preview = content[:50] + ("..." if len(content) > 50 else "")
+                print(
+                    f"{found}. ID: {event['id']}, Created: {event.get('created_at', 'unknown')}, "
+                    f"Content: {content_preview}"
+                )
+            else:
+                batch.append(event["id"])
+                if len(batch) >= batch_size:
+                    await flush(pool)
+            if limit and found >= limit:
+                break
+        if batch:
+            await flush(pool)
+
+    if last_deletion:
+        nevent = encode_event_id(last_deletion, [relay], note_format=True)
+        print(f"Last deletion event ID: {nevent}")
+    return found, published, failed
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Delete all events of a specific kind from a relay"
@@ -128,9 +376,18 @@ def main():
     parser.add_argument(
         "--relay", required=True, help="Relay URL to delete events from"
     )
-    parser.add_argument("--kind", required=True, type=int, help="Event kind to delete")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--kind", type=int, help="Event kind to delete")
+    target.add_argument(
+        "--naddr",
+        help="Delete this publication: its index tree by coordinate, "
+        "plus traceback and embedding events that reference it",
+    )
     parser.add_argument(
-        "--limit", type=int, default=100, help="Maximum number of events to fetch"
+        "--limit",
+        type=int,
+        default=0,
+        help="Maximum number of events to delete (default: 0, all of them)",
     )
     parser.add_argument(
         "--since", type=int, default=0, help="Delete events newer than this timestamp"
@@ -145,11 +402,37 @@ def main():
         default=50,
         help="Maximum number of events to delete in a single request",
     )
+    parser.add_argument(
+        "--max-event-bytes",
+        type=int,
+        default=DEFAULT_MAX_EVENT_BYTES,
+        help="Size limit for each deletion request, for relay message limits "
+        f"(default: {DEFAULT_MAX_EVENT_BYTES})",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help=f"Events fetched per REQ page (default: {DEFAULT_PAGE_SIZE})",
+    )
+    parser.add_argument(
+        "--store",
+        help="Local event store (SQLite file); only events newer than the "
+        "last run are fetched from the relay",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Profile each pipeline stage separately and write pstats files, "
+        "a speedscope flame graph and CPU/blocked time totals to DIR",
+    )
 
     args = parser.parse_args()
+    if args.profile:
+        profiler.profile_at_exit(args.profile)
 
     print(f"\nStarting event deletion process...")
-    print(f"Target kind: {args.kind}")
+    print(f"Target: {args.naddr or f'kind {args.kind}'}")
     print(f"Relay: {args.relay}")
 
     # Read the private key
@@ -161,79 +444,68 @@ def main():
     pubkey = get_pubkey(key)
     print(f"Using pubkey: {pubkey}")
 
-    # Fetch events
-    print(f"\nFetching events of kind {args.kind} from {args.relay}...")
-    events = fetch_events_by_kind(args.kind, args.relay, args.limit, args.since)
-    print(f"Found {len(events)} events of kind {args.kind}")
-
-    # Filter events by pubkey
-    user_events = filter_events_by_pubkey(events, pubkey)
-    print(f"Found {len(user_events)} events created by your pubkey")
-
-    if len(user_events) == 0:
-        print("No events to delete. Exiting.")
-        sys.exit(0)
-
-    # Sort events by created_at (newest first)
-    user_events.sort(key=lambda e: e.get("created_at", 0), reverse=True)
+    store = EventStore(args.store) if args.store else None
+
+    if args.naddr:
+        cascade_delete(
+            args.naddr,
+            args.relay,
+            pubkey,
+            key,
+            reason=args.reason,
+            batch_size=args.batch_size,
+            max_bytes=args.max_event_bytes,
+            dry_run=args.dry_run,
+            store=store,
+        )
+        return
 
-    # In dry-run mode, just show events and exit
     if args.dry_run:
         print("\nEvents that would be deleted (dry run):")
-        for i, event in enumerate(user_events, 1):
-            created_at = event.get("created_at", "unknown")
-            content_preview = event.get("content", "")[:50] + (
-                "..." if len(event.get("content", "")) > 50 else ""
-            )
-            print(
-                f"{i}. ID: {event['id']}, Created: {created_at}, Content: {content_preview}"
-            )
-        sys.exit(0)
-
-    # Process events in batches to avoid large deletion requests
-    event_ids = [event["id"] for event in user_events]
-    batches = [
-        event_ids[i : i + args.batch_size]
-        for i in range(0, len(event_ids), args.batch_size)
-    ]
+    else:
+        # Events are deleted as they stream in, so confirm up front
+        scope = f"up to {args.limit}" if args.limit else "all"
+        confirmation = input(
+            f"\nWill delete {scope} events of kind {args.kind} by {pubkey} "
+            f"from {args.relay}. Continue? (y/N): "
+        )
+        if confirmation.lower() != "y":
+            print("Operation cancelled.")
+            sys.exit(0)
 
-    print(f"\nWill process {len(batches)} batch(es) of events")
+    print(f"\nFetching events of kind {args.kind} from {args.relay}...")
+    try:
+        found, published, failed = asyncio.run(
+            delete_events_async(
+                args.relay,
+                args.kind,
+                pubkey,
+                key,
+                reason=args.reason,
+                since=args.since,
+                limit=args.limit,
+                batch_size=args.batch_size,
+                page_size=args.page_size,
+                dry_run=args.dry_run,
+                store=store,
+            )
+        )
+    except PaginationError as e:
+        # Events stream into deletion batches, so some may be gone already
+        print(f"Error: {e}")
+        print(
+            f"Not every event of kind {args.kind} was found; "
+            "run again to delete the rest"
+        )
+        sys.exit(1)
 
-    # Confirm deletion
-    confirmation = input(
-        f"\nWill delete {len(event_ids)} events of kind {args.kind}. Continue? (y/N): "
-    )
-    if confirmation.lower() != "y":
-        print("Operation cancelled.")
+    print(f"\nFound {found} events of kind {args.kind} created by your pubkey")
+    if args.dry_run or found == 0:
         sys.exit(0)
-
-    # Process each batch
-    for i, batch in enumerate(batches, 1):
-        print(f"\nProcessing batch {i}/{len(batches)} ({len(batch)} events)...")
-
-        # Create deletion event for this batch
-        deletion_event = create_deletion_request(batch, args.kind, args.reason, key)
-
-        # Print event summary
-        print("\nDeletion event details:")
-        print_event_summary(deletion_event)
-
-        # Publish event
-        print(f"Publishing deletion request to {args.relay}...")
-        if publish_event(deletion_event, [args.relay]):
-            print(f"Successfully published deletion request for batch {i}")
-        else:
-            print(f"Failed to publish deletion request for batch {i}")
-            if (
-                len(batches) > 1
-                and input("Continue with next batch? (y/N): ").lower() != "y"
-            ):
-                print("Operation cancelled.")
-                sys.exit(1)
+    if failed:
+        print(f"\n{failed} of {published + failed} deletion request(s) failed.")
 
     print("\nEvent deletion process complete!")
-    nevent = encode_event_id(deletion_event, [args.relay], note_format=True)
-    print(f"Deletion event ID: {nevent}")
 
 
 if __name__ == "__main__":
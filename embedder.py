@@ -12,96 +12,90 @@ Usage:
 """
 
 import argparse
-import json
 import sys
 import os
-import subprocess
-import random
-import time
 from typing import List, Dict, Any, Tuple, Optional
 
 # Try to import required modules
 try:
+    from modules import metrics, profiler
     from modules.key_utils import read_encrypted_key
-    from modules.event_creator import create_event, create_a_tag
+    from modules.event_creator import (
+        create_event,
+        create_a_tag,
+        get_signer_pubkey,
+    )
     from modules.event_verifier import verify_event
     from modules.event_encoder import encode_event_id
-    from modules.event_publisher import publish_event
+    from modules.event_publisher import publish_events, publish_succeeded
     from modules.event_utils import print_event_summary, create_traceback_event
     from modules.nak_utils import nak_decode
+    from modules.nip19 import encode_nevent
+    from modules.event_fetcher import (
+        PaginationError,
+        fetch_event,
+        fetch_references,
+        parse_a_tag,
+        sync_store,
+    )
+    from modules.event_store import EventStore
     from modules.key_utils import read_encrypted_key
-    from modules.event_embedder import create_embedding_event
+    from modules.event_embedder import (
+        DEFAULT_BATCH_SIZE,
+        EMBEDDING_KIND,
+        create_embedding_events,
+        embedded_section_ids,
+    )
+    from modules.vector_codec import ENCODINGS
 except ImportError:
     print(
         "Warning: Some modules could not be imported. Using built-in implementations."
     )
 
 
-def extract_vector_embedding(text: str, dimensions: int = 1536) -> str:
-    """
-    Generate a vector embedding for the given text.
-
-    In a real implementation, this would use a proper embedding model.
-    This example generates random values as placeholders.
-
-    Args:
-        text: The text content to embed
-        dimensions: The number of dimensions for the embedding vector
-
-    Returns:
-        A comma-separated string of embedding values
-    """
-    # Generate normalized random values for the embedding
-    # In production, you would use a proper embedding model (OpenAI, HuggingFace, etc.)
-    values = [str(random.uniform(-0.01, 0.01)) for _ in range(dimensions)]
-
-    return ",".join(values)
-
-
-def fetch_publication(event_id: str, relay: str) -> Dict:
+def fetch_publication(
+    event_id: str, relay: str, store: Optional[EventStore] = None
+) -> Dict:
     """
     Fetch a publication event (kind 30040) from a relay.
 
     Args:
         event_id: The event ID, nevent, or naddr code
         relay: The relay URL
+        store: Optional local event store
 
     Returns:
         The publication event
     """
+    coordinate = None
+
     # Decode NIP-19 identifiers if needed
     if event_id.startswith(("nevent", "note", "naddr")):
         try:
-            process = subprocess.run(
-                ["nak", "decode", event_id],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True,
-            )
-            decoded = json.loads(process.stdout.strip())
-            if "id" in decoded:
-                event_id = decoded["id"]
-        except subprocess.CalledProcessError as e:
-            print(f"Error decoding event ID: {e.stderr}")
+            decoded = nak_decode(event_id)
+        except ValueError as e:
+            print(f"Error decoding event ID: {e}")
             sys.exit(1)
+        if "identifier" in decoded:
+            coordinate = (
+                f"{decoded['kind']}:{decoded['pubkey']}:{decoded['identifier']}"
+            )
+            event_id = None
+        else:
+            event_id = decoded["id"]
 
-    # Fetch the event using nak
     try:
-        process = subprocess.run(
-            ["nak", "req", "-i", event_id, relay],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
+        # Only events with a valid id and signature come back
+        event = fetch_event(
+            [relay], event_id=event_id, coordinate=coordinate, store=store
         )
-
-        event = json.loads(process.stdout.strip())
+        if event is None:
+            raise ValueError(f"Event {event_id or coordinate} not found on {relay}")
 
         # Verify it's a publication event
         if event.get("kind") != 30040:
             raise ValueError(
-                f"Event {event_id} is not a publication event (kind 30040)"
+                f"Event {event['id']} is not a publication event (kind 30040)"
             )
 
         return event
@@ -110,7 +104,7 @@ def fetch_publication(event_id: str, relay: str) -> Dict:
         sys.exit(1)
 
 
-def extract_section_refs(pub_event: Dict) -> List[str]:
+def extract_section_refs(pub_event: Dict) -> List[Dict]:
     """
     Extract section references from a publication event's 'a' tags.
 
@@ -118,51 +112,42 @@ def extract_section_refs(pub_event: Dict) -> List[str]:
         pub_event: The publication event
 
     Returns:
-        List of section event IDs
+        List of references (coordinate, relay hint and event id, which may
+        be empty) in 'a' tag order
     """
     section_refs = []
 
     for tag in pub_event.get("tags", []):
         if tag[0] == "a" and len(tag) >= 2:
             # Format: ["a", "<kind:pubkey:dtag>", "<relay>", "<event id>"]
-            if len(tag) >= 4 and tag[3]:
-                section_refs.append(tag[3])
-            else:
-                print(f"Section reference without direct event ID: {tag}")
+            section_refs.append(parse_a_tag(tag))
 
     return section_refs
 
 
-def fetch_section_events(section_ids: List[str], relay: str) -> List[Dict]:
+def fetch_section_events(
+    section_refs: List[Dict], relay: str, store: Optional[EventStore] = None
+) -> List[Dict]:
     """
-    Fetch section events by their IDs.
+    Fetch section events in bulk, in the order of their references.
+
+    References with an event id are fetched by id; the rest are resolved by
+    their kind:pubkey:d-tag coordinate.
 
     Args:
-        section_ids: List of section event IDs
+        section_refs: References from extract_section_refs
         relay: The relay URL
+        store: Optional local event store; only what it lacks is fetched
 
     Returns:
         List of section events
     """
-    section_events = []
-
-    for section_id in section_ids:
-        try:
-            process = subprocess.run(
-                ["nak", "req", "-i", section_id, relay],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True,
-            )
-
-            section_event = json.loads(process.stdout.strip())
-            section_events.append(section_event)
+    section_events, missing = fetch_references(section_refs, [relay], store=store)
 
-        except subprocess.CalledProcessError as e:
-            print(f"Failed to fetch section {section_id}: {e.stderr}")
-        except Exception as e:
-            print(f"Error processing section {section_id}: {e}")
+    for ref in missing:
+        print(f"Missing section {ref.get('id') or ref['coordinate']}")
+    if missing:
+        print(f"{len(missing)} of {len(section_refs)} sections could not be fetched")
 
     return section_events
 
@@ -179,15 +164,7 @@ def get_nevent_code(event: Dict, relay: str) -> str:
         The nevent code
     """
     try:
-        process = subprocess.run(
-            ["nak", "encode", "nevent", "--relay", relay, event["id"]],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
-        )
-
-        return process.stdout.strip()
+        return encode_nevent(event["id"], [relay])
     except Exception:
         # Fallback method if nak encode fails
         return f"nevent:{event['id']}"
@@ -207,16 +184,44 @@ def main():
     parser.add_argument(
         "--model", default="all-MiniLM-L6-v2", help="Embedding model name"
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Sections per embedding batch (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--encoding",
+        choices=ENCODINGS,
+        default="csv",
+        help="Vector encoding of the event content: comma-separated decimals, "
+        "or base64 float32/float16/int8 (default: csv)",
+    )
     parser.add_argument(
         "--dry-run", action="store_true", help="Don't publish, just create embeddings"
     )
+    parser.add_argument(
+        "--store",
+        help="Local event store (SQLite file); repeat runs only fetch new events "
+        "and skip sections already embedded with the model",
+    )
     parser.add_argument("--mode", required=True, help="embedding or traceback")
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Profile each pipeline stage separately and write pstats files, "
+        "a speedscope flame graph and CPU/blocked time totals to DIR",
+    )
 
     args = parser.parse_args()
+    if args.profile:
+        profiler.profile_at_exit(args.profile)
 
     # Fetch the publication
     print(f"Fetching publication {args.id} from {args.relay}...")
-    pub_event = fetch_publication(args.id, args.relay)
+    store = EventStore(args.store) if args.store else None
+    with metrics.stage("fetch"):
+        pub_event = fetch_publication(args.id, args.relay, store)
     key = read_encrypted_key(args.nsec) if "ncryptsec" in args.nsec else args.nsec
     # Get publication title
     pub_title = None
@@ -229,12 +234,13 @@ def main():
 
     # Extract section references
     print("Extracting section references...")
-    section_ids = extract_section_refs(pub_event)
-    print(f"Found {len(section_ids)} section references")
+    section_refs = extract_section_refs(pub_event)
+    print(f"Found {len(section_refs)} section references")
 
     # Fetch section events
     print("Fetching section events...")
-    section_events = fetch_section_events(section_ids, args.relay)
+    with metrics.stage("fetch"):
+        section_events = fetch_section_events(section_refs, args.relay, store)
     print(f"Fetched {len(section_events)} section events")
 
     events = []
@@ -260,23 +266,37 @@ def main():
             print(f"Error creating traceback event: {e}")
     elif args.mode == "embedding":
         # Create embedding events
-        print(f"Creating embedding events using model {args.model}...")
-        for section in section_events:
+        if store is not None:
+            # Bring our own embeddings up to date, then skip what is covered
+            pubkey = get_signer_pubkey(key)
             try:
-                # Get section title
-                section_title = None
-                for tag in section.get("tags", []):
-                    if tag[0] == "title" and len(tag) > 1:
-                        section_title = tag[1]
-                        break
-
-                print(
-                    f"Creating embedding for section: {section_title or section['id'][:8]+'...'}"
+                with metrics.stage("fetch"):
+                    new = sync_store(
+                        [args.relay],
+                        store,
+                        {"kinds": [EMBEDDING_KIND], "authors": [pubkey]},
+                    )
+            except PaginationError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            print(f"Debug: {new} new embedding events in the store")
+            embedded = embedded_section_ids(store, section_events, pubkey, args.model)
+            section_events = [s for s in section_events if s["id"] not in embedded]
+            print(f"Skipping {len(embedded)} sections already embedded")
+        print(f"Creating embedding events using model {args.model}...")
+        try:
+            events.extend(
+                create_embedding_events(
+                    section_events,
+                    key,
+                    args.relay,
+                    args.model,
+                    args.batch_size,
+                    encoding=args.encoding,
                 )
-                embedding = create_embedding_event(section, key, args.relay, args.model)
-                events.append(embedding)
-            except Exception as e:
-                print(f"Error creating embedding: {e}")
+            )
+        except Exception as e:
+            print(f"Error creating embeddings: {e}")
 
     print(f"Created {len(events)} embedding events")
 
@@ -297,21 +317,17 @@ def main():
         successful = 0
         nevent_codes = []
 
-        for i, event in enumerate(events, 1):
-            print(f"Publishing embedding {i}/{len(events)}...")
-            success = publish_event(event, [args.relay], max_retries=5, delay=10)
-
-            if success:
+        results = publish_events(events, [args.relay], max_retries=5)
+        for event in events:
+            if publish_succeeded(results[event["id"]]):
                 successful += 1
+                if store is not None:
+                    store.add(event)
                 nevent = get_nevent_code(event, args.relay)
                 nevent_codes.append((nevent, True))
             else:
                 nevent_codes.append((f"Failed: {event['id']}", False))
 
-            # Add a small delay between publications
-            if i < len(events):
-                time.sleep(1)
-
         # Print results
         print(
             f"\nEmbedding publication complete: {successful}/{len(events)} successful"
@@ -1,91 +1,199 @@
-from typing import List, Dict, Tuple
-
-
-def parse_adoc_section(lines: List[str], start: int) -> Tuple[dict, int]:
-    """Parse a section from the AsciiDoc content"""
-    content = []
-    current_line = start
-    section_level = 0
-    title = ""
-
-    # Get section level and title
-    if lines[start].startswith("="):
-        heading = lines[start].strip()
-        section_level = len(heading.split(" ")[0])
-        title = heading.split(" ", 1)[1].strip() if " " in heading else ""
-        current_line += 1
-
-    # Collect content until next section or end
-    while current_line < len(lines):
-        line = lines[current_line]
-        # Check if we've hit the next section
-        if line.startswith("="):
-            break
-        content.append(line)
-        current_line += 1
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+from . import metrics
+
+# Listing (----), literal (....), example (====), passthrough (++++) and
+# comment (////) blocks; nothing inside them is parsed for headings
+_DELIMITER_RE = re.compile(r"^([-.=+/])\1{3,}[ \t]*$")
+_HEADING_RE = re.compile(r"^(=+)[ \t]+(.*?)[ \t]*$")
+
+# Preamble patterns, compiled once and matched per line
+_ATTRIBUTE_RE = re.compile(r"^:([^:]+):[ \t]+(.+?)[ \t]*$")
+_IMAGE_RE = re.compile(r"image::([^\[]+)")
+
+
+def tokenize_adoc(lines: Iterable[str]) -> Iterator[Tuple]:
+    """Classify AsciiDoc lines in a single pass.
+
+    Yields ("heading", level, title, line) for section headings outside
+    delimited blocks and ("text", line) for everything else. Lines keep
+    their original line endings.
+    """
+    open_delimiter: Optional[str] = None
+
+    for line in lines:
+        stripped = line.rstrip("\r\n")
+
+        if open_delimiter is not None:
+            # Inside a block only the matching delimiter means anything
+            if stripped.rstrip() == open_delimiter:
+                open_delimiter = None
+            yield ("text", line)
+            continue
+
+        if _DELIMITER_RE.match(stripped):
+            open_delimiter = stripped.rstrip()
+            yield ("text", line)
+            continue
+
+        heading = _HEADING_RE.match(stripped)
+        if heading:
+            yield ("heading", len(heading.group(1)), heading.group(2), line)
+        else:
+            yield ("text", line)
+
+
+def _make_section(title: str, level: int, content: List[str]) -> Dict:
     return {
         "title": title,
-        "level": section_level,
+        "level": level,
         "content": "\n".join(content).strip(),
-    }, current_line
+    }
 
 
-def parse_adoc_file(file_path: str, debug=False) -> dict:
-    """Parse AsciiDoc file and return structured content"""
-    if debug:
-        print(f"\nDebug: Opening file {file_path}")
-    with open(file_path, "r") as f:
-        lines = f.readlines()
+def iter_adoc_document(lines: Iterable[str], debug=False) -> Iterator[Tuple]:
+    """Stream a document as ("title", title), ("preamble", line) and
+    ("section", dict) items.
 
-    if debug:
-        print(f"Debug: File loaded, {len(lines)} lines")
+    The title is the first level 1 heading and the preamble is the text
+    between it and the next heading. Sections are level 2 and deeper;
+    their content runs until the next heading of any level, so text under
+    a level 1 heading is not part of any section.
+    """
+    title_found = False
+    current: Optional[Tuple[str, int]] = None
+    content: List[str] = []
 
-    # Skip header metadata (lines starting with :)
-    start_line = 0
-    while start_line < len(lines) and lines[start_line].startswith(":"):
-        if debug:
-            print(f"Debug: Skipping metadata line: {lines[start_line].strip()}")
-        start_line += 1
+    in_preamble = False
 
-    sections = []
-    current_line = start_line
+    for token in tokenize_adoc(lines):
+        if token[0] == "text":
+            if current is not None:
+                content.append(token[1])
+            elif in_preamble:
+                yield ("preamble", token[1])
+            continue
 
-    # Get document title from first level 1 heading
-    title = ""
-    for line in lines:
-        if line.startswith("= "):
-            title = line[2:].strip()
+        _, level, title, line = token
+        if current is not None:
+            section = _make_section(current[0], current[1], content)
+            if debug:
+                print(
+                    f"Debug: Adding section: {section['title']} (level {section['level']})"
+                )
+                print(f"Debug: Content length: {len(section['content'])} chars")
+            yield ("section", section)
+        content = []
+        current = None
+        in_preamble = False
+
+        if level >= 2:
+            if debug:
+                print(f"Debug: Found heading: {line.strip()}")
+            current = (title, level)
+        elif not title_found:
+            title_found = True
+            in_preamble = True
             if debug:
                 print(f"Debug: Found document title: {title}")
-            break
+            yield ("title", title)
+
+    if current is not None:
+        yield ("section", _make_section(current[0], current[1], content))
+
+
+def iter_adoc_sections(file_path: str, debug=False) -> Iterator[Dict]:
+    """Yield the level 2+ sections of an AsciiDoc file, reading it once"""
+    with open(file_path, "r") as f:
+        for kind, value in iter_adoc_document(f, debug):
+            if kind == "section":
+                yield value
+
+
+def extract_metadata_from_preamble(title: str, preamble: List[str]) -> Dict:
+    """Build document metadata from the title and the preamble lines.
+
+    Picks up the cover image, AsciiDoc attributes (`:key: value`), the
+    summary paragraph and tags/keywords.
+    """
+    metadata = {"title": title}
+    attributes = {}
+    summary_lines = []
+    image = None
+
+    for raw in preamble:
+        line = raw.strip()
+        if not line:
+            continue
+        if image is None:
+            image_match = _IMAGE_RE.search(line)
+            if image_match:
+                image = image_match.group(1).strip()
+        attribute = _ATTRIBUTE_RE.match(line)
+        if attribute:
+            attributes[attribute.group(1).strip().lower()] = attribute.group(2)
+        elif not line.startswith(":") and not line.startswith("image::"):
+            summary_lines.append(line)
+
+    if image is not None:
+        metadata["image"] = image
+    if "author" in attributes:
+        metadata["author"] = attributes["author"]
+    if summary_lines:
+        metadata["summary"] = " ".join(summary_lines)
+    metadata.update(attributes)
+
+    # Tags can come from :tags: and/or :keywords:
+    tags = []
+    for key in ("tags", "keywords"):
+        if key in attributes:
+            tags.extend(tag.strip() for tag in attributes[key].split(","))
+    if tags:
+        metadata["tags"] = tags
 
+    return metadata
+
+
+def parse_adoc_document(file_path: str, debug=False, quiet=False) -> Dict:
+    """Parse an AsciiDoc file in one read into title, metadata and sections
+
+    Returns:
+        {"title": str, "metadata": dict, "sections": list}; metadata is
+        empty when the document has no title
+    """
     if debug:
-        print("\nDebug: Processing sections...")
-    while current_line < len(lines):
-        line = lines[current_line]
-        if line.startswith("="):
-            level = len(line.split(" ")[0])  # Count the = signs
-            # Only process level 2 and deeper sections as content
-            if level >= 2:
-                if debug:
-                    print(f"Debug: Found heading: {line.strip()}")
-                section, current_line = parse_adoc_section(lines, current_line)
-                if debug:
-                    print(
-                        f"Debug: Adding section: {section['title']} (level {section['level']})"
-                    )
-                    print(f"Debug: Content length: {len(section['content'])} chars")
-                sections.append(section)
+        print(f"\nDebug: Opening file {file_path}")
+
+    title = None
+    preamble = []
+    sections = []
+    with metrics.stage("parse"), open(file_path, "r", encoding="utf-8") as f:
+        for kind, value in iter_adoc_document(f, debug):
+            if kind == "section":
+                sections.append(value)
+            elif kind == "preamble":
+                preamble.append(value)
             else:
-                current_line += 1
-        else:
-            current_line += 1
+                title = value
+
+    if title is None:
+        if not quiet:
+            print("Error: No document title found")
+        metadata = {}
+    else:
+        with metrics.stage("metadata"):
+            metadata = extract_metadata_from_preamble(title, preamble)
+
+    if not quiet:
+        print(f"\nParsing complete")
+        print(f"Title: {title or ''}")
+        print(f"Number of sections: {len(sections)}")
 
-    result = {"title": title, "sections": sections}
+    return {"title": title or "", "metadata": metadata, "sections": sections}
 
-    print(f"\nParsing complete")
-    print(f"Title: {result['title']}")
-    print(f"Number of sections: {len(result['sections'])}")
 
-    return result
+def parse_adoc_file(file_path: str, debug=False) -> dict:
+    """Parse AsciiDoc file and return structured content"""
+    doc = parse_adoc_document(file_path, debug)
+    return {"title": doc["title"], "sections": doc["sections"]}
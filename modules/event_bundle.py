@@ -0,0 +1,144 @@
+"""
+JSONL bundles of signed events for signing now and publishing later.
+
+A bundle is one JSON object per line: a header first, then the signed
+events in dependency order, so that every event a 30040 index references
+is published before the index itself. Bundles are read back one line at a
+time, so publishing never holds more than one batch of events in memory.
+
+Header:
+    {"format": "nip62-bundle", "version": 1, "created_at": ..., "source": ...,
+     "pubkeys": [...], "relays": [...], "root": "30040:<pubkey>:<d>",
+     "events": 42, "kinds": {"30041": 40, "30040": 2}}
+"""
+
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from .event_store import replaceable_coordinate
+
+BUNDLE_FORMAT = "nip62-bundle"
+BUNDLE_VERSION = 1
+
+
+def _reference_keys(event: Dict) -> List[str]:
+    """Coordinates and ids an event refers to through a and e tags"""
+    return [tag[1] for tag in event["tags"] if len(tag) > 1 and tag[0] in ("a", "e")]
+
+
+def _event_keys(event: Dict) -> List[str]:
+    """How other events can refer to this one"""
+    coordinate = replaceable_coordinate(event)
+    return [event["id"], coordinate] if coordinate else [event["id"]]
+
+
+def dependency_order(events: List[Dict]) -> List[Dict]:
+    """Order events so that referenced events come before the events
+    referencing them, otherwise keeping the given order"""
+    by_key = {key: event for event in events for key in _event_keys(event)}
+    ordered, placed = [], set()
+
+    def place(event: Dict, path: set) -> None:
+        if event["id"] in placed or event["id"] in path:
+            return
+        path.add(event["id"])
+        for key in _reference_keys(event):
+            if key in by_key:
+                place(by_key[key], path)
+        placed.add(event["id"])
+        ordered.append(event)
+
+    for event in events:
+        place(event, set())
+    return ordered
+
+
+def bundle_header(events: List[Dict], source: str, relays: List[str]) -> Dict:
+    """Header describing a bundle of events (the root is the last index)"""
+    kinds: Dict[str, int] = {}
+    for event in events:
+        kinds[str(event["kind"])] = kinds.get(str(event["kind"]), 0) + 1
+    root = next((e for e in reversed(events) if e["kind"] == 30040), None)
+    return {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "created_at": int(time.time()),
+        "source": source,
+        "pubkeys": sorted({event["pubkey"] for event in events}),
+        "relays": relays,
+        "root": replaceable_coordinate(root) if root else None,
+        "events": len(events),
+        "kinds": kinds,
+    }
+
+
+def write_bundle(out: TextIO, header: Dict, events: List[Dict]) -> int:
+    """Write a header line and one line per event; returns the event count"""
+    out.write(json.dumps(header, ensure_ascii=False) + "\n")
+    for event in events:
+        out.write(json.dumps(event, ensure_ascii=False, separators=(",", ":")))
+        out.write("\n")
+    out.flush()
+    return len(events)
+
+
+def save_bundle(path: str, header: Dict, events: List[Dict]) -> int:
+    """Write a bundle file atomically"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        count = write_bundle(f, header, events)
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_bundle(f: TextIO) -> Tuple[Dict, Iterator[Dict]]:
+    """Read the header of an open bundle
+
+    Returns:
+        (header, iterator over the events, read lazily)
+
+    Raises:
+        ValueError: Not a bundle, an unknown version or a malformed line
+    """
+    first = f.readline()
+    try:
+        header = json.loads(first)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != BUNDLE_FORMAT:
+        raise ValueError("not an event bundle (missing header)")
+    if header.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"unsupported bundle version {header.get('version')}")
+
+    def events() -> Iterator[Dict]:
+        for number, line in enumerate(f, 2):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"line {number}: {e}") from None
+
+    return header, events()
+
+
+def read_chunks(events: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    """Group a stream of events into lists of at most size"""
+    chunk: List[Dict] = []
+    for event in events:
+        chunk.append(event)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def root_coordinate(header: Dict) -> Optional[Tuple[int, str, str]]:
+    """(kind, pubkey, d tag) of the bundle's root index, if it has one"""
+    if not header.get("root"):
+        return None
+    kind, pubkey, identifier = header["root"].split(":", 2)
+    return int(kind), pubkey, identifier
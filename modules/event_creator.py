@@ -1,10 +1,13 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import Executor
 import subprocess
 import sys
 import json
 import getpass
 import time
 
+from . import metrics
+from .event_signer import get_public_key, sign_events
 
 _DECRYPTED_KEY = None
 
@@ -16,12 +19,13 @@ def decrypt_key(encrypted_key: str) -> str:
         password = getpass.getpass("Enter password to decrypt key: ")
 
         # Pass encrypted key as argument, password through stdin
-        decrypt_process = subprocess.run(
-            ["nak", "key", "decrypt", encrypted_key],
-            input=password.encode("utf-8"),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        with metrics.call("nak"):
+            decrypt_process = subprocess.run(
+                ["nak", "key", "decrypt", encrypted_key],
+                input=password.encode("utf-8"),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
 
         if decrypt_process.returncode != 0:
             print(f"Debug: Decryption failed:")
@@ -33,12 +37,13 @@ def decrypt_key(encrypted_key: str) -> str:
         privkey = decrypt_process.stdout.decode().strip()
 
         # Verify by getting the pubkey
-        pubkey_process = subprocess.run(
-            ["nak", "key", "public"],
-            input=privkey.encode("utf-8"),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        with metrics.call("nak"):
+            pubkey_process = subprocess.run(
+                ["nak", "key", "public"],
+                input=privkey.encode("utf-8"),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
 
         if pubkey_process.returncode == 0:
             print(f"Debug: Using pubkey: {pubkey_process.stdout.decode().strip()}")
@@ -55,6 +60,32 @@ def decrypt_key(encrypted_key: str) -> str:
 # Global decrypted key cache
 
 
+def _resolve_key(ncryptsec: str, decrypt: bool) -> str:
+    """Return the cached private key, decrypting it on first use"""
+    global _DECRYPTED_KEY
+
+    if _DECRYPTED_KEY is None and decrypt:
+        # Read the encrypted key if it's a file path
+        if ncryptsec.startswith("/"):
+            with open(ncryptsec, "r") as f:
+                ncryptsec = f.read().strip()
+
+        _DECRYPTED_KEY = decrypt_key(ncryptsec)
+    elif _DECRYPTED_KEY is None:
+        _DECRYPTED_KEY = ncryptsec
+
+    return _DECRYPTED_KEY
+
+
+def get_signer_pubkey(ncryptsec: str, decrypt=True) -> str:
+    """Return the hex pubkey events will be signed with, decrypting if needed"""
+    try:
+        return get_public_key(_resolve_key(ncryptsec, decrypt))
+    except Exception as e:
+        print(f"Error reading key: {e}")
+        sys.exit(1)
+
+
 def create_event(
     kind: int,
     content: str,
@@ -63,61 +94,56 @@ def create_event(
     decrypt=True,
     debug=False,
 ) -> dict:
-    """Create and sign a Nostr event using nak"""
-    try:
-        global _DECRYPTED_KEY
-
-        # Get or decrypt the key
-        if _DECRYPTED_KEY is None and decrypt:
-            # Read the encrypted key if it's a file path
-            if ncryptsec.startswith("/"):
-                with open(ncryptsec, "r") as f:
-                    ncryptsec = f.read().strip()
-
-            _DECRYPTED_KEY = decrypt_key(ncryptsec)
-        elif _DECRYPTED_KEY is None:
-            _DECRYPTED_KEY = ncryptsec
-
-        # Create the complete event
-        event = {
-            "kind": kind,
-            "content": content,
-            "tags": tags,
-            "created_at": int(time.time()),
-        }
-
-        # Convert to JSON - ensure no extra newlines
-        event_json = json.dumps(event, separators=(",", ":"))
-
-        # Debug output
-        if debug:
-            print(f"Debug: Creating event with kind {kind}")
-            print(f"Debug: Tags: {json.dumps(tags, indent=2)}")
-            print(f"Debug: Event JSON: {event_json}")
+    """Create and sign a Nostr event"""
+    return create_events(
+        [{"kind": kind, "content": content, "tags": tags}],
+        ncryptsec,
+        decrypt=decrypt,
+        debug=debug,
+    )[0]
 
-        # Create the event with decrypted key
-        cmd = ["nak", "event", "--sec", _DECRYPTED_KEY]
 
-        # Send event JSON through stdin
-        process = subprocess.run(
-            cmd, input=event_json.encode("utf-8"), capture_output=True
-        )
-
-        if process.returncode != 0:
-            print("Debug: Event creation failed:")
-            print(f"Debug: stdout: {process.stdout.decode()}")
-            print(f"Debug: stderr: {process.stderr.decode()}")
-            raise Exception(f"Command failed: {process.stderr.decode()}")
+def create_events(
+    templates: List[Dict],
+    ncryptsec: str,
+    decrypt=True,
+    debug=False,
+    workers: int = None,
+    executor: Optional[Executor] = None,
+) -> List[dict]:
+    """Create and sign a batch of Nostr events in-process
+
+    Args:
+        templates: Dicts with kind, content and tags (created_at optional)
+        ncryptsec: Encrypted key, key file path, or raw key when decrypt=False
+        workers: Signing processes (default: CPU count for large batches)
+        executor: Process pool to sign in instead of starting one
+    """
+    try:
+        key = _resolve_key(ncryptsec, decrypt)
+
+        now = int(time.time())
+        unsigned = []
+        for template in templates:
+            event = {
+                "kind": template["kind"],
+                "content": template["content"],
+                "tags": template["tags"],
+                "created_at": template.get("created_at", now),
+            }
+            if debug:
+                print(f"Debug: Creating event with kind {event['kind']}")
+                print(f"Debug: Tags: {json.dumps(event['tags'], indent=2)}")
+            unsigned.append(event)
+
+        with metrics.stage("sign"):
+            events = sign_events(unsigned, key, workers=workers, executor=executor)
 
-        result_event = json.loads(process.stdout.decode())
         if debug:
-            print(f"Debug: Event created successfully with ID: {result_event['id']}")
-            print(f"Debug: Event tags: {json.dumps(result_event['tags'], indent=2)}")
-        return result_event
+            for event in events:
+                print(f"Debug: Event created successfully with ID: {event['id']}")
+        return events
 
-    except subprocess.TimeoutExpired:
-        print("Error: Command timed out")
-        sys.exit(1)
     except Exception as e:
         print(f"Error creating event: {e}")
         sys.exit(1)
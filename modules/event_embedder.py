@@ -0,0 +1,162 @@
+"""
+Local text embeddings for kind 1987 events (NKBIP-02).
+
+Sections are embedded on the CPU with sentence-transformers. The model is
+loaded once per process, and texts are batched in order of length so each
+batch pads to similar sizes instead of to its longest outlier.
+"""
+
+import functools
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from . import metrics
+from .event_creator import create_events
+from .event_fetcher import event_coordinate
+from .event_store import EventStore
+from .vector_codec import CSV, encode_vector
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+EMBEDDING_KIND = 1987
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_BATCH_SIZE = 32
+
+
+@functools.lru_cache(maxsize=None)
+def load_model(model_name: str = DEFAULT_MODEL, device: str = "cpu"):
+    """Load an embedding model (once per process and model name)"""
+    if SentenceTransformer is None:
+        raise ImportError(
+            "sentence-transformers is required for embeddings "
+            "(pip install sentence-transformers)"
+        )
+    print(f"Loading embedding model {model_name} on {device}...")
+    return SentenceTransformer(model_name, device=device)
+
+
+def embed_texts(
+    texts: List[str],
+    model_name: str = DEFAULT_MODEL,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> np.ndarray:
+    """Embed texts in length-sorted batches
+
+    Returns:
+        float32 matrix with one row per text, in input order
+    """
+    model = load_model(model_name)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    vectors = None
+
+    for start in range(0, len(order), batch_size):
+        batch = order[start : start + batch_size]
+        with metrics.stage("embed"):
+            encoded = model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        if vectors is None:
+            vectors = np.empty((len(texts), len(encoded[0])), dtype=np.float32)
+        vectors[batch] = encoded
+        print(f"Debug: Embedded {min(start + batch_size, len(order))}/{len(order)}")
+
+    return vectors
+
+
+def section_text(section: Dict) -> str:
+    """Text to embed for a section: its title (if any) followed by its content"""
+    title = next((tag[1] for tag in section["tags"] if tag[0] == "title"), "")
+    return f"{title}\n\n{section['content']}" if title else section["content"]
+
+
+def embedded_section_ids(
+    store: EventStore, sections: List[Dict], pubkey: str, model_name: str
+) -> set:
+    """Ids of sections the store already holds a 1987 event for, by this
+    author and model"""
+    embedded = set()
+    for event in store.referencing(
+        "e", [section["id"] for section in sections], kinds=[EMBEDDING_KIND]
+    ):
+        if event["pubkey"] != pubkey:
+            continue
+        if not any(tag[:2] == ["model", model_name] for tag in event["tags"]):
+            continue
+        embedded.update(tag[1] for tag in event["tags"] if tag[0] == "e")
+    return embedded
+
+
+def embedding_template(
+    section: Dict,
+    vector: np.ndarray,
+    relay: str,
+    model_name: str,
+    encoding: str = CSV,
+) -> Dict:
+    """Build the unsigned 1987 event for a section's embedding"""
+    content, encoding_tags = encode_vector(vector, encoding)
+    tags = [["e", section["id"], relay]]
+    if any(tag[0] == "d" for tag in section["tags"]):
+        tags.append(["a", event_coordinate(section), relay])
+    tags.append(["model", model_name])
+    tags.append(["dimensions", str(len(vector))])
+    tags.extend(encoding_tags)
+    return {"kind": EMBEDDING_KIND, "content": content, "tags": tags}
+
+
+def create_embedding_events(
+    sections: List[Dict],
+    key: str,
+    relay: str,
+    model_name: str = DEFAULT_MODEL,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    decrypt=True,
+    encoding: str = CSV,
+) -> List[Dict]:
+    """Embed sections in batches and sign one 1987 event per section
+
+    Args:
+        encoding: Vector encoding of the content (see vector_codec)
+    """
+    if not sections:
+        return []
+
+    start = time.perf_counter()
+    vectors = embed_texts(
+        [section_text(section) for section in sections], model_name, batch_size
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Embedded {len(sections)} sections in {elapsed:.2f}s "
+        f"({len(sections) / elapsed if elapsed else 0:.1f} sections/s, "
+        f"{len(vectors[0])} dimensions)"
+    )
+
+    templates = [
+        embedding_template(section, vector, relay, model_name, encoding)
+        for section, vector in zip(sections, vectors)
+    ]
+    return create_events(templates, key, decrypt=decrypt)
+
+
+def create_embedding_event(
+    section: Dict,
+    key: str,
+    relay: str,
+    model_name: str = DEFAULT_MODEL,
+    decrypt=True,
+    encoding: str = CSV,
+) -> Dict:
+    """Embed one section and sign its 1987 event"""
+    events = create_embedding_events(
+        [section], key, relay, model_name, decrypt=decrypt, encoding=encoding
+    )
+    return events[0]
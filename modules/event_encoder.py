@@ -1,6 +1,8 @@
 import subprocess
 from typing import List, Dict
 
+from . import metrics
+
 
 def encode_event_id(event: Dict, relays: List[str], note_format: bool = False) -> str:
     """Encode an event ID to naddr/nevent format using nak
@@ -35,7 +37,8 @@ def encode_event_id(event: Dict, relays: List[str], note_format: bool = False) -
 
         print(f"Debug: Encode command: {' '.join(cmd)}")
 
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with metrics.stage("encode"), metrics.call("nak"):
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
         if result.returncode != 0:
             print("Debug: Encoding failed:")
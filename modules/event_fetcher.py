@@ -0,0 +1,454 @@
+"""
+Bulk event fetching over the relay pool.
+
+Ids and addressable coordinates are packed into a few REQ filters instead
+of one `nak req` per event, and results are collected as they stream in.
+With an EventStore, events already stored locally are not requested again.
+"""
+
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from .event_store import EventStore
+from .event_verifier import filter_valid_events
+from .relay_pool import RelayPool
+
+# Entries per filter; many relays cap ids/#d lists and result counts near here
+DEFAULT_CHUNK_SIZE = 250
+# Events per page when paging backward through a filter
+DEFAULT_PAGE_SIZE = 500
+
+
+def parse_coordinate(coordinate: str) -> Tuple[int, str, str]:
+    """Split "kind:pubkey:d-tag" (the d-tag may itself contain colons)"""
+    kind, pubkey, d_tag = coordinate.split(":", 2)
+    return int(kind), pubkey, d_tag
+
+
+def event_coordinate(event: Dict) -> str:
+    """Return the "kind:pubkey:d-tag" coordinate of an addressable event"""
+    d_tag = next((tag[1] for tag in event["tags"] if tag[0] == "d"), "")
+    return f"{event['kind']}:{event['pubkey']}:{d_tag}"
+
+
+def parse_a_tag(tag: List[str]) -> Dict:
+    """Turn ["a", coordinate, relay, id] into a reference dict"""
+    return {
+        "coordinate": tag[1],
+        "relay": tag[2] if len(tag) > 2 else "",
+        "id": tag[3] if len(tag) > 3 else "",
+    }
+
+
+def _chunks(values: List, size: int) -> List[List]:
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+async def stream_events_by_ids(
+    pool: RelayPool, ids: List[str], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AsyncIterator[Dict]:
+    """Yield events for the given ids as relays return them"""
+    wanted = set(ids)
+    for chunk in _chunks(list(dict.fromkeys(ids)), chunk_size):
+        async for event in pool.query([{"ids": chunk, "limit": len(chunk)}]):
+            if event.get("id") in wanted:
+                yield event
+
+
+async def stream_events_by_coordinates(
+    pool: RelayPool,
+    coordinates: List[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    known: Optional[Dict[str, int]] = None,
+) -> AsyncIterator[Dict]:
+    """Yield events for "kind:pubkey:d-tag" coordinates, one filter per author/kind
+
+    Args:
+        known: created_at of versions already held locally, by coordinate;
+            a chunk whose coordinates are all known only asks for newer ones
+    """
+    groups: Dict[Tuple[int, str], List[str]] = {}
+    for coordinate in dict.fromkeys(coordinates):
+        kind, pubkey, d_tag = parse_coordinate(coordinate)
+        groups.setdefault((kind, pubkey), []).append(d_tag)
+
+    known = known or {}
+    wanted = set(coordinates)
+    for (kind, pubkey), d_tags in groups.items():
+        for chunk in _chunks(d_tags, chunk_size):
+            query_filter = {"kinds": [kind], "authors": [pubkey], "#d": chunk}
+            stored = [known.get(f"{kind}:{pubkey}:{d_tag}") for d_tag in chunk]
+            if None not in stored:
+                query_filter["since"] = min(stored) + 1
+            async for event in pool.query([query_filter]):
+                if event_coordinate(event) in wanted:
+                    yield event
+
+
+class PaginationError(Exception):
+    """A relay could not be read to the end: it stopped answering, or more
+    events share one created_at than it will return at once"""
+
+
+# Largest limit asked for when draining a single crowded timestamp, in
+# page sizes
+MAX_SECOND_PAGES = 64
+
+
+def _advertised_limit(pool: RelayPool, relays: Optional[List[str]]) -> Optional[int]:
+    """The smallest NIP-11 max_limit of the relays, if every one of them
+    advertises one"""
+    limits = [
+        pool.scheduler.relay(url).limits.get("max_limit")
+        for url in relays or pool.relays
+    ]
+    if not all(isinstance(limit, int) and limit > 0 for limit in limits):
+        return None
+    return min(limits)
+
+
+def _incomplete_reads(pool: RelayPool, relays: Optional[List[str]]) -> Dict[str, int]:
+    return {
+        url: pool.connections[url].incomplete_reads for url in relays or pool.relays
+    }
+
+
+def _check_complete(
+    pool: RelayPool, relays: Optional[List[str]], before: Dict[str, int]
+) -> None:
+    """Raise if a relay ended a subscription without EOSE since `before`"""
+    stalled = [
+        url
+        for url, count in _incomplete_reads(pool, relays).items()
+        if count > before[url]
+    ]
+    if stalled:
+        raise PaginationError(
+            f"{', '.join(stalled)} stopped answering before the end of the events "
+            "(timeout or CLOSED before EOSE)"
+        )
+
+
+async def _count(
+    pool: RelayPool, query_filter: Dict, relays: Optional[List[str]]
+) -> int:
+    count = 0
+    async for _ in pool.query([query_filter], relays):
+        count += 1
+    return count
+
+
+async def _stream_one_second(
+    pool: RelayPool,
+    query_filter: Dict,
+    created_at: int,
+    seen: Set[str],
+    page_size: int,
+    relays: Optional[List[str]],
+) -> AsyncIterator[Dict]:
+    """Yield the events at created_at not in seen, asking for that second
+    alone with growing limits until a reply comes back short
+
+    Raises:
+        PaginationError: The relay stops returning more events for the
+            second, so the rest cannot be reached
+    """
+    max_limit = _advertised_limit(pool, relays)
+    limit = 2 * max(page_size, len(seen))
+    while True:
+        capacity = min(limit, max_limit) if max_limit else limit
+        if capacity <= len(seen):
+            raise PaginationError(
+                f"At least {len(seen)} events share created_at {created_at}, "
+                f"more than the relay returns per query ({capacity})"
+            )
+        second_filter = dict(query_filter, since=created_at, until=created_at)
+        second_filter["limit"] = limit
+        events = [e async for e in pool.query([second_filter], relays)]
+
+        if len(events) < capacity:
+            # A short reply is complete, unless it is no larger than the
+            # page already seen and the relay may be capping silently; a
+            # reply for the whole filter that brings more settles it
+            if len(events) <= len(seen) and not max_limit:
+                whole_filter = dict(query_filter, limit=capacity)
+                if await _count(pool, whole_filter, relays) <= len(seen):
+                    raise PaginationError(
+                        f"At least {len(seen)} events share created_at "
+                        f"{created_at} and the relay returns no more than "
+                        f"{len(events)} of them"
+                    )
+            for event in events:
+                if event["id"] not in seen:
+                    yield event
+            return
+        if capacity < limit or limit >= MAX_SECOND_PAGES * page_size:
+            raise PaginationError(
+                f"More than {capacity} events share created_at {created_at}"
+            )
+        limit *= 2
+
+
+async def stream_events_paginated(
+    pool: RelayPool,
+    query_filter: Dict,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    relays: Optional[List[str]] = None,
+) -> AsyncIterator[Dict]:
+    """Yield every event matching a filter, newest first, page by page
+
+    Each page asks for `limit` events `until` the oldest timestamp seen so
+    far, until a page brings nothing new. The cursor is inclusive, so ids
+    already yielded at the boundary timestamp are skipped; only those ids
+    are remembered, which keeps memory bounded by the page size.
+
+    Events signed in one batch share a created_at, so a page can be filled
+    by a single second. The cursor never steps past such a second before
+    it is read to the end with a query for that second alone.
+
+    A page that times out or is CLOSED before EOSE would look like the end
+    of the data, so it is an error instead.
+
+    Raises:
+        PaginationError: A relay did not answer a page to the end, or a
+            second holds more events than the relay will return in one reply
+    """
+    until = query_filter.get("until")
+    boundary_ids = set()
+    before = _incomplete_reads(pool, relays)
+
+    while True:
+        page_filter = dict(query_filter, limit=page_size)
+        if until is not None:
+            page_filter["until"] = until
+
+        received = new = 0
+        oldest, oldest_ids = None, set()
+        async for event in pool.query([page_filter], relays):
+            received += 1
+            if event["id"] in boundary_ids:
+                continue
+            new += 1
+            created_at = event["created_at"]
+            if oldest is None or created_at < oldest:
+                oldest, oldest_ids = created_at, {event["id"]}
+            elif created_at == oldest:
+                oldest_ids.add(event["id"])
+            yield event
+
+        _check_complete(pool, relays, before)
+        if received == 0:
+            return
+        if new == 0:
+            # A page of nothing but already seen events at one timestamp. A
+            # full one may hide more events at that second: read them all
+            # before stepping past it
+            full_page = min(page_size, _advertised_limit(pool, relays) or page_size)
+            if received >= full_page:
+                async for event in _stream_one_second(
+                    pool, query_filter, until, boundary_ids, page_size, relays
+                ):
+                    yield event
+                _check_complete(pool, relays, before)
+            until, boundary_ids = until - 1, set()
+        elif oldest == until:
+            boundary_ids |= oldest_ids
+        else:
+            until, boundary_ids = oldest, oldest_ids
+
+
+def _latest_by_coordinate(events: List[Dict]) -> Dict[str, Dict]:
+    """Keep the newest version of each addressable event"""
+    latest = {}
+    for event in events:
+        coordinate = event_coordinate(event)
+        current = latest.get(coordinate)
+        if current is None or event["created_at"] > current["created_at"]:
+            latest[coordinate] = event
+    return latest
+
+
+async def sync_to_store(
+    pool: RelayPool,
+    store: EventStore,
+    query_filter: Dict,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> int:
+    """Copy the events matching a filter into the store
+
+    Each relay is only asked for events newer than its cursor for this
+    filter. The cursor only moves once a relay has been read to the end,
+    and never for a filter whose `since` leaves a gap before the cursor.
+    A relay that cannot be read to the end keeps the events read so far
+    and its cursor, and the other relays are still synced.
+
+    Returns:
+        Number of events new to the store
+
+    Raises:
+        PaginationError: Some relay was not read to the end
+    """
+    added = 0
+    errors = []
+    for url in pool.relays:
+        cursor = store.get_cursor(url, query_filter)
+        relay_filter = dict(query_filter)
+        if cursor is not None:
+            relay_filter["since"] = max(cursor, query_filter.get("since", 0))
+        complete = not query_filter.get("since") or (
+            cursor is not None and query_filter["since"] <= cursor
+        )
+
+        connection = pool.connections[url]
+        incomplete = connection.incomplete_reads
+        newest, page = cursor, []
+        read_to_end = True
+        try:
+            async for event in stream_events_paginated(
+                pool, relay_filter, page_size, relays=[url]
+            ):
+                page.append(event)
+                if len(page) < page_size:
+                    continue
+                valid = filter_valid_events(page)
+                added += store.add_many(valid)
+                newest = max([newest or 0] + [event["created_at"] for event in valid])
+                page = []
+        except PaginationError as e:
+            errors.append(str(e))
+            read_to_end = False
+        valid = filter_valid_events(page)
+        added += store.add_many(valid)
+        newest = max([newest or 0] + [event["created_at"] for event in valid])
+
+        if not read_to_end or connection.incomplete_reads > incomplete:
+            # A page that timed out or was CLOSED before EOSE may hide
+            # older events; keep the cursor so the next sync asks again
+            print(f"Debug: {url} was not read to the end, keeping its cursor")
+        elif complete and newest:
+            store.set_cursor(url, query_filter, newest)
+    if errors:
+        raise PaginationError("; ".join(errors))
+    return added
+
+
+async def fetch_references_async(
+    pool: RelayPool,
+    refs: List[Dict],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    store: Optional[EventStore] = None,
+) -> Tuple[List[Dict], List[Dict]]:
+    """Fetch referenced events, keeping the order of refs
+
+    Refs with an event id are fetched by id; refs with only a coordinate
+    are resolved to the newest event at that coordinate. With a store,
+    stored ids are not requested, coordinates are only asked for newer
+    versions, and everything fetched is added to the store.
+
+    Returns:
+        (events in ref order, refs that could not be found)
+    """
+    ids = [ref["id"] for ref in refs if ref.get("id")]
+    coordinates = [ref["coordinate"] for ref in refs if not ref.get("id")]
+
+    stored_by_id, stored_by_coordinate = {}, {}
+    if store is not None:
+        stored_by_id = store.get_many(ids)
+        stored_by_coordinate = store.latest_many(coordinates)
+        print(
+            f"Debug: {len(stored_by_id)}/{len(ids)} events by id and "
+            f"{len(stored_by_coordinate)}/{len(coordinates)} coordinates in the store"
+        )
+        ids = [event_id for event_id in ids if event_id not in stored_by_id]
+
+    by_id = {}
+    received = 0
+    async for event in stream_events_by_ids(pool, ids, chunk_size):
+        by_id[event["id"]] = event
+        received += 1
+        if received % 100 == 0:
+            print(f"Debug: Received {received}/{len(ids)} events by id")
+
+    known = {
+        coordinate: event["created_at"]
+        for coordinate, event in stored_by_coordinate.items()
+    }
+    by_coordinate_events = []
+    async for event in stream_events_by_coordinates(
+        pool, coordinates, chunk_size, known
+    ):
+        by_coordinate_events.append(event)
+
+    valid = filter_valid_events(list(by_id.values()) + by_coordinate_events)
+    if store is not None:
+        store.add_many(valid)
+    valid_ids = {event["id"] for event in valid}
+    by_id = {k: v for k, v in by_id.items() if k in valid_ids}
+    by_id.update(stored_by_id)
+    by_coordinate = _latest_by_coordinate(
+        [event for event in by_coordinate_events if event["id"] in valid_ids]
+        + list(stored_by_coordinate.values())
+    )
+
+    events, missing = [], []
+    for ref in refs:
+        if ref.get("id"):
+            event = by_id.get(ref["id"])
+        else:
+            event = by_coordinate.get(ref["coordinate"])
+        if event:
+            events.append(event)
+        else:
+            missing.append(ref)
+    return events, missing
+
+
+def fetch_references(
+    refs: List[Dict],
+    relays: List[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    store: Optional[EventStore] = None,
+) -> Tuple[List[Dict], List[Dict]]:
+    """Fetch referenced events from relays in a handful of REQs
+
+    Returns:
+        (events in ref order, refs that could not be found)
+    """
+
+    async def run():
+        async with RelayPool(relays) as pool:
+            return await fetch_references_async(pool, refs, chunk_size, store)
+
+    return asyncio.run(run())
+
+
+def sync_store(
+    relays: List[str],
+    store: EventStore,
+    query_filter: Dict,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> int:
+    """Bring the store up to date with relays for one filter
+
+    Returns:
+        Number of events new to the store
+    """
+
+    async def run():
+        async with RelayPool(relays) as pool:
+            return await sync_to_store(pool, store, query_filter, page_size)
+
+    return asyncio.run(run())
+
+
+def fetch_event(
+    relays: List[str],
+    event_id: Optional[str] = None,
+    coordinate: Optional[str] = None,
+    store: Optional[EventStore] = None,
+) -> Optional[Dict]:
+    """Fetch a single event by id or by coordinate"""
+    events, _ = fetch_references(
+        [{"id": event_id, "coordinate": coordinate}], relays, store=store
+    )
+    return events[0] if events else None
@@ -1,70 +1,246 @@
-from typing import List
-import subprocess
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
 import json
-import time
 
+from . import metrics
+from .publish_scheduler import RATE_LIMITED_PREFIX
+from .relay_pool import RelayPool
+from .retry_policy import ACCEPTED, PARKED, PERMANENT, RETRY, RetryPolicy, classify
 
-def publish_event(
-    event: dict, relays: List[str], max_retries: int = 3, delay: int = 5
-) -> bool:
-    """Publish an event to specified relays using nak"""
-    try:
-        print(f"\nDebug: Publishing event {event['id']} to relays: {relays}")
-        event_str = json.dumps(event)
-
-        # Create command with relays appended
-        cmd = ["nak", "event"] + relays
-
-        print(f"Debug: Event tags: {json.dumps(event.get('tags', []), indent=2)}")
-        print(f"Debug: Publish command: {' '.join(cmd)}")
-
-        # Try publishing with retries
-        success = False
-        attempts = 0
-        while not success and attempts < max_retries:
-            attempts += 1
-            print(f"Debug: Attempt {attempts} of {max_retries}")
-
-            # Create and publish the event
-            result = subprocess.run(
-                cmd,
-                input=event_str.encode("utf-8"),
-                capture_output=True,
-                timeout=30,  # Longer timeout for publishing
-            )
 
-            if result.returncode != 0:
-                print("Debug: Publishing failed:")
-                print(f"Debug: stdout: {result.stdout.decode()}")
-                print(f"Debug: stderr: {result.stderr.decode()}")
-                if attempts < max_retries:
-                    print(f"Debug: Retrying after {delay} seconds...")
-                    time.sleep(delay)
-            else:
-                print("Debug: Event published successfully")
-
-                # Verify publication by requesting event
-                verify_cmd = ["nak", "req", "-i", event["id"]] + relays
-                print(f"Debug: Verifying with command: {' '.join(verify_cmd)}")
-
-                verify_result = subprocess.run(
-                    verify_cmd, capture_output=True, timeout=10
+def publish_succeeded(relay_results: Dict[str, Tuple[bool, str]]) -> bool:
+    """An event counts as published once at least one relay accepted it"""
+    return any(ok for ok, _ in relay_results.values())
+
+
+CONFIRMED = "confirmed"
+
+# Ids per filter when confirming a batch; stays well under common relay limits
+CONFIRM_CHUNK_SIZE = 500
+
+
+async def confirm_events(
+    pool: RelayPool, events: List[dict], relays: Optional[List[str]] = None
+) -> Dict[str, Set[str]]:
+    """Ask each relay for the whole batch with one REQ and see what it returns
+
+    Returns:
+        {relay: set of event ids the relay has}
+    """
+    targets = relays or pool.relays
+    ids = [event["id"] for event in events]
+    filters = [
+        {"ids": ids[i : i + CONFIRM_CHUNK_SIZE], "limit": CONFIRM_CHUNK_SIZE}
+        for i in range(0, len(ids), CONFIRM_CHUNK_SIZE)
+    ]
+
+    async def found_on(relay: str) -> Set[str]:
+        return {event["id"] async for event in pool.query(filters, [relay])}
+
+    found = await asyncio.gather(*(found_on(relay) for relay in targets))
+    return dict(zip(targets, found))
+
+
+async def _publish_to_relay(
+    pool: RelayPool,
+    relay: str,
+    events: List[dict],
+    results: Dict[str, Dict[str, Tuple[bool, str]]],
+    max_retries: int,
+    policy: RetryPolicy,
+    verify: bool,
+    journal,
+) -> None:
+    """Retry loop for one relay, independent of the other relays"""
+    breaker = pool.connections[relay].breaker
+    on_result = journal.record_result if journal is not None else None
+    batch = list(events)
+    attempts = 0
+    while batch and attempts < max_retries:
+        if not breaker.allow():
+            if breaker.retry_in() > policy.max_delay:
+                print(
+                    f"Debug: {relay} is parked after repeated failures; "
+                    f"{len(batch)} event(s) left for a later run"
+                )
+                for event in batch:
+                    results[event["id"]][relay] = (False, PARKED)
+                break
+            await asyncio.sleep(breaker.retry_in())
+
+        attempts += 1
+        print(
+            f"Debug: Attempt {attempts} of {max_retries} on {relay}: "
+            f"{len(batch)} event(s)"
+        )
+        with metrics.stage("publish"):
+            batch_results = await pool.publish(batch, [relay], on_result)
+        for event_id, relay_results in batch_results.items():
+            results[event_id].update(relay_results)
+
+        if verify:
+            unconfirmed = [
+                event
+                for event in events
+                if results[event["id"]].get(relay, (False, ""))[1] != CONFIRMED
+                and classify(*results[event["id"]][relay]) != PERMANENT
+            ]
+            with metrics.stage("confirm"):
+                found = (await confirm_events(pool, unconfirmed, [relay]))[relay]
+            for event in unconfirmed:
+                if event["id"] in found:
+                    results[event["id"]][relay] = (True, CONFIRMED)
+                elif results[event["id"]][relay][0]:
+                    results[event["id"]][relay] = (
+                        False,
+                        "missing: accepted but not returned by relay",
+                    )
+
+        if journal is not None:
+            journal.record(results)
+
+        sent = {event["id"] for event in batch}
+        outcomes = [classify(*results[event["id"]][relay]) for event in events]
+        batch = [event for event, o in zip(events, outcomes) if o == RETRY]
+        # Rate-limited events are paced by the pool's scheduler, which has
+        # already slowed down; anything else waits out a backoff
+        failed = [
+            event
+            for event in batch
+            if not results[event["id"]][relay][1].startswith(RATE_LIMITED_PREFIX)
+        ]
+        # A relay that rejects bad events or throttles is healthy; one that
+        # accepts none of this attempt's events for other retryable reasons
+        # is not, whatever it accepted in earlier attempts
+        if not failed or any(
+            outcome == ACCEPTED
+            for event, outcome in zip(events, outcomes)
+            if event["id"] in sent
+        ):
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        if batch and attempts < max_retries:
+            if len(failed) < len(batch):
+                rate = pool.scheduler.rate(relay)
+                print(
+                    f"Debug: {len(batch) - len(failed)} rate-limited event(s) to "
+                    f"resend to {relay}"
+                    + (f" at {rate:.1f}/s" if rate is not None else "")
                 )
+            if failed:
+                wait = policy.delay(attempts)
+                print(
+                    f"Debug: {len(failed)} event(s) to retry on {relay} in "
+                    f"{wait:.1f}s ({results[failed[0]['id']][relay][1]})"
+                )
+                await asyncio.sleep(wait)
+
+
+async def publish_events_async(
+    pool: RelayPool,
+    events: List[dict],
+    max_retries: int = 3,
+    delay: float = 1,
+    verify: bool = False,
+    journal=None,
+    policy: Optional[RetryPolicy] = None,
+    relays: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Tuple[bool, str]]]:
+    """Publish a batch through an open pool, retrying rejected events per relay
+
+    Each relay is retried on its own, with exponential backoff and jitter
+    (policy, or delay as the base delay), so a slow or failing relay does
+    not hold up the others. Permanent rejections (invalid, blocked, ...)
+    are not retried, and a relay whose circuit breaker is open is parked
+    instead of being waited on.
+
+    With verify, a relay's OK is only the first signal: once the batch is
+    out, one REQ per relay checks which events actually landed and only
+    the missing ones are sent again.
+
+    With a journal (modules/publish_journal), relay answers are recorded
+    as they arrive and each attempt's outcome before the next one starts.
+
+    relays limits publishing to some of the pool's relays (default: all).
+
+    Returns:
+        {event_id: {relay: (accepted, message)}}
+    """
+    policy = policy or RetryPolicy(base_delay=delay)
+    targets = relays or pool.relays
+    results = {event["id"]: {} for event in events}
+    await asyncio.gather(
+        *(
+            _publish_to_relay(
+                pool, relay, events, results, max_retries, policy, verify, journal
+            )
+            for relay in targets
+        )
+    )
+
+    for relay in targets:
+        if verify:
+            confirmed_count = sum(
+                1
+                for relay_results in results.values()
+                if relay_results.get(relay, (False, ""))[0]
+            )
+            print(f"Debug: {relay} confirmed {confirmed_count}/{len(results)} event(s)")
+        rejected = [
+            relay_results.get(relay, (False, ""))[1]
+            for relay_results in results.values()
+            if not relay_results.get(relay, (False, ""))[0]
+        ]
+        if rejected:
+            print(
+                f"Debug: {len(rejected)} event(s) not accepted by {relay}: "
+                f"{rejected[0]}"
+            )
+    return results
+
+
+def publish_events(
+    events: List[dict],
+    relays: List[str],
+    max_retries: int = 3,
+    delay: float = 1,
+    verify: bool = False,
+) -> Dict[str, Dict[str, Tuple[bool, str]]]:
+    """Publish a batch of events over one persistent connection per relay
+
+    Args:
+        delay: Base delay of the exponential backoff between attempts
+        verify: Confirm the batch with one REQ per relay after publishing
+            and re-send whatever is missing
 
-                if verify_result.returncode == 0 and verify_result.stdout:
-                    print("Debug: Event verified on relay")
-                    success = True
-                else:
-                    print("Debug: Could not verify event on relay")
-                    if attempts < max_retries:
-                        print(f"Debug: Retrying after {delay} seconds...")
-                        time.sleep(delay)
+    Returns:
+        {event_id: {relay: (accepted, message)}}
+    """
+    print(f"\nDebug: Publishing {len(events)} event(s) to relays: {relays}")
 
-        return success
+    async def run():
+        async with RelayPool(relays) as pool:
+            return await publish_events_async(pool, events, max_retries, delay, verify)
 
-    except subprocess.TimeoutExpired:
-        print("Error: Publishing timed out")
-        return False
+    try:
+        return asyncio.run(run())
     except Exception as e:
-        print(f"Error publishing event: {e}")
-        return False
+        print(f"Error publishing events: {e}")
+        return {
+            event["id"]: {relay: (False, str(e)) for relay in relays}
+            for event in events
+        }
+
+
+def publish_event(
+    event: dict, relays: List[str], max_retries: int = 3, delay: float = 1
+) -> bool:
+    """Publish an event to specified relays"""
+    print(f"Debug: Event tags: {json.dumps(event.get('tags', []), indent=2)}")
+    results = publish_events([event], relays, max_retries, delay)
+    success = publish_succeeded(results[event["id"]])
+    if success:
+        print("Debug: Event published successfully")
+    return success
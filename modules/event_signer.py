@@ -0,0 +1,103 @@
+"""
+In-process NIP-01 event signing.
+
+Computes event ids and BIP-340 signatures without spawning nak, and can
+spread large batches over a process pool.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from . import schnorr
+from .nip19 import decode_private_key
+
+# Below this many events a process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+
+def serialize_event(event: Dict) -> bytes:
+    """Return the NIP-01 canonical serialization used to compute the id"""
+    return json.dumps(
+        [
+            0,
+            event["pubkey"],
+            event["created_at"],
+            event["kind"],
+            event["tags"],
+            event["content"],
+        ],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def compute_event_id(event: Dict) -> str:
+    """Compute the hex event id of an event (pubkey must be set)"""
+    return hashlib.sha256(serialize_event(event)).hexdigest()
+
+
+def get_public_key(private_key: str) -> str:
+    """Return the hex x-only public key for an nsec or hex private key"""
+    return schnorr.public_key(decode_private_key(private_key)).hex()
+
+
+def sign_event(template: Dict, private_key: str) -> Dict:
+    """Sign an event template (kind, content, tags, created_at).
+
+    Returns the signed event with fields in the same order nak prints them.
+    """
+    secret = decode_private_key(private_key)
+    event = {
+        "kind": template["kind"],
+        "id": "",
+        "pubkey": schnorr.public_key(secret).hex(),
+        "created_at": template["created_at"],
+        "tags": template["tags"],
+        "content": template["content"],
+    }
+    event_id = compute_event_id(event)
+    event["id"] = event_id
+    event["sig"] = schnorr.sign(secret, bytes.fromhex(event_id)).hex()
+    return event
+
+
+def _sign_chunk(args) -> List[Dict]:
+    templates, private_key = args
+    return [sign_event(template, private_key) for template in templates]
+
+
+def sign_events(
+    templates: List[Dict],
+    private_key: str,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> List[Dict]:
+    """Sign a list of event templates, preserving order.
+
+    Args:
+        templates: Event templates with kind, content, tags and created_at
+        private_key: nsec or hex private key
+        workers: Number of processes (default: CPU count for large batches)
+        executor: Process pool to use instead of starting one
+    """
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(templates) >= PARALLEL_THRESHOLD else 1
+
+    if workers <= 1 or len(templates) < 2:
+        return [sign_event(template, private_key) for template in templates]
+
+    chunk_size = max(1, -(-len(templates) // (workers * 4)))
+    chunks = [
+        (templates[i : i + chunk_size], private_key)
+        for i in range(0, len(templates), chunk_size)
+    ]
+    if executor is not None:
+        return [event for chunk in executor.map(_sign_chunk, chunks) for event in chunk]
+    signed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in pool.map(_sign_chunk, chunks):
+            signed.extend(chunk)
+    return signed
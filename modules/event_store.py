@@ -0,0 +1,259 @@
+"""
+Local SQLite store of Nostr events shared by the fetch, embed and delete
+tools.
+
+Events are indexed by id, by kind+pubkey+d-tag coordinate, by created_at
+and by the e/a tags they reference. Replaceable and addressable events
+keep NIP-01 semantics: only the newest version of a coordinate is kept.
+Per-relay since cursors let a tool ask a relay only for events newer than
+what it already has.
+"""
+
+import json
+import sqlite3
+from typing import Dict, Iterator, List, Optional
+
+# Tags indexed for reverse lookups
+INDEXED_TAGS = ("e", "a")
+
+
+def is_replaceable(kind: int) -> bool:
+    return kind in (0, 3) or 10000 <= kind < 20000
+
+
+def is_addressable(kind: int) -> bool:
+    return 30000 <= kind < 40000
+
+
+def replaceable_coordinate(event: Dict) -> Optional[str]:
+    """Coordinate of a replaceable/addressable event, None for regular events"""
+    kind = event["kind"]
+    if is_replaceable(kind):
+        return f"{kind}:{event['pubkey']}:"
+    if is_addressable(kind):
+        d_tag = next((tag[1] for tag in event["tags"] if tag[0] == "d"), "")
+        return f"{kind}:{event['pubkey']}:{d_tag}"
+    return None
+
+
+def _filter_key(query_filter: Dict) -> str:
+    """Canonical form of a filter, without its time window"""
+    window = ("since", "until", "limit")
+    return json.dumps(
+        {k: v for k, v in query_filter.items() if k not in window}, sort_keys=True
+    )
+
+
+class EventStore:
+    """SQLite (WAL) event store with replaceable-event semantics"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id TEXT PRIMARY KEY,
+                pubkey TEXT NOT NULL,
+                kind INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
+                coordinate TEXT,
+                event TEXT NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS events_coordinate
+                ON events(coordinate) WHERE coordinate IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS events_kind_pubkey
+                ON events(kind, pubkey, created_at);
+            CREATE INDEX IF NOT EXISTS events_created_at ON events(created_at);
+            CREATE TABLE IF NOT EXISTS tags (
+                event_id TEXT NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+                name TEXT NOT NULL,
+                value TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tags_value ON tags(name, value);
+            CREATE INDEX IF NOT EXISTS tags_event ON tags(event_id);
+            CREATE TABLE IF NOT EXISTS cursors (
+                relay TEXT NOT NULL,
+                filter TEXT NOT NULL,
+                since INTEGER NOT NULL,
+                PRIMARY KEY (relay, filter)
+            );
+            """)
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.commit()
+
+    def _insert(self, event: Dict) -> bool:
+        coordinate = replaceable_coordinate(event)
+        if coordinate is not None:
+            current = self._db.execute(
+                "SELECT id, created_at FROM events WHERE coordinate = ?", (coordinate,)
+            ).fetchone()
+            if current is not None:
+                # Newest wins; on a created_at tie the lowest id wins (NIP-01)
+                if (event["created_at"], current[0]) <= (current[1], event["id"]):
+                    return False
+                self._db.execute("DELETE FROM events WHERE id = ?", (current[0],))
+
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                event["id"],
+                event["pubkey"],
+                event["kind"],
+                event["created_at"],
+                coordinate,
+                json.dumps(event, ensure_ascii=False),
+            ),
+        )
+        if cursor.rowcount == 0:
+            return False
+        self._db.executemany(
+            "INSERT INTO tags VALUES (?, ?, ?)",
+            [
+                (event["id"], tag[0], tag[1])
+                for tag in event["tags"]
+                if len(tag) > 1 and tag[0] in INDEXED_TAGS
+            ],
+        )
+        return True
+
+    def add(self, event: Dict) -> bool:
+        """Store a (verified) event; returns False if it is known or outdated"""
+        added = self._insert(event)
+        self._db.commit()
+        return added
+
+    def add_many(self, events: List[Dict]) -> int:
+        """Store verified events in one transaction; returns how many were new"""
+        added = sum(self._insert(event) for event in events)
+        self._db.commit()
+        return added
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict]:
+        """Events by id (missing ids are left out)"""
+        found = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            rows = self._db.execute(
+                f"SELECT id, event FROM events WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            found.update((row[0], json.loads(row[1])) for row in rows)
+        return found
+
+    def get(self, event_id: str) -> Optional[Dict]:
+        return self.get_many([event_id]).get(event_id)
+
+    def latest_many(self, coordinates: List[str]) -> Dict[str, Dict]:
+        """Current version of each replaceable/addressable coordinate"""
+        found = {}
+        for start in range(0, len(coordinates), 500):
+            chunk = coordinates[start : start + 500]
+            rows = self._db.execute(
+                "SELECT coordinate, event FROM events "
+                f"WHERE coordinate IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            found.update((row[0], json.loads(row[1])) for row in rows)
+        return found
+
+    def iter_events(
+        self,
+        kinds: Optional[List[int]] = None,
+        authors: Optional[List[str]] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        page_size: int = 500,
+    ) -> Iterator[Dict]:
+        """Yield matching events newest first, a page at a time
+
+        Pages are keyed on (created_at, id), so events may be removed from
+        the store while iterating.
+        """
+        clauses, params = [], []
+        if kinds:
+            clauses.append(f"kind IN ({','.join('?' * len(kinds))})")
+            params.extend(kinds)
+        if authors:
+            clauses.append(f"pubkey IN ({','.join('?' * len(authors))})")
+            params.extend(authors)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at <= ?")
+            params.append(until)
+        last = None
+        while True:
+            page_clauses, page_params = list(clauses), list(params)
+            if last is not None:
+                page_clauses.append("(created_at < ? OR (created_at = ? AND id > ?))")
+                page_params.extend([last[0], last[0], last[1]])
+            where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
+            rows = self._db.execute(
+                f"SELECT created_at, id, event FROM events {where} "
+                "ORDER BY created_at DESC, id LIMIT ?",
+                page_params + [page_size],
+            ).fetchall()
+            for row in rows:
+                yield json.loads(row[2])
+            if len(rows) < page_size:
+                return
+            last = rows[-1][:2]
+
+    def referencing(
+        self, name: str, values: List[str], kinds: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """Events with a `name` tag (e or a) pointing at any of values"""
+        found = {}
+        for start in range(0, len(values), 500):
+            chunk = values[start : start + 500]
+            query = (
+                "SELECT DISTINCT events.id, events.event FROM tags "
+                "JOIN events ON events.id = tags.event_id "
+                f"WHERE tags.name = ? AND tags.value IN ({','.join('?' * len(chunk))})"
+            )
+            params = [name] + chunk
+            if kinds:
+                query += f" AND events.kind IN ({','.join('?' * len(kinds))})"
+                params += kinds
+            found.update(
+                (row[0], json.loads(row[1])) for row in self._db.execute(query, params)
+            )
+        return list(found.values())
+
+    def remove(self, ids: List[str]) -> int:
+        """Forget events (e.g. after deleting them on relays)"""
+        removed = self._db.executemany(
+            "DELETE FROM events WHERE id = ?", [(event_id,) for event_id in ids]
+        ).rowcount
+        self._db.commit()
+        return removed
+
+    def remove_coordinates(self, coordinates: List[str]) -> int:
+        removed = self._db.executemany(
+            "DELETE FROM events WHERE coordinate = ?",
+            [(coordinate,) for coordinate in coordinates],
+        ).rowcount
+        self._db.commit()
+        return removed
+
+    def get_cursor(self, relay: str, query_filter: Dict) -> Optional[int]:
+        """Newest created_at already synced from relay for this filter"""
+        row = self._db.execute(
+            "SELECT since FROM cursors WHERE relay = ? AND filter = ?",
+            (relay, _filter_key(query_filter)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, relay: str, query_filter: Dict, since: int) -> None:
+        self._db.execute(
+            "INSERT INTO cursors VALUES (?, ?, ?) "
+            "ON CONFLICT(relay, filter) DO UPDATE SET since = MAX(since, excluded.since)",
+            (relay, _filter_key(query_filter), since),
+        )
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
@@ -1,5 +1,5 @@
 from typing import List, Dict
-from .event_creator import create_event, create_a_tag
+from .event_creator import create_event, create_events, create_a_tag
 
 
 def print_event_summary(event: dict) -> None:
@@ -43,18 +43,27 @@ def get_title_from_tags(tags: List[List[str]]) -> str:
     return "Untitled"
 
 
+def traceback_template(link_a_tag, parent_a_tag) -> Dict:
+    """Build the unsigned 30043 event linking a section back to its index"""
+    return {
+        "kind": 30043,
+        "content": "",
+        "tags": [link_a_tag, parent_a_tag, ["link-kind", "30041"]],
+    }
+
+
 def create_traceback_event(link_a_tag, parent_a_tag, primary_relay, key, decrypt=False):
+    template = traceback_template(link_a_tag, parent_a_tag)
     return create_event(
-        30043, "", [link_a_tag, parent_a_tag, ["link-kind", "30041"]], key, decrypt
+        template["kind"], template["content"], template["tags"], key, decrypt
     )
 
 
 def create_traceback_events_from_index(index_event, primary_relay, key, decrypt=False):
-    events = []
     index_a_tag = create_a_tag(index_event, primary_relay)
-    for tag in index_event["tags"]:
-        if tag[0] == "a":
-            events.append(
-                create_traceback_event(tag, index_a_tag, primary_relay, key, decrypt)
-            )
-    return events
+    templates = [
+        traceback_template(tag, index_a_tag)
+        for tag in index_event["tags"]
+        if tag[0] == "a"
+    ]
+    return create_events(templates, key, decrypt)
@@ -1,35 +1,103 @@
-import subprocess
-import sys
-import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional
 
+from . import metrics, schnorr
+from .event_signer import PARALLEL_THRESHOLD, compute_event_id
 
-def verify_event(event: dict, debug: bool = False) -> bool:
-    """Verify a Nostr event using nak"""
+
+def check_event(event: dict) -> Dict:
+    """Check an event's id and signature.
+
+    Returns:
+        Dict with the event id, whether it is valid and the failure reason
+    """
+    event_id = event.get("id", "") if isinstance(event, dict) else ""
     try:
-        if debug:
-            print("\nDebug: Verifying event:")
-            print(f"Debug: Event ID: {event['id']}")
-
-        result = subprocess.run(
-            ["nak", "verify"],
-            input=json.dumps(event).encode(),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=10,
-        )
-
-        if result.returncode != 0:
-            print("Debug: Verification failed:")
-            print(f"Debug: stdout: {result.stdout.decode()}")
-            print(f"Debug: stderr: {result.stderr.decode()}")
+        for field in ("id", "pubkey", "sig", "kind", "created_at", "tags", "content"):
+            if field not in event:
+                return {"id": event_id, "valid": False, "error": f"missing {field}"}
+
+        if compute_event_id(event) != event_id:
+            return {"id": event_id, "valid": False, "error": "id mismatch"}
+
+        if not schnorr.verify(
+            bytes.fromhex(event["pubkey"]),
+            bytes.fromhex(event_id),
+            bytes.fromhex(event["sig"]),
+        ):
+            return {"id": event_id, "valid": False, "error": "invalid signature"}
+
+        return {"id": event_id, "valid": True, "error": ""}
+    except (ValueError, TypeError, KeyError) as e:
+        return {"id": event_id, "valid": False, "error": f"malformed event: {e}"}
+
+
+def _check_chunk(events: List[dict]) -> List[Dict]:
+    return [check_event(event) for event in events]
+
+
+def verify_events(
+    events: List[dict],
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> List[Dict]:
+    """Verify a batch of events, returning one result per event in order
+
+    Args:
+        events: Events to verify
+        workers: Number of processes (default: CPU count for large batches)
+        executor: Process pool to use instead of starting one
+    """
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(events) >= PARALLEL_THRESHOLD else 1
+
+    with metrics.stage("verify"):
+        if workers <= 1 or len(events) < 2:
+            return _check_chunk(events)
+
+        chunk_size = max(1, -(-len(events) // (workers * 4)))
+        chunks = [events[i : i + chunk_size] for i in range(0, len(events), chunk_size)]
+        if executor is not None:
+            return [
+                result
+                for chunk in executor.map(_check_chunk, chunks)
+                for result in chunk
+            ]
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(_check_chunk, chunks):
+                results.extend(chunk)
+        return results
+
+
+def filter_valid_events(events: List[dict], label: str = "event") -> List[dict]:
+    """Drop events whose id or signature does not check out, with a warning"""
+    valid = []
+    for event, result in zip(events, verify_events(events)):
+        if result["valid"]:
+            valid.append(event)
         else:
-            if debug:
-                print("Debug: Event verified successfully")
-
-        return result.returncode == 0
-    except subprocess.TimeoutExpired:
-        print("Error: Verification timed out")
-        return False
-    except Exception as e:
-        print(f"Error verifying event: {e}")
-        return False
+            print(
+                f"Warning: Discarding {label} {result['id'] or '<no id>'}: "
+                f"{result['error']}"
+            )
+    return valid
+
+
+def verify_event(event: dict, debug: bool = False) -> bool:
+    """Verify a Nostr event's id and signature"""
+    if debug:
+        print("\nDebug: Verifying event:")
+        print(f"Debug: Event ID: {event.get('id')}")
+
+    with metrics.stage("verify"):
+        result = check_event(event)
+
+    if not result["valid"]:
+        print("Debug: Verification failed:")
+        print(f"Debug: {result['error']}")
+    elif debug:
+        print("Debug: Event verified successfully")
+
+    return result["valid"]
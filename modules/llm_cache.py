@@ -0,0 +1,149 @@
+"""
+Persistent cache of LLM responses.
+
+Entries are keyed by a hash of the model name, the prompt template and the
+input content, so identical code gets the same analysis back no matter
+which file it lives in. The store is a single SQLite file with LRU
+eviction once it grows past a size limit.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = ".analysis_cache.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_key(model: str, template: str, content: str) -> str:
+    """Content address of one request"""
+    digest = hashlib.sha256()
+    for part in (model, template, content):
+        data = part.encode("utf-8")
+        # Length-prefix each part so boundaries cannot be shifted
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with size-bounded LRU eviction"""
+
+    def __init__(
+        self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_model ON responses(model)"
+        )
+        # Apply a lowered size limit straight away
+        self._evict()
+        self._db.commit()
+
+    def get(self, model: str, template: str, content: str) -> Optional[str]:
+        """Return the cached response, or None on a miss"""
+        key = cache_key(model, template, content)
+        row = self._db.execute(
+            "SELECT response FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute(
+            "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        self._db.commit()
+        return row[0]
+
+    def put(self, model: str, template: str, content: str, response: str) -> None:
+        """Store a response and evict least recently used entries if over the limit"""
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                cache_key(model, template, content),
+                model,
+                response,
+                len(response.encode("utf-8")),
+                now,
+                now,
+            ),
+        )
+        self._evict()
+        self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_used ASC"
+        ):
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def invalidate(self, model: Optional[str] = None) -> int:
+        """Drop every entry for a model (or all entries); returns how many"""
+        if model is None:
+            cursor = self._db.execute("DELETE FROM responses")
+        else:
+            cursor = self._db.execute("DELETE FROM responses WHERE model = ?", (model,))
+        self._db.commit()
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        """Hit/miss counts for this session plus the size of the store"""
+        entries, size = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def print_stats(self) -> None:
+        stats = self.stats()
+        print(
+            f"Cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.1%} hit rate), {stats['evictions']} evicted, "
+            f"{stats['entries']} entries / {stats['bytes'] / 1024 / 1024:.1f} MB "
+            f"in {self.path}"
+        )
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,265 @@
+"""
+Optional run metrics for the conversion and publishing tools.
+
+Records wall time and call counts per pipeline stage, latency histograms
+for external calls (nak subprocesses, relay round trips, LLM requests),
+serialized event sizes per kind and accepted/failed results per relay.
+Reports are written as JSON or Prometheus text.
+
+Nothing is recorded until enable() is called; until then stage() and
+call() hand back one shared no-op context manager and the record
+functions return immediately. Stages are also the unit of the profiler
+(modules/profiler), which works with or without metrics enabled.
+
+Usage:
+    with metrics.stage("parse"):
+        doc = parse_adoc_document(path)
+    with metrics.call("nak"):
+        subprocess.run(...)
+"""
+
+import atexit
+import contextlib
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from . import profiler
+
+# Seconds; external calls range from sub-millisecond to relay timeouts
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+# Bytes of a serialized event
+SIZE_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 131072, 524288)
+
+FORMATS = ("json", "prometheus")
+_PREFIX = "nip62"
+
+_NOOP = contextlib.nullcontext()
+
+
+class Histogram:
+    """Count, sum, min/max and bucketed counts of observed values"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, observations at or below it), ending with +Inf"""
+        total, result = 0, []
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "buckets": dict(self.cumulative()),
+        }
+
+
+class Metrics:
+    """Everything recorded during one run"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages: Dict[str, Histogram] = {}
+        self.calls: Dict[str, Histogram] = {}
+        self.event_bytes: Dict[str, Histogram] = {}
+        self.relays: Dict[str, Dict[str, int]] = {}
+
+    def observe(self, table: Dict[str, Histogram], name: str, value: float) -> None:
+        histogram = table.get(name)
+        if histogram is None:
+            buckets = SIZE_BUCKETS if table is self.event_bytes else LATENCY_BUCKETS
+            histogram = table[name] = Histogram(buckets)
+        histogram.observe(value)
+
+    def to_dict(self) -> Dict:
+        return {
+            "started": self.started,
+            "duration": time.time() - self.started,
+            "stages": {name: h.to_dict() for name, h in self.stages.items()},
+            "calls": {name: h.to_dict() for name, h in self.calls.items()},
+            "event_bytes": {kind: h.to_dict() for kind, h in self.event_bytes.items()},
+            "relays": {
+                relay: dict(
+                    results,
+                    success_rate=results["ok"] / (results["ok"] + results["failed"]),
+                )
+                for relay, results in self.relays.items()
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        histograms = (
+            ("stage_seconds", "stage", self.stages, "Wall time per pipeline stage"),
+            ("call_seconds", "call", self.calls, "Latency of external calls"),
+            ("event_bytes", "kind", self.event_bytes, "Serialized event size"),
+        )
+        for metric, label, table, description in histograms:
+            if not table:
+                continue
+            name = f"{_PREFIX}_{metric}"
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+            for key, histogram in table.items():
+                labels = f'{label}="{_escape(key)}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        if self.relays:
+            name = f"{_PREFIX}_relay_results_total"
+            lines += [
+                f"# HELP {name} Events accepted or not by each relay",
+                f"# TYPE {name} counter",
+            ]
+            for relay, results in self.relays.items():
+                for result, count in results.items():
+                    lines.append(
+                        f'{name}{{relay="{_escape(relay)}",result="{result}"}} {count}'
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Timer:
+    def __init__(self, table: Dict[str, Histogram], name: str):
+        self.table = table
+        self.name = name
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if _metrics is not None and self.table is not None:
+            _metrics.observe(self.table, self.name, time.perf_counter() - self.start)
+
+
+class _Stage(_Timer):
+    def __enter__(self) -> "_Stage":
+        profiler.enter(self.name)
+        return super().__enter__()
+
+    def __exit__(self, *exc) -> None:
+        super().__exit__(*exc)
+        profiler.leave(self.name)
+
+
+_metrics: Optional[Metrics] = None
+
+
+def enable() -> Metrics:
+    """Start recording (idempotent)"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+def enabled() -> bool:
+    return _metrics is not None
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage"""
+    if _metrics is None:
+        return _Stage(None, name) if profiler.active() else _NOOP
+    return _Stage(_metrics.stages, name)
+
+
+def call(name: str):
+    """Context manager timing one external call (nak, relay, llm)"""
+    if _metrics is None:
+        return _NOOP
+    return _Timer(_metrics.calls, name)
+
+
+def observe_call(name: str, seconds: float) -> None:
+    """Record an external call timed by the caller"""
+    if _metrics is not None:
+        _metrics.observe(_metrics.calls, name, seconds)
+
+
+def observe_event(event: Dict, frame: Optional[str] = None) -> None:
+    """Record an event's serialized size (of frame, if already serialized)"""
+    if _metrics is None:
+        return
+    size = len((frame or json.dumps(event, ensure_ascii=False)).encode("utf-8"))
+    _metrics.observe(_metrics.event_bytes, str(event.get("kind")), size)
+
+
+def relay_result(relay: str, ok: bool) -> None:
+    """Count one event accepted (or not) by a relay"""
+    if _metrics is None:
+        return
+    results = _metrics.relays.setdefault(relay, {"ok": 0, "failed": 0})
+    results["ok" if ok else "failed"] += 1
+
+
+def write_report(path: str, fmt: str = "json") -> None:
+    """Write what has been recorded so far"""
+    if _metrics is None:
+        return
+    if fmt == "prometheus":
+        text = _metrics.to_prometheus()
+    else:
+        text = json.dumps(_metrics.to_dict(), indent=2) + "\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def report_at_exit(path: str, fmt: str = "json") -> None:
+    """Enable metrics and write the report when the process exits,
+    including through sys.exit()"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown metrics format: {fmt}")
+    enable()
+
+    def write():
+        write_report(path, fmt)
+        print(f"Metrics written to {path}")
+
+    atexit.register(write)
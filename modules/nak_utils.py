@@ -0,0 +1,11 @@
+from typing import Dict
+
+from .nip19 import decode
+
+
+def nak_decode(value: str) -> Dict:
+    """Decode a NIP-19 entity (npub, nsec, note, nevent, naddr, nprofile).
+
+    Returns the same dictionary shape as `nak decode`, computed in-process.
+    """
+    return decode(value)
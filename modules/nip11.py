@@ -0,0 +1,72 @@
+"""
+NIP-11 relay information documents.
+
+A relay serves its information document over plain HTTP(S) at the
+websocket URL when asked for application/nostr+json. Only the
+"limitation" object matters to the publishing tools.
+"""
+
+import asyncio
+import json
+import ssl
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+CONTENT_TYPE = "application/nostr+json"
+
+
+async def fetch_relay_info(url: str, timeout: float = 5) -> Dict:
+    """Fetch a relay's NIP-11 document
+
+    Returns:
+        The document, or {} when the relay does not serve one
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("ws", "wss"):
+        return {}
+    secure = parsed.scheme == "wss"
+    host = parsed.hostname
+    port = parsed.port or (443 if secure else 80)
+    host_header = host if parsed.port is None else f"{host}:{parsed.port}"
+    ssl_context: Optional[ssl.SSLContext] = (
+        ssl.create_default_context() if secure else None
+    )
+
+    # HTTP/1.0 so the body comes unchunked and ends with the connection
+    request = (
+        f"GET {parsed.path or '/'} HTTP/1.0\r\n"
+        f"Host: {host_header}\r\n"
+        f"Accept: {CONTENT_TYPE}\r\n"
+        "\r\n"
+    )
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host, port, ssl=ssl_context, server_hostname=host if secure else None
+            ),
+            timeout,
+        )
+        try:
+            writer.write(request.encode())
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout)
+        finally:
+            writer.close()
+    except (OSError, ConnectionError, asyncio.TimeoutError):
+        return {}
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = head.split(b" ", 2)
+    if len(status) < 2 or status[1] != b"200":
+        return {}
+    try:
+        info = json.loads(body)
+    except ValueError:
+        return {}
+    return info if isinstance(info, dict) else {}
+
+
+def relay_limits(info: Dict) -> Dict:
+    """The "limitation" object of a NIP-11 document ({} if missing)"""
+    limits = info.get("limitation")
+    return limits if isinstance(limits, dict) else {}
@@ -0,0 +1,159 @@
+"""
+NIP-19 bech32 entities (npub, nsec, note, nevent, naddr, nprofile).
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+_GENERATOR = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+
+# TLV types from NIP-19
+TLV_SPECIAL = 0
+TLV_RELAY = 1
+TLV_AUTHOR = 2
+TLV_KIND = 3
+
+
+def _polymod(values: List[int]) -> int:
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1FFFFFF) << 5 ^ value
+        for i in range(5):
+            chk ^= _GENERATOR[i] if ((top >> i) & 1) else 0
+    return chk
+
+
+def _hrp_expand(hrp: str) -> List[int]:
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+
+def _convert_bits(data, from_bits: int, to_bits: int, pad: bool) -> List[int]:
+    acc = 0
+    bits = 0
+    result = []
+    maxv = (1 << to_bits) - 1
+    for value in data:
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            result.append((acc >> bits) & maxv)
+    if pad and bits:
+        result.append((acc << (to_bits - bits)) & maxv)
+    elif not pad and (bits >= from_bits or ((acc << (to_bits - bits)) & maxv)):
+        raise ValueError("Invalid bech32 padding")
+    return result
+
+
+def bech32_encode(hrp: str, data: bytes) -> str:
+    """Encode bytes as a bech32 string with the given prefix"""
+    words = _convert_bits(data, 8, 5, True)
+    polymod = _polymod(_hrp_expand(hrp) + words + [0] * 6) ^ 1
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + "1" + "".join(_CHARSET[d] for d in words + checksum)
+
+
+def bech32_decode(value: str) -> Tuple[str, bytes]:
+    """Decode a bech32 string into (prefix, bytes)"""
+    value = value.strip().lower()
+    pos = value.rfind("1")
+    if pos < 1 or pos + 7 > len(value):
+        raise ValueError(f"Invalid bech32 string: {value}")
+    hrp = value[:pos]
+    try:
+        words = [_CHARSET.index(c) for c in value[pos + 1 :]]
+    except ValueError:
+        raise ValueError(f"Invalid bech32 character in: {value}")
+    if _polymod(_hrp_expand(hrp) + words) != 1:
+        raise ValueError(f"Invalid bech32 checksum: {value}")
+    return hrp, bytes(_convert_bits(words[:-6], 5, 8, False))
+
+
+def _parse_tlv(data: bytes) -> Dict[int, List[bytes]]:
+    tlv = {}
+    i = 0
+    while i + 2 <= len(data):
+        t, length = data[i], data[i + 1]
+        value = data[i + 2 : i + 2 + length]
+        if len(value) != length:
+            raise ValueError("Truncated TLV entry")
+        tlv.setdefault(t, []).append(value)
+        i += 2 + length
+    return tlv
+
+
+def _encode_tlv(entries: List[Tuple[int, bytes]]) -> bytes:
+    data = b""
+    for t, value in entries:
+        data += bytes([t, len(value)]) + value
+    return data
+
+
+def decode(value: str) -> Dict:
+    """Decode a NIP-19 entity into a dict shaped like `nak decode` output"""
+    if value.startswith("nostr:"):
+        value = value[len("nostr:") :]
+    hrp, data = bech32_decode(value)
+
+    if hrp == "npub":
+        return {"pubkey": data.hex()}
+    if hrp == "nsec":
+        return {"private_key": data.hex()}
+    if hrp == "note":
+        return {"id": data.hex()}
+
+    tlv = _parse_tlv(data)
+    relays = [r.decode("utf-8") for r in tlv.get(TLV_RELAY, [])]
+    special = tlv.get(TLV_SPECIAL, [b""])[0]
+    author = tlv.get(TLV_AUTHOR, [b""])[0].hex()
+    kind = tlv.get(TLV_KIND)
+    kind = int.from_bytes(kind[0], "big") if kind else None
+
+    if hrp == "nprofile":
+        return {"pubkey": special.hex(), "relays": relays}
+    if hrp == "nevent":
+        result = {"id": special.hex(), "relays": relays}
+        if author:
+            result["author"] = author
+        if kind is not None:
+            result["kind"] = kind
+        return result
+    if hrp == "naddr":
+        return {
+            "identifier": special.decode("utf-8"),
+            "pubkey": author,
+            "kind": kind,
+            "relays": relays,
+        }
+    raise ValueError(f"Unsupported NIP-19 prefix: {hrp}")
+
+
+def encode_nevent(
+    event_id: str, relays: List[str], author: Optional[str] = None
+) -> str:
+    """Encode an event id with relay and author hints as nevent"""
+    entries = [(TLV_SPECIAL, bytes.fromhex(event_id))]
+    entries.extend((TLV_RELAY, relay.encode("utf-8")) for relay in relays)
+    if author:
+        entries.append((TLV_AUTHOR, bytes.fromhex(author)))
+    return bech32_encode("nevent", _encode_tlv(entries))
+
+
+def encode_naddr(kind: int, pubkey: str, identifier: str, relays: List[str]) -> str:
+    """Encode an addressable event coordinate as naddr"""
+    entries = [(TLV_SPECIAL, identifier.encode("utf-8"))]
+    entries.extend((TLV_RELAY, relay.encode("utf-8")) for relay in relays)
+    entries.append((TLV_AUTHOR, bytes.fromhex(pubkey)))
+    entries.append((TLV_KIND, kind.to_bytes(4, "big")))
+    return bech32_encode("naddr", _encode_tlv(entries))
+
+
+def decode_private_key(key: str) -> bytes:
+    """Return raw private key bytes from an nsec or 64-char hex string"""
+    key = key.strip()
+    if key.startswith("nsec"):
+        return bytes.fromhex(decode(key)["private_key"])
+    if len(key) == 64:
+        return bytes.fromhex(key)
+    raise ValueError("Private key must be nsec or 64-character hex")
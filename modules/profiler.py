@@ -0,0 +1,274 @@
+"""
+Per-stage profiling for the conversion and publishing tools.
+
+Each pipeline stage marked with metrics.stage() gets its own cProfile
+profiler; the profiler of the enclosing stage is paused while a nested
+stage runs, so every function call is counted in exactly one stage. Time
+outside any stage is profiled as "main".
+
+Besides the call statistics, each stage keeps its own wall and CPU time.
+Wall time the process spent without using the CPU is reported as blocked,
+split into waits on child processes (nak subprocesses, signing and
+verification worker pools) and everything else (sockets, sleeps).
+
+Written on exit, to a directory:
+    <stage>.pstats          cProfile statistics (python -m pstats, snakeviz)
+    profile.speedscope.json one flame graph per stage (https://speedscope.app)
+    summary.json            wall, CPU and blocked totals per stage
+
+The flame graphs are rebuilt from cProfile's caller/callee totals, so time
+is split between call paths in proportion to their calls rather than
+sampled.
+"""
+
+import atexit
+import cProfile
+import json
+import os
+import pstats
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT = "main"
+
+# (file name, function) whose cumulative time is spent waiting on child
+# processes; none of these call each other
+CHILD_WAITS = {
+    ("subprocess.py", "run"),
+    ("_base.py", "result_iterator"),
+    ("process.py", "shutdown"),
+}
+
+# Call paths below this share of a stage's time are left out of the
+# flame graph
+MIN_FRACTION = 0.001
+MAX_DEPTH = 128
+
+
+def _clock() -> Tuple[float, float, float]:
+    """(wall, process CPU, CPU of reaped child processes) in seconds"""
+    times = os.times()
+    return time.perf_counter(), time.process_time(), times[2] + times[3]
+
+
+class StageProfile:
+    """The cProfile profiler and time totals of one stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.children_cpu = 0.0
+        self._started: Optional[Tuple[float, float, float]] = None
+
+    def resume(self) -> None:
+        self._started = _clock()
+        self.profile.enable()
+
+    def pause(self) -> None:
+        self.profile.disable()
+        wall, cpu, children_cpu = _clock()
+        self.wall += wall - self._started[0]
+        self.cpu += cpu - self._started[1]
+        self.children_cpu += children_cpu - self._started[2]
+        self._started = None
+
+    def stats(self) -> pstats.Stats:
+        return pstats.Stats(self.profile)
+
+    def totals(self) -> Dict:
+        child_wait = sum(
+            entry[3]
+            for (filename, _, function), entry in self.stats().stats.items()
+            if (os.path.basename(filename), function) in CHILD_WAITS
+        )
+        blocked = max(0.0, self.wall - self.cpu)
+        blocked_children = min(child_wait, blocked)
+        return {
+            "calls": self.calls,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "blocked": blocked,
+            "blocked_children": blocked_children,
+            "blocked_other": blocked - blocked_children,
+            "children_cpu": self.children_cpu,
+        }
+
+
+class Profiler:
+    """Stack of running stages; only the innermost one is profiling"""
+
+    def __init__(self):
+        self.stages: Dict[str, StageProfile] = {}
+        self.stack: List[StageProfile] = []
+
+    def enter(self, name: str) -> None:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageProfile(name)
+        if self.stack:
+            self.stack[-1].pause()
+        stage.calls += 1
+        self.stack.append(stage)
+        stage.resume()
+
+    def leave(self, name: str) -> None:
+        # Concurrent tasks may leave stages out of order; a stage that is
+        # not innermost is already paused
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i].name == name:
+                break
+        else:
+            return
+        stage = self.stack.pop(i)
+        if i == len(self.stack):
+            stage.pause()
+            if self.stack:
+                self.stack[-1].resume()
+
+    def stop(self) -> None:
+        if self.stack:
+            self.stack[-1].pause()
+        self.stack.clear()
+
+
+def _speedscope_profile(
+    stage: StageProfile, frames: List[Dict], frame_index: Dict
+) -> Dict:
+    """A sampled speedscope profile of one stage with one sample per call path"""
+    stats = stage.stats().stats
+    callees: Dict[Tuple, Dict[Tuple, float]] = {}
+    roots = []
+    for function, (_, _, _, _, callers) in stats.items():
+        if function[2] == "<method 'disable' of '_lsprof.Profiler' objects>":
+            continue
+        known = [caller for caller in callers if caller in stats]
+        if not known:
+            roots.append(function)
+        for caller in known:
+            callees.setdefault(caller, {})[function] = callers[caller][3]
+
+    samples, weights = [], []
+    threshold = MIN_FRACTION * sum(stats[f][3] for f in roots)
+
+    def frame(function: Tuple) -> int:
+        if function not in frame_index:
+            filename, line, name = function
+            frame_index[function] = len(frames)
+            frames.append(
+                {"name": name, "file": filename, "line": line}
+                if filename != "~"
+                else {"name": name}
+            )
+        return frame_index[function]
+
+    def walk(function: Tuple, path: List[Tuple], seconds: float) -> None:
+        total = stats[function][3]
+        if total <= 0 or seconds < threshold or len(path) > MAX_DEPTH:
+            return
+        share = seconds / total
+        samples.append([frame(f) for f in path])
+        weights.append(stats[function][2] * share)
+        for callee, callee_seconds in callees.get(function, {}).items():
+            if callee not in path:
+                walk(callee, path + [callee], callee_seconds * share)
+
+    for root in roots:
+        walk(root, [root], stats[root][3])
+
+    return {
+        "type": "sampled",
+        "name": stage.name,
+        "unit": "seconds",
+        "startValue": 0,
+        "endValue": sum(weights),
+        "samples": samples,
+        "weights": weights,
+    }
+
+
+_profiler: Optional[Profiler] = None
+
+
+def enable() -> Profiler:
+    """Start profiling, with everything outside a stage counted as "main" """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+        _profiler.enter(ROOT)
+    return _profiler
+
+
+def active() -> bool:
+    return _profiler is not None
+
+
+def enter(name: str) -> None:
+    if _profiler is not None:
+        _profiler.enter(name)
+
+
+def leave(name: str) -> None:
+    if _profiler is not None:
+        _profiler.leave(name)
+
+
+def write(directory: str) -> Dict[str, Dict]:
+    """Stop profiling and write pstats, speedscope and summary files
+
+    Returns:
+        {stage: totals}
+    """
+    if _profiler is None:
+        return {}
+    _profiler.stop()
+    os.makedirs(directory, exist_ok=True)
+
+    summary, profiles, frames, frame_index = {}, [], [], {}
+    for name, stage in _profiler.stages.items():
+        summary[name] = stage.totals()
+        stage.profile.dump_stats(os.path.join(directory, f"{name}.pstats"))
+        profiles.append(_speedscope_profile(stage, frames, frame_index))
+
+    with open(os.path.join(directory, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    speedscope = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "name": os.path.basename(os.path.abspath(directory)),
+        "activeProfileIndex": 0,
+        "exporter": "nip62 profiler",
+    }
+    path = os.path.join(directory, "profile.speedscope.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(speedscope, f)
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict]) -> None:
+    print(
+        f"\n{'stage':<14}{'calls':>7}{'wall':>10}{'cpu':>10}"
+        f"{'wait child':>12}{'wait other':>12}{'child cpu':>11}"
+    )
+    for name, totals in sorted(summary.items(), key=lambda item: -item[1]["wall"]):
+        print(
+            f"{name:<14}{totals['calls']:>7}{totals['wall']:>9.3f}s"
+            f"{totals['cpu']:>9.3f}s{totals['blocked_children']:>11.3f}s"
+            f"{totals['blocked_other']:>11.3f}s{totals['children_cpu']:>10.3f}s"
+        )
+
+
+def profile_at_exit(directory: str) -> None:
+    """Enable profiling and write the results to directory when the
+    process exits, including through sys.exit()"""
+    enable()
+
+    def finish():
+        summary = write(directory)
+        print_summary(summary)
+        print(f"Profiles written to {directory}")
+
+    atexit.register(finish)
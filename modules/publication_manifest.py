@@ -0,0 +1,136 @@
+"""
+Local publication manifest for incremental republishing.
+
+Maps each event's d-tag to a hash of what was signed (kind, tags and
+content), the resulting event and the relays that accepted it. Templates
+whose hash is unchanged reuse the stored event instead of being signed
+again, and are only published to relays that do not have it yet.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from .event_creator import create_events
+
+MANIFEST_VERSION = 2
+
+
+def load_manifest(path: str) -> Dict:
+    """Load a manifest, or return an empty one if the file does not exist"""
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "events": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") == 1:
+        # Version 1 did not say which relays had an event: keep the signed
+        # events, but publish them again everywhere
+        for entry in manifest["events"].values():
+            entry.pop("published", None)
+            entry["published_to"] = []
+        manifest["version"] = MANIFEST_VERSION
+    if manifest.get("version") != MANIFEST_VERSION:
+        print(f"Warning: Ignoring manifest {path} with unknown version")
+        return {"version": MANIFEST_VERSION, "events": {}}
+    return manifest
+
+
+def save_manifest(path: str, manifest: Dict) -> None:
+    """Write the manifest atomically"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def template_hash(template: Dict) -> str:
+    """Hash the parts of an event that decide whether it must be re-signed"""
+    data = json.dumps(
+        [template["kind"], template["tags"], template["content"]],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _d_tag(tags: List[List[str]]) -> Optional[str]:
+    return next((tag[1] for tag in tags if tag[0] == "d"), None)
+
+
+def find_unchanged(manifest: Dict, template: Dict, pubkey: str) -> Optional[Dict]:
+    """Return the stored event if this template was already signed by pubkey"""
+    entry = manifest["events"].get(_d_tag(template["tags"]))
+    if (
+        entry
+        and entry["kind"] == template["kind"]
+        and entry["content_hash"] == template_hash(template)
+        and entry["event"]["pubkey"] == pubkey
+    ):
+        return entry["event"]
+    return None
+
+
+def record_event(manifest: Dict, template: Dict, event: Dict) -> None:
+    """Store a freshly signed event under its d-tag (not yet published)"""
+    manifest["events"][_d_tag(event["tags"])] = {
+        "kind": event["kind"],
+        "content_hash": template_hash(template),
+        "id": event["id"],
+        "created_at": event["created_at"],
+        "published_to": [],
+        "event": event,
+    }
+
+
+def mark_published(manifest: Dict, event: Dict, relays: List[str]) -> None:
+    """Record that an event has been accepted by these relays"""
+    entry = manifest["events"].get(_d_tag(event["tags"]))
+    if entry and entry["id"] == event["id"]:
+        entry["published_to"] = sorted(set(entry["published_to"]) | set(relays))
+
+
+def published_to(manifest: Dict, event: Dict) -> List[str]:
+    """Relays known to have accepted this event"""
+    entry = manifest["events"].get(_d_tag(event["tags"]))
+    if not entry or entry["id"] != event["id"]:
+        return []
+    return entry["published_to"]
+
+
+def is_published(manifest: Dict, event: Dict, relays: List[str]) -> bool:
+    """Whether every one of the relays has accepted this event"""
+    return set(relays) <= set(published_to(manifest, event))
+
+
+def create_events_incremental(
+    templates: List[Dict],
+    key: str,
+    pubkey: str,
+    manifest: Optional[Dict],
+    decrypt=True,
+) -> Tuple[List[Dict], List[bool]]:
+    """Sign only the templates that changed since the manifest was written
+
+    Returns:
+        (events in template order, whether each event was reused)
+    """
+    if manifest is None:
+        return create_events(templates, key, decrypt=decrypt), [False] * len(templates)
+
+    events: List[Optional[Dict]] = []
+    changed = []
+    for i, template in enumerate(templates):
+        event = find_unchanged(manifest, template, pubkey)
+        events.append(event)
+        if event is None:
+            changed.append(i)
+
+    signed = create_events([templates[i] for i in changed], key, decrypt=decrypt)
+    for i, event in zip(changed, signed):
+        record_event(manifest, templates[i], event)
+        events[i] = event
+
+    changed_set = set(changed)
+    reused = [i not in changed_set for i in range(len(templates))]
+    return events, reused
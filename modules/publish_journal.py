@@ -0,0 +1,311 @@
+"""
+Append-only journal of publish outcomes, for resuming interrupted runs.
+
+The journal is a JSONL file. A run begins with a "begin" line naming the
+relays, followed by one "event" line per signed event in publish order
+(sections before the indexes that reference them). Every relay answer
+is then appended as a "result" line and fsync'd in small groups, so after
+a crash or a partial failure the next run only sends each event to the
+relays that have not confirmed it.
+
+    {"op": "begin", "relays": [...], "source": ..., "created_at": ...}
+    {"op": "event", "event": {...}}
+    {"op": "result", "id": ..., "relay": ..., "ok": true, "message": ""}
+
+Beginning a new run rewrites the file with just the new plan and the
+results for its events, so the journal does not grow across runs.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .event_bundle import dependency_order
+from .event_publisher import publish_events_async
+from .event_store import replaceable_coordinate
+from .relay_pool import RelayPool
+
+INDEX_KIND = 30040
+HELD = "held: waiting for referenced events to be confirmed"
+# Recorded for relays known from elsewhere (a manifest) to have an event
+KNOWN = "known: accepted in an earlier run"
+# Relay answers are fsync'd at least this often; a crash loses at most
+# these, and those events are simply sent again
+FLUSH_EVERY = 200
+FLUSH_SECONDS = 1.0
+
+
+class PublishJournal:
+    """Publish plan and per-relay outcomes, persisted as they happen"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.relays: List[str] = []
+        self.source: Optional[str] = None
+        self.events: Dict[str, Dict] = {}
+        # event id -> {relay: (accepted, message)}
+        self.results: Dict[str, Dict[str, Tuple[bool, str]]] = {}
+        self._buffer: List[Dict] = []
+        self._flushed = time.monotonic()
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # A crash mid-write can leave a partial last line
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        for line in data[:end].decode("utf-8").splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+
+    def _apply(self, entry: Dict) -> None:
+        if entry["op"] == "begin":
+            self.relays = entry["relays"]
+            self.source = entry.get("source")
+            self.events = {}
+        elif entry["op"] == "event":
+            self.events[entry["event"]["id"]] = entry["event"]
+        elif entry["op"] == "result":
+            self.results.setdefault(entry["id"], {})[entry["relay"]] = (
+                entry["ok"],
+                entry["message"],
+            )
+
+    def _flush(self) -> None:
+        for entry in self._buffer:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer = []
+        self._flushed = time.monotonic()
+
+    def begin(
+        self, events: List[Dict], relays: List[str], source: Optional[str] = None
+    ) -> None:
+        """Start a run publishing events to relays, keeping the results
+        already recorded for these events"""
+        events = dependency_order(events)
+        self.relays = list(relays)
+        self.source = source
+        self.events = {event["id"]: event for event in events}
+        self.results = {
+            event_id: results
+            for event_id, results in self.results.items()
+            if event_id in self.events
+        }
+
+        entries = [
+            {
+                "op": "begin",
+                "relays": self.relays,
+                "source": source,
+                "created_at": int(time.time()),
+            }
+        ]
+        entries += [{"op": "event", "event": event} for event in events]
+        entries += [
+            {"op": "result", "id": event_id, "relay": relay, "ok": ok, "message": msg}
+            for event_id, results in self.results.items()
+            for relay, (ok, msg) in results.items()
+        ]
+        self._buffer = []
+        self._file.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record_result(self, event_id: str, relay: str, ok: bool, message: str) -> None:
+        """Add one relay answer; answers are fsync'd in small groups"""
+        if self.results.get(event_id, {}).get(relay) == (ok, message):
+            return
+        self.results.setdefault(event_id, {})[relay] = (ok, message)
+        self._buffer.append(
+            {
+                "op": "result",
+                "id": event_id,
+                "relay": relay,
+                "ok": ok,
+                "message": message,
+            }
+        )
+        if (
+            len(self._buffer) >= FLUSH_EVERY
+            or time.monotonic() - self._flushed >= FLUSH_SECONDS
+        ):
+            self._flush()
+
+    def record(self, results: Dict[str, Dict[str, Tuple[bool, str]]]) -> None:
+        """Record relay answers, {event id: {relay: (accepted, message)}},
+        and everything buffered so far"""
+        for event_id, relay_results in results.items():
+            for relay, (ok, message) in relay_results.items():
+                self.record_result(event_id, relay, ok, message)
+        self._flush()
+
+    def record_known(self, relays_by_event: Dict[str, List[str]]) -> None:
+        """Count events as accepted by relays known from elsewhere to have
+        them, {event id: [relay, ...]}"""
+        self.record(
+            {
+                event_id: {
+                    relay: (True, KNOWN)
+                    for relay in relays
+                    if relay in self.relays and not self.accepted(event_id, relay)
+                }
+                for event_id, relays in relays_by_event.items()
+            }
+        )
+
+    def accepted(self, event_id: str, relay: str) -> bool:
+        """Whether the relay accepted the event"""
+        return self.results.get(event_id, {}).get(relay, (False, ""))[0]
+
+    def confirmed(self, event_id: str) -> bool:
+        """Whether every relay of the run accepted the event"""
+        return all(self.accepted(event_id, relay) for relay in self.relays)
+
+    def pending(self, relay: Optional[str] = None) -> List[Dict]:
+        """Events the relay (or some relay) has not accepted yet, in
+        publish order"""
+        if relay is not None:
+            return [
+                e for e in self.events.values() if not self.accepted(e["id"], relay)
+            ]
+        return [e for e in self.events.values() if not self.confirmed(e["id"])]
+
+    def references(self, event_id: str) -> Set[str]:
+        """Ids of the planned events an event refers to, directly or
+        through other planned events"""
+        by_key = {}
+        for event in self.events.values():
+            by_key[event["id"]] = event["id"]
+            coordinate = replaceable_coordinate(event)
+            if coordinate:
+                by_key[coordinate] = event["id"]
+
+        found: Set[str] = set()
+        stack = [event_id]
+        while stack:
+            for tag in self.events[stack.pop()]["tags"]:
+                if len(tag) > 1 and tag[0] in ("a", "e"):
+                    referenced = by_key.get(tag[1])
+                    if referenced and referenced not in found:
+                        found.add(referenced)
+                        stack.append(referenced)
+        found.discard(event_id)
+        return found
+
+    def roots(self) -> Set[str]:
+        """Ids of planned indexes no other planned event refers to"""
+        referenced = {
+            tag[1]
+            for event in self.events.values()
+            for tag in event["tags"]
+            if len(tag) > 1 and tag[0] in ("a", "e")
+        }
+        return {
+            event_id
+            for event_id, event in self.events.items()
+            if event["kind"] == INDEX_KIND
+            and event_id not in referenced
+            and replaceable_coordinate(event) not in referenced
+        }
+
+    def close(self) -> None:
+        self._flush()
+        self._file.close()
+
+    def __enter__(self) -> "PublishJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+async def publish_pending(
+    pool: RelayPool,
+    journal: PublishJournal,
+    max_retries: int = 3,
+    delay: float = 1,
+    verify: bool = False,
+) -> Dict[str, Dict[str, Tuple[bool, str]]]:
+    """Publish the journal's events to the relays that have not accepted
+    them, root indexes last
+
+    Each relay is handled on its own: it is sent only what it is missing,
+    and a root index only once that relay has confirmed everything the
+    root references, so a failing relay does not hold the root back from
+    the others and a relay never serves a root with missing sections.
+
+    Returns:
+        {event_id: {relay: (accepted, message)}} for every planned event
+    """
+    roots = journal.roots()
+    results = {
+        event_id: dict(journal.results.get(event_id, {})) for event_id in journal.events
+    }
+
+    async def publish_to(relay: str) -> None:
+        pending = journal.pending(relay)
+        body = [event for event in pending if event["id"] not in roots]
+        if body:
+            body_results = await publish_events_async(
+                pool, body, max_retries, delay, verify, journal=journal, relays=[relay]
+            )
+            for event_id, relay_results in body_results.items():
+                results[event_id].update(relay_results)
+
+        ready, held = [], []
+        for event in pending:
+            if event["id"] in roots:
+                references = journal.references(event["id"])
+                complete = all(journal.accepted(ref, relay) for ref in references)
+                (ready if complete else held).append(event)
+        if held:
+            print(f"Debug: Holding back {len(held)} root index(es) on {relay}: {HELD}")
+            for event in held:
+                results[event["id"]][relay] = (False, HELD)
+        if ready:
+            root_results = await publish_events_async(
+                pool, ready, max_retries, delay, verify, journal=journal, relays=[relay]
+            )
+            for event_id, relay_results in root_results.items():
+                results[event_id].update(relay_results)
+
+    await asyncio.gather(*(publish_to(relay) for relay in pool.relays))
+    return results
+
+
+def publish_journaled(
+    journal: PublishJournal,
+    max_retries: int = 3,
+    delay: float = 1,
+    verify: bool = False,
+) -> Dict[str, Dict[str, Tuple[bool, str]]]:
+    """Synchronous publish_pending over a pool to the journal's relays"""
+
+    async def run():
+        async with RelayPool(journal.relays) as pool:
+            return await publish_pending(pool, journal, max_retries, delay, verify)
+
+    try:
+        return asyncio.run(run())
+    except Exception as e:
+        print(f"Error publishing events: {e}")
+        return {
+            event["id"]: {relay: (False, str(e)) for relay in journal.relays}
+            for event in journal.pending()
+        }
@@ -0,0 +1,169 @@
+"""
+Per-relay pacing of EVENT frames.
+
+Every relay gets a token bucket. A bucket starts unlimited, so relays
+that do not throttle are sent to as fast as the connection allows. The
+first "rate-limited:" OK sets the bucket to the rate at which the relay
+answered without throttling over the last few seconds. Further
+rate-limited answers halve it, and every other answer from the relay
+(accepted or rejected for good) raises it a little, about 20% per second
+of clean sending, so each relay is driven close to the fastest rate it
+accepts, independently of the other relays.
+
+NIP-11 does not advertise write rates, but the limits it does advertise
+are applied: events larger than max_message_length are not sent, and
+relays with restricted_writes, auth_required or payment_required are
+reported, since their rejections are permanent rather than a matter of
+pace.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from .nip11 import relay_limits
+from .retry_policy import RETRY, classify
+
+RATE_LIMITED_PREFIX = "rate-limited:"
+# A rate-limited answer halves the rate, at most once per this many
+# seconds (answers to frames already in flight say the same thing)
+DECREASE_COOLDOWN = 1.0
+DECREASE_FACTOR = 0.5
+# Events per second added per unthrottled answer: about 20% per second
+INCREASE_PER_EVENT = 0.2
+# Seconds of answers used to measure what a relay takes, and the
+# shortest span such a measurement may cover
+RATE_WINDOW = 2.0
+MIN_RATE_WINDOW = 0.5
+# Burst size, in seconds of the current rate
+BURST_SECONDS = 0.25
+
+
+class TokenBucket:
+    """Sends per second with bursts of up to capacity; rate None is unlimited"""
+
+    def __init__(self, rate: Optional[float] = None):
+        self.rate = rate
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def capacity(self) -> float:
+        return max(1.0, (self.rate or 0) * BURST_SECONDS)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate is not None:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+        self.updated = now
+
+    def set_rate(self, rate: Optional[float]) -> None:
+        self._refill()
+        self.rate = rate
+        self.tokens = min(self.tokens, self.capacity)
+
+    async def acquire(self) -> None:
+        """Wait for a token; waiters are served in order"""
+        if self.rate is None:
+            return
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.rate is None or self.tokens >= 1:
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+            if self.rate is not None:
+                self.tokens -= 1
+
+
+class RelaySchedule:
+    """Bucket, NIP-11 limits and recent answers of one relay"""
+
+    def __init__(self, url: str, min_rate: float):
+        self.url = url
+        self.min_rate = min_rate
+        self.bucket = TokenBucket()
+        self.limits: Dict = {}
+        # When the relay answered without throttling (recent ones only)
+        self.answered: Deque[float] = deque()
+        self.decreased = 0.0
+
+    def answered_rate(self) -> float:
+        """Unthrottled answers per second over the last RATE_WINDOW seconds"""
+        now = time.monotonic()
+        while self.answered and self.answered[0] < now - RATE_WINDOW:
+            self.answered.popleft()
+        if not self.answered:
+            return 0.0
+        return len(self.answered) / max(MIN_RATE_WINDOW, now - self.answered[0])
+
+    def record(self, ok: bool, message: str) -> None:
+        now = time.monotonic()
+        if not message.startswith(RATE_LIMITED_PREFIX):
+            # Timeouts and dropped connections say nothing about the pace
+            if classify(ok, message) != RETRY:
+                self.answered.append(now)
+                if self.bucket.rate is not None:
+                    self.bucket.set_rate(self.bucket.rate + INCREASE_PER_EVENT)
+            return
+        if now - self.decreased < DECREASE_COOLDOWN:
+            return
+        self.decreased = now
+        if self.bucket.rate is None:
+            rate = self.answered_rate()
+        else:
+            rate = self.bucket.rate * DECREASE_FACTOR
+        self.bucket.set_rate(max(self.min_rate, rate))
+        print(f"Debug: {self.url} is rate limiting, sending {self.bucket.rate:.1f}/s")
+
+
+class PublishScheduler:
+    """Token buckets for the relays of a pool, adapting to their answers"""
+
+    def __init__(self, min_rate: float = 1.0):
+        self.min_rate = min_rate
+        self.relays: Dict[str, RelaySchedule] = {}
+
+    def relay(self, url: str) -> RelaySchedule:
+        if url not in self.relays:
+            self.relays[url] = RelaySchedule(url, self.min_rate)
+        return self.relays[url]
+
+    def configure(self, url: str, info: Dict) -> None:
+        """Apply a relay's NIP-11 document"""
+        limits = relay_limits(info)
+        self.relay(url).limits = limits
+        for flag in ("auth_required", "payment_required", "restricted_writes"):
+            if limits.get(flag):
+                print(f"Debug: {url} advertises {flag}; some events may be refused")
+
+    def check(self, url: str, event: Dict) -> Optional[str]:
+        """Why the relay would refuse the event outright, if its NIP-11
+        limits say so"""
+        max_length = self.relay(url).limits.get("max_message_length")
+        if not isinstance(max_length, int) or max_length <= 0:
+            return None
+        frame = json.dumps(["EVENT", event], ensure_ascii=False)
+        if len(frame.encode()) > max_length:
+            return (
+                f"invalid: event is larger than the relay's max_message_length "
+                f"({max_length} bytes)"
+            )
+        return None
+
+    async def acquire(self, url: str) -> None:
+        """Wait until the relay may be sent another EVENT"""
+        await self.relay(url).bucket.acquire()
+
+    def record(self, url: str, ok: bool, message: str) -> None:
+        """Adjust the relay's rate to an OK answer"""
+        self.relay(url).record(ok, message)
+
+    def rate(self, url: str) -> Optional[float]:
+        """Current events per second for the relay (None: unlimited)"""
+        return self.relay(url).bucket.rate
@@ -0,0 +1,349 @@
+"""
+Long-lived asyncio connections to Nostr relays.
+
+A RelayPool keeps one websocket per relay, pipelines EVENT frames without
+waiting for each OK, matches NIP-01 OK responses back to event ids and
+reconnects transparently, re-sending whatever was still in flight.
+EVENT frames are paced per relay by a PublishScheduler, which learns each
+relay's rate from its answers and applies its NIP-11 limits.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+from .nip11 import fetch_relay_info
+from .publish_scheduler import PublishScheduler
+from .retry_policy import CircuitBreaker, RetryPolicy
+from .websocket import ConnectionClosed, connect
+
+# OK messages with this prefix mean the relay already has the event
+DUPLICATE_PREFIX = "duplicate:"
+
+
+class _Closed:
+    """Queue marker for a subscription the relay ended with CLOSED"""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+class RelayConnection:
+    """A single relay websocket with reconnect and OK/EOSE bookkeeping"""
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 30,
+        max_reconnects: int = 5,
+        reconnect_delay: float = 1,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.max_reconnects = max_reconnects
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_policy = RetryPolicy(base_delay=reconnect_delay)
+        # Parks the relay for publishing after repeated failed attempts
+        self.breaker = CircuitBreaker()
+        # Subscriptions that ended without EOSE (timeout, CLOSED, no connection)
+        self.incomplete_reads = 0
+        self.ws = None
+        self.error: Optional[str] = None
+        self._connected = asyncio.Event()
+        self._closing = False
+        self._reader_task: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        # event id -> (future resolved by OK, EVENT frame for re-sending)
+        self._pending: Dict[str, Tuple[asyncio.Future, str]] = {}
+        # subscription id -> (REQ frame for re-sending, message queue)
+        self._subscriptions: Dict[str, Tuple[str, asyncio.Queue]] = {}
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    async def start(self) -> None:
+        """Connect, retrying up to max_reconnects times"""
+        await self._connect()
+
+    async def _connect(self) -> None:
+        attempts = 0
+        while not self._closing:
+            try:
+                self.ws = await connect(self.url, timeout=self.timeout)
+                break
+            except (OSError, ConnectionError, ValueError, asyncio.TimeoutError) as e:
+                attempts += 1
+                if attempts > self.max_reconnects or isinstance(e, ValueError):
+                    self._fail(f"connection failed: {e}")
+                    return
+                wait = self.reconnect_policy.delay(attempts)
+                print(
+                    f"Debug: Connection to {self.url} failed ({e}), "
+                    f"retrying in {wait:.1f}s"
+                )
+                await asyncio.sleep(wait)
+
+        if self._closing:
+            return
+        self.error = None
+        self._connected.set()
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+        # Anything still in flight from a previous connection goes out again
+        for _, frame in list(self._pending.values()):
+            await self._write(frame)
+        for frame, _ in list(self._subscriptions.values()):
+            await self._write(frame)
+
+    def _fail(self, error: str) -> None:
+        """Give up on the relay and resolve everything waiting on it"""
+        self.error = error
+        print(f"Debug: Relay {self.url} unavailable: {error}")
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_result((False, error))
+        self._pending.clear()
+        for _, queue in self._subscriptions.values():
+            queue.put_nowait(_Closed(error))
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                message = await self.ws.recv()
+                try:
+                    self._dispatch(json.loads(message))
+                except (ValueError, IndexError, TypeError):
+                    print(f"Debug: Ignoring malformed message from {self.url}")
+        except ConnectionClosed as e:
+            self._connected.clear()
+            if not self._closing:
+                print(f"Debug: Lost connection to {self.url} ({e}), reconnecting")
+                self._reconnect_task = asyncio.create_task(self._connect())
+
+    def _dispatch(self, message: List) -> None:
+        kind = message[0]
+        if kind == "OK":
+            entry = self._pending.pop(message[1], None)
+            if entry and not entry[0].done():
+                entry[0].set_result((bool(message[2]), str(message[3] or "")))
+        elif kind == "EVENT":
+            subscription = self._subscriptions.get(message[1])
+            if subscription:
+                subscription[1].put_nowait(message[2])
+        elif kind == "EOSE":
+            subscription = self._subscriptions.get(message[1])
+            if subscription:
+                subscription[1].put_nowait(None)
+        elif kind == "CLOSED":
+            subscription = self._subscriptions.get(message[1])
+            if subscription:
+                subscription[1].put_nowait(_Closed(str(message[2])))
+        elif kind == "NOTICE":
+            print(f"Debug: NOTICE from {self.url}: {message[1]}")
+
+    async def _write(self, frame: str) -> None:
+        try:
+            await self.ws.send(frame)
+        except ConnectionClosed:
+            # The read loop notices and reconnects; pending frames are re-sent
+            self._connected.clear()
+
+    async def _send(self, frame: str) -> None:
+        if not self._connected.is_set():
+            await asyncio.wait_for(self._connected.wait(), self.timeout)
+        await self._write(frame)
+
+    async def publish(self, event: Dict) -> Tuple[bool, str]:
+        """Send an EVENT and wait for the relay's OK"""
+        with metrics.call("relay publish"):
+            ok, message = await self._publish(event)
+        metrics.relay_result(self.url, ok)
+        return ok, message
+
+    async def _publish(self, event: Dict) -> Tuple[bool, str]:
+        if self.failed:
+            return False, self.error
+
+        event_id = event["id"]
+        if event_id in self._pending:
+            future = self._pending[event_id][0]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            frame = json.dumps(["EVENT", event], ensure_ascii=False)
+            metrics.observe_event(event, frame)
+            self._pending[event_id] = (future, frame)
+            try:
+                await self._send(frame)
+            except asyncio.TimeoutError:
+                pass
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(event_id, None)
+            return False, "timeout: no OK received from relay"
+
+    async def subscribe(self, filters: List[Dict]) -> AsyncIterator[Dict]:
+        """Yield events matching the filters until EOSE (or CLOSED)"""
+        if self.failed:
+            self.incomplete_reads += 1
+            return
+
+        sub_id = os.urandom(8).hex()
+        queue: asyncio.Queue = asyncio.Queue()
+        frame = json.dumps(["REQ", sub_id] + list(filters))
+        self._subscriptions[sub_id] = (frame, queue)
+        try:
+            start = time.perf_counter()
+            await self._send(frame)
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), self.timeout)
+                except asyncio.TimeoutError:
+                    print(f"Debug: Subscription on {self.url} timed out before EOSE")
+                    self.incomplete_reads += 1
+                    break
+                if item is None:
+                    metrics.observe_call("relay query", time.perf_counter() - start)
+                    break
+                if isinstance(item, _Closed):
+                    print(f"Debug: Subscription closed by {self.url}: {item.message}")
+                    self.incomplete_reads += 1
+                    break
+                yield item
+        except asyncio.TimeoutError:
+            print(f"Debug: Could not reach {self.url} to subscribe")
+            self.incomplete_reads += 1
+        finally:
+            self._subscriptions.pop(sub_id, None)
+            if self._connected.is_set():
+                await self._write(json.dumps(["CLOSE", sub_id]))
+
+    async def close(self) -> None:
+        self._closing = True
+        for task in (self._reconnect_task, self._reader_task):
+            if task and not task.done():
+                task.cancel()
+        if self.ws:
+            await self.ws.close()
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_result((False, "connection closed"))
+        self._pending.clear()
+
+
+class RelayPool:
+    """One persistent connection per relay, shared by every publish and query"""
+
+    def __init__(
+        self,
+        relays: List[str],
+        timeout: float = 30,
+        max_reconnects: int = 5,
+        scheduler: Optional[PublishScheduler] = None,
+    ):
+        self.relays = list(dict.fromkeys(relays))
+        self.connections = {
+            url: RelayConnection(url, timeout=timeout, max_reconnects=max_reconnects)
+            for url in self.relays
+        }
+        self.scheduler = scheduler or PublishScheduler()
+
+    async def __aenter__(self) -> "RelayPool":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def connect(self) -> None:
+        async def configure(url: str) -> None:
+            self.scheduler.configure(url, await fetch_relay_info(url))
+
+        await asyncio.gather(
+            *(conn.start() for conn in self.connections.values()),
+            *(configure(url) for url in self.relays),
+        )
+
+    async def close(self) -> None:
+        await asyncio.gather(*(conn.close() for conn in self.connections.values()))
+
+    async def publish(
+        self,
+        events: List[Dict],
+        relays: Optional[List[str]] = None,
+        on_result: Optional[Callable[[str, str, bool, str], None]] = None,
+    ) -> Dict[str, Dict[str, Tuple[bool, str]]]:
+        """Pipeline a batch of events to the relays, as fast as the
+        scheduler lets each relay be sent to.
+
+        Args:
+            on_result: Called with (event_id, relay, accepted, message) as
+                each OK arrives
+
+        Returns:
+            {event_id: {relay: (accepted, message)}}
+        """
+        targets = relays or self.relays
+
+        async def publish_one(event: Dict, url: str) -> Tuple[bool, str]:
+            connection = self.connections[url]
+            refusal = self.scheduler.check(url, event)
+            if refusal is not None:
+                ok, message = False, refusal
+            elif connection.failed:
+                ok, message = await connection.publish(event)
+            else:
+                await self.scheduler.acquire(url)
+                ok, message = await connection.publish(event)
+                self.scheduler.record(url, ok, message)
+            if not ok and message.startswith(DUPLICATE_PREFIX):
+                ok = True
+            if on_result is not None:
+                on_result(event["id"], url, ok, message)
+            return ok, message
+
+        jobs = [(event, url) for event in events for url in targets]
+        outcomes = await asyncio.gather(*(publish_one(*job) for job in jobs))
+
+        results: Dict[str, Dict[str, Tuple[bool, str]]] = {}
+        for (event, url), outcome in zip(jobs, outcomes):
+            results.setdefault(event["id"], {})[url] = outcome
+        return results
+
+    async def query(
+        self, filters: List[Dict], relays: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict]:
+        """Yield events from all relays as they arrive, deduplicated by id"""
+        targets = relays or self.relays
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def pump(url: str) -> None:
+            try:
+                async for event in self.connections[url].subscribe(filters):
+                    await queue.put(event)
+            finally:
+                await queue.put(done)
+
+        tasks = [asyncio.create_task(pump(url)) for url in targets]
+        seen = set()
+        remaining = len(tasks)
+        try:
+            while remaining:
+                item = await queue.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                if item.get("id") in seen:
+                    continue
+                seen.add(item.get("id"))
+                yield item
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
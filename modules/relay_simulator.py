@@ -0,0 +1,393 @@
+"""
+In-process Nostr relay stand-in for benchmarks and local runs.
+
+Speaks enough NIP-01 for the tools in this repo: EVENT (answered with OK),
+REQ (stored events, newest first, then EOSE, then live events until
+CLOSE) and CLOSE. Replaceable and addressable events keep only their
+newest version and NIP-09 deletion requests remove the author's events.
+Events are kept in memory. A NIP-11 document describing the configured
+limits is served over plain HTTP.
+
+Faults can be injected per connection: reply latency, a message size
+limit, a cap on results per filter, an EVENT rate limit and randomly
+dropped messages. The simulator runs on the caller's event loop or on a
+background thread, so synchronous code such as publish_events can talk
+to it.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .event_store import replaceable_coordinate
+from .event_verifier import check_event
+from .websocket import ConnectionClosed, WebSocket, accept
+
+DELETION_KIND = 5
+
+
+def matches(query_filter: Dict, event: Dict) -> bool:
+    """Whether an event matches a NIP-01 filter"""
+    if "ids" in query_filter and event["id"] not in query_filter["ids"]:
+        return False
+    if "kinds" in query_filter and event["kind"] not in query_filter["kinds"]:
+        return False
+    if "authors" in query_filter and event["pubkey"] not in query_filter["authors"]:
+        return False
+    if "since" in query_filter and event["created_at"] < query_filter["since"]:
+        return False
+    if "until" in query_filter and event["created_at"] > query_filter["until"]:
+        return False
+    for key, values in query_filter.items():
+        if key.startswith("#") and not any(
+            len(tag) > 1 and tag[0] == key[1:] and tag[1] in values
+            for tag in event["tags"]
+        ):
+            return False
+    return True
+
+
+class _Client:
+    """One websocket connection and its open subscriptions"""
+
+    def __init__(self, ws: WebSocket, burst: float):
+        self.ws = ws
+        self.subscriptions: Dict[str, List[Dict]] = {}
+        self.tokens = burst
+        self.refilled = time.monotonic()
+
+
+class RelaySimulator:
+    """A local relay holding events in memory"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        verify: bool = True,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        max_message_bytes: int = 0,
+        max_limit: int = 0,
+        rate_limit: float = 0.0,
+        burst: int = 0,
+        drop_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            port: 0 picks a free port
+            verify: Check ids and signatures of incoming events like a
+                real relay (costs CPU in the same process)
+            latency: Seconds before each reply (OK, REQ results, NOTICE)
+            jitter: Up to this many extra seconds, at random, per reply
+            max_message_bytes: Reject larger client messages (0: no limit)
+            max_limit: Most events returned per REQ filter (0: no limit)
+            rate_limit: EVENTs per second per connection (0: unlimited)
+            burst: EVENTs a connection may send at once before the rate
+                limit applies (default: one second's worth)
+            drop_rate: Fraction of client messages silently ignored
+            seed: Random seed for jitter and drops
+        """
+        self.host = host
+        self.port = port
+        self.verify = verify
+        self.latency = latency
+        self.jitter = jitter
+        self.max_message_bytes = max_message_bytes
+        self.max_limit = max_limit
+        self.rate_limit = rate_limit
+        self.burst = burst or max(rate_limit, 1)
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+
+        self.events: Dict[str, Dict] = {}
+        # coordinate -> id of the version kept
+        self.coordinates: Dict[str, str] = {}
+        # id -> pubkey that requested its deletion
+        self.deleted_ids: Dict[str, str] = {}
+        # coordinate -> created_at of its newest deletion request
+        self.deleted_coordinates: Dict[str, int] = {}
+        self.stats = {
+            "connections": 0,
+            "events": 0,
+            "accepted": 0,
+            "rejected": 0,
+            "rate_limited": 0,
+            "too_large": 0,
+            "dropped": 0,
+            "deleted": 0,
+            "reqs": 0,
+            "sent": 0,
+        }
+
+        self._clients: Set[_Client] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def info(self) -> Dict:
+        """NIP-11 relay information document"""
+        limitation = {"auth_required": False, "payment_required": False}
+        if self.max_message_bytes:
+            limitation["max_message_length"] = self.max_message_bytes
+        if self.max_limit:
+            limitation["max_limit"] = self.max_limit
+        return {
+            "name": "relay simulator",
+            "description": "In-memory Nostr relay stand-in with fault injection",
+            "software": "nip62 relay_simulator",
+            "supported_nips": [1, 9, 11],
+            "limitation": limitation,
+        }
+
+    async def start(self) -> "RelaySimulator":
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=2**24
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for client in list(self._clients):
+                await client.ws.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "RelaySimulator":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    def start_in_thread(self) -> "RelaySimulator":
+        """Serve from a daemon thread with its own event loop"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop_thread(self) -> None:
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def clear(self) -> None:
+        """Forget every stored event and deletion"""
+        self.events.clear()
+        self.coordinates.clear()
+        self.deleted_ids.clear()
+        self.deleted_coordinates.clear()
+
+    def query(self, filters: List[Dict]) -> List[Dict]:
+        """Stored events matching any filter, newest first, per-filter limits"""
+        found = {}
+        for query_filter in filters:
+            if "ids" in query_filter:
+                candidates = (
+                    self.events[event_id]
+                    for event_id in query_filter["ids"]
+                    if event_id in self.events
+                )
+            else:
+                candidates = self.events.values()
+            hits = sorted(
+                (e for e in candidates if matches(query_filter, e)),
+                key=lambda e: (-e["created_at"], e["id"]),
+            )
+            limit = query_filter.get("limit")
+            if self.max_limit:
+                limit = min(limit or self.max_limit, self.max_limit)
+            if limit is not None:
+                hits = hits[:limit]
+            found.update((event["id"], event) for event in hits)
+        return sorted(found.values(), key=lambda e: (-e["created_at"], e["id"]))
+
+    def _remove(self, event_id: str) -> None:
+        event = self.events.pop(event_id, None)
+        if event is None:
+            return
+        self.stats["deleted"] += 1
+        coordinate = replaceable_coordinate(event)
+        if coordinate and self.coordinates.get(coordinate) == event_id:
+            del self.coordinates[coordinate]
+
+    def _apply_deletion(self, deletion: Dict) -> None:
+        """NIP-09: remove the referenced events of the same author"""
+        for tag in deletion["tags"]:
+            if len(tag) < 2:
+                continue
+            if tag[0] == "e":
+                target = self.events.get(tag[1])
+                if target is None or target["pubkey"] == deletion["pubkey"]:
+                    self.deleted_ids[tag[1]] = deletion["pubkey"]
+                    if target is not None and target["kind"] != DELETION_KIND:
+                        self._remove(tag[1])
+            elif tag[0] == "a":
+                parts = tag[1].split(":", 2)
+                if len(parts) != 3 or parts[1] != deletion["pubkey"]:
+                    continue
+                until = max(
+                    deletion["created_at"], self.deleted_coordinates.get(tag[1], 0)
+                )
+                self.deleted_coordinates[tag[1]] = until
+                current = self.coordinates.get(tag[1])
+                if current and self.events[current]["created_at"] <= until:
+                    self._remove(current)
+
+    def accept_event(self, event: Dict) -> Tuple[bool, str]:
+        """Store an event; returns the (accepted, message) of the OK reply"""
+        if self.verify:
+            result = check_event(event)
+            if not result["valid"]:
+                return False, f"invalid: {result['error']}"
+        if event["id"] in self.events:
+            return True, "duplicate: already have this event"
+        if self.deleted_ids.get(event["id"]) == event["pubkey"]:
+            return False, "blocked: this event has been deleted"
+
+        coordinate = replaceable_coordinate(event)
+        if coordinate is not None:
+            if event["created_at"] <= self.deleted_coordinates.get(coordinate, -1):
+                return False, "blocked: this event has been deleted"
+            current = self.coordinates.get(coordinate)
+            if current is not None:
+                current_at = self.events[current]["created_at"]
+                # Newest wins; on a created_at tie the lowest id wins
+                if (event["created_at"], current) <= (current_at, event["id"]):
+                    return True, "duplicate: have a newer version"
+                self._remove(current)
+            self.coordinates[coordinate] = event["id"]
+
+        self.events[event["id"]] = event
+        if event["kind"] == DELETION_KIND:
+            self._apply_deletion(event)
+        return True, ""
+
+    def _rate_limited(self, client: _Client) -> bool:
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        client.tokens = min(
+            self.burst, client.tokens + (now - client.refilled) * self.rate_limit
+        )
+        client.refilled = now
+        if client.tokens < 1:
+            return True
+        client.tokens -= 1
+        return False
+
+    def _reply(self, client: _Client, messages: List[List]) -> None:
+        """Send messages after the configured latency, without blocking reads"""
+
+        async def send():
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                for message in messages:
+                    await client.ws.send(json.dumps(message))
+            except ConnectionClosed:
+                pass
+
+        task = asyncio.get_running_loop().create_task(send())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _broadcast(self, event: Dict) -> None:
+        """Push a newly stored event to matching live subscriptions"""
+        for client in self._clients:
+            for sub_id, filters in client.subscriptions.items():
+                if any(matches(query_filter, event) for query_filter in filters):
+                    self.stats["sent"] += 1
+                    self._reply(client, [["EVENT", sub_id, event]])
+
+    def _on_message(self, client: _Client, raw: str) -> None:
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            self.stats["dropped"] += 1
+            return
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            self._reply(client, [["NOTICE", "error: invalid JSON"]])
+            return
+        if not isinstance(message, list) or not message:
+            self._reply(client, [["NOTICE", "error: invalid message"]])
+            return
+
+        too_large = (
+            self.max_message_bytes and len(raw.encode()) > self.max_message_bytes
+        )
+        if message[0] == "EVENT" and len(message) > 1:
+            self.stats["events"] += 1
+            event = message[1]
+            if too_large:
+                self.stats["too_large"] += 1
+                ok, reason = False, "invalid: message is too large"
+            elif self._rate_limited(client):
+                self.stats["rate_limited"] += 1
+                ok, reason = False, "rate-limited: slow down"
+            else:
+                ok, reason = self.accept_event(event)
+            self.stats["accepted" if ok else "rejected"] += 1
+            self._reply(client, [["OK", event.get("id"), ok, reason]])
+            if ok and not reason:
+                self._broadcast(event)
+        elif message[0] == "REQ" and len(message) > 1:
+            self.stats["reqs"] += 1
+            sub_id = message[1]
+            if too_large:
+                self.stats["too_large"] += 1
+                self._reply(
+                    client, [["CLOSED", sub_id, "invalid: message is too large"]]
+                )
+                return
+            events = self.query(message[2:])
+            self.stats["sent"] += len(events)
+            client.subscriptions[sub_id] = message[2:]
+            self._reply(
+                client,
+                [["EVENT", sub_id, event] for event in events] + [["EOSE", sub_id]],
+            )
+        elif message[0] == "CLOSE" and len(message) > 1:
+            client.subscriptions.pop(message[1], None)
+        else:
+            self._reply(client, [["NOTICE", f"error: unknown message {message[0]}"]])
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            ws = await accept(reader, writer, info=self.info())
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return
+        client = _Client(ws, self.burst)
+        self._clients.add(client)
+        self.stats["connections"] += 1
+        try:
+            while True:
+                self._on_message(client, await ws.recv())
+        except ConnectionClosed:
+            pass
+        finally:
+            self._clients.discard(client)
+            await ws.close()
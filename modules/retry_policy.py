@@ -0,0 +1,108 @@
+"""
+Retry decisions for publishing: backoff, OK classification, circuit breaker.
+
+A relay's OK message starts with a machine-readable prefix (NIP-01):
+"duplicate:" means the relay has the event, "rate-limited:" and "error:"
+are worth retrying, while "invalid:", "blocked:", "pow:", "restricted:",
+"mute:" and "auth-required:" will not change on a resend. Failures raised
+locally (no OK before the timeout, a dropped connection, an event missing
+on confirmation) are retried.
+
+Retries wait an exponentially growing, fully jittered delay, and each
+relay has a circuit breaker: after a few attempts in a row that failed
+for retryable reasons the relay is parked, so later batches skip it
+instead of waiting out its timeouts, until a cool-down passes and one
+probe batch is let through.
+"""
+
+import random
+import time
+from typing import Optional
+
+ACCEPTED = "accepted"
+RETRY = "retry"
+PERMANENT = "permanent"
+
+ACCEPTED_PREFIXES = ("duplicate:",)
+PERMANENT_PREFIXES = (
+    "invalid:",
+    "blocked:",
+    "pow:",
+    "restricted:",
+    "mute:",
+    "auth-required:",
+)
+# Reported for events not sent because the relay's circuit is open
+PARKED = "parked: relay circuit open after repeated failures"
+
+
+def classify(ok: bool, message: str) -> str:
+    """ACCEPTED, RETRY or PERMANENT for a relay's OK (or a local failure)"""
+    if ok or message.startswith(ACCEPTED_PREFIXES):
+        return ACCEPTED
+    if message.startswith(PERMANENT_PREFIXES):
+        return PERMANENT
+    return RETRY
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        multiplier: float = 2.0,
+        max_delay: float = 30.0,
+        rng: Optional[random.Random] = None,
+    ):
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """Upper bound of the wait after the given failed attempt (1-based)"""
+        return min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the given failed attempt (1-based)"""
+        return self.rng.uniform(0, self.backoff(attempt))
+
+
+class CircuitBreaker:
+    """Closed while a relay answers; open (parked) after failure_threshold
+    failed attempts in a row; half-open for one probe after reset_timeout"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a batch may be sent now"""
+        return self.state != "open"
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed (0 when allowed now)"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            # A failed probe parks the relay for another full cool-down
+            self.opened_at = time.monotonic()
@@ -0,0 +1,261 @@
+"""
+BIP-340 Schnorr signatures over secp256k1.
+
+Pure Python implementation with an optional coincurve fast path for the
+elliptic curve multiplications. Nonces are derived deterministically with
+RFC6979 the same way btcec's schnorr.Sign does (which is what nak uses), so
+signing the same event twice produces the same signature nak would.
+"""
+
+import functools
+import hashlib
+import hmac
+from typing import Optional, Tuple
+
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+
+P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+G = (
+    0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+    0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8,
+)
+
+# SHA-256("BIP-340"), mixed into the RFC6979 nonce so it never collides with
+# an ECDSA nonce for the same key and message (matches btcec).
+RFC6979_EXTRA_DATA = hashlib.sha256(b"BIP-340").digest()
+
+_TAG_HASHES = {}
+
+# Jacobian point: (X, Y, Z) with affine x = X/Z^2, y = Y/Z^3. Z == 0 is infinity.
+_INFINITY = (0, 1, 0)
+
+
+def tagged_hash(tag: str, data: bytes) -> bytes:
+    """BIP-340 tagged hash: SHA256(SHA256(tag) || SHA256(tag) || data)"""
+    tag_hash = _TAG_HASHES.get(tag)
+    if tag_hash is None:
+        tag_hash = hashlib.sha256(tag.encode()).digest()
+        _TAG_HASHES[tag] = tag_hash
+    return hashlib.sha256(tag_hash + tag_hash + data).digest()
+
+
+def _jacobian_double(p: Tuple[int, int, int]) -> Tuple[int, int, int]:
+    x, y, z = p
+    if z == 0 or y == 0:
+        return _INFINITY
+    ysq = y * y % P
+    s = 4 * x * ysq % P
+    m = 3 * x * x % P
+    nx = (m * m - 2 * s) % P
+    ny = (m * (s - nx) - 8 * ysq * ysq) % P
+    nz = 2 * y * z % P
+    return (nx, ny, nz)
+
+
+def _jacobian_add(
+    p: Tuple[int, int, int], q: Tuple[int, int, int]
+) -> Tuple[int, int, int]:
+    if p[2] == 0:
+        return q
+    if q[2] == 0:
+        return p
+    x1, y1, z1 = p
+    x2, y2, z2 = q
+    z1sq = z1 * z1 % P
+    z2sq = z2 * z2 % P
+    u1 = x1 * z2sq % P
+    u2 = x2 * z1sq % P
+    s1 = y1 * z2sq * z2 % P
+    s2 = y2 * z1sq * z1 % P
+    if u1 == u2:
+        if s1 != s2:
+            return _INFINITY
+        return _jacobian_double(p)
+    h = (u2 - u1) % P
+    r = (s2 - s1) % P
+    hsq = h * h % P
+    hcu = hsq * h % P
+    u1hsq = u1 * hsq % P
+    nx = (r * r - hcu - 2 * u1hsq) % P
+    ny = (r * (u1hsq - nx) - s1 * hcu) % P
+    nz = h * z1 * z2 % P
+    return (nx, ny, nz)
+
+
+def _to_affine(p: Tuple[int, int, int]) -> Optional[Tuple[int, int]]:
+    x, y, z = p
+    if z == 0:
+        return None
+    zinv = pow(z, -1, P)
+    zinv2 = zinv * zinv % P
+    return (x * zinv2 % P, y * zinv2 * zinv % P)
+
+
+def _build_generator_table():
+    """Precompute 2^i * G so multiplying the generator needs no doublings"""
+    table = []
+    point = (G[0], G[1], 1)
+    for _ in range(256):
+        table.append(point)
+        point = _jacobian_double(point)
+    return table
+
+
+_G_TABLE = _build_generator_table()
+
+
+def _multiply_generator(k: int) -> Tuple[int, int, int]:
+    result = _INFINITY
+    i = 0
+    while k:
+        if k & 1:
+            result = _jacobian_add(result, _G_TABLE[i])
+        k >>= 1
+        i += 1
+    return result
+
+
+def _multiply(point: Tuple[int, int, int], k: int) -> Tuple[int, int, int]:
+    result = _INFINITY
+    for bit in bin(k)[2:]:
+        result = _jacobian_double(result)
+        if bit == "1":
+            result = _jacobian_add(result, point)
+    return result
+
+
+def _lift_x(x: int) -> Optional[Tuple[int, int]]:
+    """Return the point with the given x coordinate and an even y"""
+    if x >= P:
+        return None
+    y_sq = (pow(x, 3, P) + 7) % P
+    y = pow(y_sq, (P + 1) // 4, P)
+    if y * y % P != y_sq:
+        return None
+    return (x, y if y % 2 == 0 else P - y)
+
+
+def _generator_point(k: int) -> Tuple[int, int]:
+    """Affine k*G, using coincurve when it is installed"""
+    if coincurve is not None:
+        encoded = coincurve.PublicKey.from_secret(k.to_bytes(32, "big")).format(
+            compressed=False
+        )
+        return (
+            int.from_bytes(encoded[1:33], "big"),
+            int.from_bytes(encoded[33:], "big"),
+        )
+    return _to_affine(_multiply_generator(k))
+
+
+def nonce_rfc6979(
+    private_key: bytes, message: bytes, extra: bytes = RFC6979_EXTRA_DATA
+):
+    """Yield RFC6979 (HMAC-SHA256) nonce candidates in [1, N)"""
+    h1 = (int.from_bytes(message, "big") % N).to_bytes(32, "big")
+    seed = private_key + h1 + extra
+    v = b"\x01" * 32
+    k = b"\x00" * 32
+    k = hmac.new(k, v + b"\x00" + seed, hashlib.sha256).digest()
+    v = hmac.new(k, v, hashlib.sha256).digest()
+    k = hmac.new(k, v + b"\x01" + seed, hashlib.sha256).digest()
+    v = hmac.new(k, v, hashlib.sha256).digest()
+    while True:
+        v = hmac.new(k, v, hashlib.sha256).digest()
+        candidate = int.from_bytes(v, "big")
+        if 0 < candidate < N:
+            yield candidate
+        k = hmac.new(k, v + b"\x00", hashlib.sha256).digest()
+        v = hmac.new(k, v, hashlib.sha256).digest()
+
+
+def public_key(private_key: bytes) -> bytes:
+    """Return the 32-byte x-only public key for a private key"""
+    return _signing_key(private_key)[2]
+
+
+@functools.lru_cache(maxsize=8)
+def _signing_key(private_key: bytes) -> Tuple[int, bytes, bytes]:
+    """Return (d, d as bytes, x-only pubkey) with d negated for an even-y key.
+
+    Cached because batches sign many events with the same key.
+    """
+    d = int.from_bytes(private_key, "big")
+    if not 0 < d < N:
+        raise ValueError("Private key out of range")
+    px, py = _generator_point(d)
+    if py % 2:
+        d = N - d
+    return d, d.to_bytes(32, "big"), px.to_bytes(32, "big")
+
+
+def sign(private_key: bytes, message: bytes, aux_rand: Optional[bytes] = None) -> bytes:
+    """Create a 64-byte BIP-340 signature over a 32-byte message.
+
+    Without aux_rand the nonce is derived with RFC6979 like btcec (and
+    therefore nak); with aux_rand the BIP-340 reference nonce is used.
+    """
+    if len(message) != 32:
+        raise ValueError("Message must be 32 bytes")
+    d, d_bytes, px_bytes = _signing_key(private_key)
+
+    if aux_rand is not None:
+        t = d ^ int.from_bytes(tagged_hash("BIP0340/aux", aux_rand), "big")
+        nonce = tagged_hash("BIP0340/nonce", t.to_bytes(32, "big") + px_bytes + message)
+        candidates = iter([int.from_bytes(nonce, "big") % N])
+    else:
+        candidates = nonce_rfc6979(d_bytes, message)
+
+    for k in candidates:
+        if k == 0:
+            raise ValueError("Failed to derive signing nonce")
+        rx, ry = _generator_point(k)
+        if ry % 2:
+            k = N - k
+        rx_bytes = rx.to_bytes(32, "big")
+        e = (
+            int.from_bytes(
+                tagged_hash("BIP0340/challenge", rx_bytes + px_bytes + message),
+                "big",
+            )
+            % N
+        )
+        s = (k + e * d) % N
+        if s == 0:
+            # Astronomically unlikely; btcec moves on to the next nonce too
+            continue
+        return rx_bytes + s.to_bytes(32, "big")
+
+
+def verify(pubkey: bytes, message: bytes, signature: bytes) -> bool:
+    """Verify a BIP-340 signature against an x-only public key"""
+    if len(pubkey) != 32 or len(message) != 32 or len(signature) != 64:
+        return False
+
+    if coincurve is not None:
+        try:
+            return coincurve.PublicKeyXOnly(pubkey).verify(signature, message)
+        except Exception:
+            return False
+
+    point = _lift_x(int.from_bytes(pubkey, "big"))
+    r = int.from_bytes(signature[:32], "big")
+    s = int.from_bytes(signature[32:], "big")
+    if point is None or r >= P or s >= N:
+        return False
+    e = (
+        int.from_bytes(
+            tagged_hash("BIP0340/challenge", signature[:32] + pubkey + message),
+            "big",
+        )
+        % N
+    )
+    sg = _multiply_generator(s)
+    ep = _multiply((point[0], point[1], 1), N - e)
+    result = _to_affine(_jacobian_add(sg, ep))
+    return result is not None and result[1] % 2 == 0 and result[0] == r
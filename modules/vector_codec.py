@@ -0,0 +1,68 @@
+"""
+Encodings for the vector in kind 1987 event content.
+
+    csv      comma-separated decimals (the original format; no tag)
+    float32  base64 of little-endian float32 values
+    float16  base64 of little-endian float16 values
+    int8     base64 of int8 values; value = int8 * scale
+
+The encoding is declared with an ["encoding", <name>] tag, plus a
+["scale", <float>] tag for int8. Binary encodings decode straight into a
+NumPy array without going through Python floats.
+"""
+
+import base64
+from typing import List, Tuple
+
+import numpy as np
+
+CSV = "csv"
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+ENCODINGS = (CSV, FLOAT32, FLOAT16, INT8)
+
+_DTYPES = {FLOAT32: "<f4", FLOAT16: "<f2", INT8: "i1"}
+
+
+def encode_vector(vector, encoding: str = CSV) -> Tuple[str, List[List[str]]]:
+    """Encode a vector as event content
+
+    Returns:
+        (content, tags declaring the encoding)
+    """
+    values = np.asarray(vector, dtype=np.float32)
+    if encoding == CSV:
+        return ",".join(f"{value:.7g}" for value in values.tolist()), []
+    if encoding == INT8:
+        peak = float(np.max(np.abs(values))) if len(values) else 0.0
+        scale = peak / 127 if peak else 1.0
+        quantized = np.clip(np.rint(values / scale), -127, 127).astype("i1")
+        content = base64.b64encode(quantized.tobytes()).decode("ascii")
+        return content, [["encoding", INT8], ["scale", repr(scale)]]
+    if encoding in _DTYPES:
+        data = values.astype(_DTYPES[encoding]).tobytes()
+        return base64.b64encode(data).decode("ascii"), [["encoding", encoding]]
+    raise ValueError(f"Unknown vector encoding: {encoding}")
+
+
+def _tag_value(tags: List[List[str]], name: str, default: str = "") -> str:
+    return next((tag[1] for tag in tags if tag[0] == name and len(tag) > 1), default)
+
+
+def vector_encoding(tags: List[List[str]]) -> str:
+    """The encoding an event declares (csv when there is no tag)"""
+    return _tag_value(tags, "encoding", CSV)
+
+
+def decode_vector(content: str, tags: List[List[str]]) -> np.ndarray:
+    """Decode event content into a float32 array"""
+    encoding = vector_encoding(tags)
+    if encoding == CSV:
+        return np.array(content.split(","), dtype=np.float32)
+    if encoding not in _DTYPES:
+        raise ValueError(f"Unknown vector encoding: {encoding}")
+    values = np.frombuffer(base64.b64decode(content), dtype=_DTYPES[encoding])
+    if encoding == INT8:
+        return values.astype(np.float32) * np.float32(_tag_value(tags, "scale", "1"))
+    return values.astype(np.float32)
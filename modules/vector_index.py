@@ -0,0 +1,384 @@
+"""
+On-disk vector index for kind 1987 embedding events.
+
+Vectors are L2-normalized and appended to a float32 matrix that is
+memory-mapped for search, so cosine similarity is a dot product. Row i of
+the matrix belongs to line i of the id table. Once the index passes a
+configurable size, an IVF (inverted file) index is trained with k-means.
+Queries then only scan the rows of the closest clusters. Appended rows are
+assigned to the existing clusters, so the index grows without a rebuild.
+
+Files in the index directory:
+    meta.json      model, dimensions, row count, IVF state and relay cursors
+    vectors.f32    row-major float32 matrix
+    ids.jsonl      one record per row (embedding id, section id, coordinate)
+    centroids.f32  IVF cluster centroids
+    lists.i32      IVF cluster of each row
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .vector_codec import decode_vector
+
+INDEX_VERSION = 1
+DEFAULT_IVF_THRESHOLD = 10000
+DEFAULT_NPROBE = 8
+# Retrain the clusters once the index has grown this much since training
+RETRAIN_GROWTH = 4
+_BLOCK_ROWS = 65536
+
+
+def parse_embedding(event: Dict) -> np.ndarray:
+    """Decode the vector in a 1987 event's content (any declared encoding)"""
+    return decode_vector(event["content"], event["tags"])
+
+
+def embedding_record(event: Dict) -> Dict:
+    """Id table entry for an embedding event"""
+    tags = event["tags"]
+    return {
+        "id": event["id"],
+        "e": next((tag[1] for tag in tags if tag[0] == "e"), ""),
+        "a": next((tag[1] for tag in tags if tag[0] == "a"), ""),
+        "created_at": event["created_at"],
+    }
+
+
+def event_model(event: Dict) -> str:
+    return next((tag[1] for tag in event["tags"] if tag[0] == "model"), "")
+
+
+def _empty_meta(ivf_threshold: int = DEFAULT_IVF_THRESHOLD) -> Dict:
+    return {
+        "version": INDEX_VERSION,
+        "model": None,
+        "dimensions": None,
+        "count": 0,
+        "ids_bytes": 0,
+        "ivf_threshold": ivf_threshold,
+        "ivf": None,
+        "cursors": {},
+    }
+
+
+def _cursor_key(relay: str, query_filter: Dict) -> str:
+    """Relay plus the filter without its time window"""
+    window = ("since", "until", "limit")
+    key = {k: v for k, v in query_filter.items() if k not in window}
+    return f"{relay} {json.dumps(key, sort_keys=True)}"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+
+def _top_k(
+    scores: np.ndarray, rows: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k (scores, rows), highest first"""
+    if len(scores) > k:
+        best = np.argpartition(scores, -k)[-k:]
+        scores, rows = scores[best], rows[best]
+    order = np.argsort(-scores)
+    return scores[order], rows[order]
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for each row, in blocks"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + _BLOCK_ROWS])
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _kmeans(
+    vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0
+) -> np.ndarray:
+    """Spherical k-means on (a sample of) the rows"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * 256)
+    sample_rows = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+    sample = np.asarray(vectors[sample_rows])
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        # Re-seed empty clusters with random rows
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class VectorIndex:
+    """Memory-mapped embedding matrix with an id table and optional IVF"""
+
+    def __init__(self, path: str, ivf_threshold: Optional[int] = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = self._file("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = _empty_meta()
+        if ivf_threshold is not None:
+            self.meta["ivf_threshold"] = ivf_threshold
+        self._records: Optional[List[Dict]] = None
+        self._lists = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def count(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def model(self) -> Optional[str]:
+        return self.meta["model"]
+
+    def _save_meta(self) -> None:
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def records(self) -> List[Dict]:
+        """The id table (first `count` lines; later ones are from an interrupted append)"""
+        if self._records is None:
+            self._records = []
+            if self.count:
+                with open(self._file("ids.jsonl"), "r", encoding="utf-8") as f:
+                    for line, _ in zip(f, range(self.count)):
+                        self._records.append(json.loads(line))
+        return self._records
+
+    def vectors(self) -> np.ndarray:
+        """Memory-mapped (count, dimensions) matrix"""
+        if not self.count:
+            return np.zeros((0, self.meta["dimensions"] or 0), dtype=np.float32)
+        return np.memmap(
+            self._file("vectors.f32"),
+            dtype=np.float32,
+            mode="r",
+            shape=(self.count, self.meta["dimensions"]),
+        )
+
+    def add_events(self, events: Iterable[Dict]) -> int:
+        """Append embedding events not yet in the index; returns how many were added
+
+        Events whose vector cannot be decoded, is empty or does not match the
+        index's model and dimensions are skipped with a warning.
+        """
+        known = {record["id"] for record in self.records()}
+        records, rows = [], []
+        for event in events:
+            if event.get("kind") != 1987 or event["id"] in known:
+                continue
+            model = event_model(event)
+            if self.model is not None and model != self.model:
+                print(
+                    f"Warning: Skipping {event['id']}: model {model} "
+                    f"does not match index model {self.model}"
+                )
+                continue
+            try:
+                vector = parse_embedding(event)
+            except (ValueError, TypeError, KeyError) as e:
+                print(f"Warning: Skipping {event['id']}: cannot decode vector: {e}")
+                continue
+            if not len(vector) or not np.all(np.isfinite(vector)):
+                print(f"Warning: Skipping {event['id']}: empty or non-finite vector")
+                continue
+            if self.meta["dimensions"] is not None and (
+                len(vector) != self.meta["dimensions"]
+            ):
+                print(
+                    f"Warning: Skipping {event['id']}: {len(vector)} dimensions, "
+                    f"index has {self.meta['dimensions']}"
+                )
+                continue
+            # Only an event that decoded fixes the model and size of a new index
+            self.meta["model"] = model
+            self.meta["dimensions"] = len(vector)
+            known.add(event["id"])
+            records.append(embedding_record(event))
+            rows.append(vector)
+
+        if rows:
+            self._append(records, _normalize(np.vstack(rows)))
+        return len(rows)
+
+    def _append(self, records: List[Dict], vectors: np.ndarray) -> None:
+        # Data first, meta last: a crash leaves unreferenced trailing rows
+        self._truncate_to_count()
+        with open(self._file("vectors.f32"), "ab") as f:
+            f.write(vectors.tobytes())
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        with open(self._file("ids.jsonl"), "a", encoding="utf-8") as f:
+            f.write(lines)
+
+        ivf = self.meta["ivf"]
+        if ivf:
+            centroids = self._centroids()
+            with open(self._file("lists.i32"), "ab") as f:
+                f.write(_nearest_centroids(vectors, centroids).tobytes())
+
+        self.meta["count"] += len(records)
+        self.meta["ids_bytes"] += len(lines.encode("utf-8"))
+        self.records().extend(records)
+        self._lists = None
+        self._save_meta()
+
+        threshold = self.meta["ivf_threshold"]
+        if ivf is None and threshold and self.count >= threshold:
+            self.build_ivf()
+        elif ivf and self.count >= ivf["trained_count"] * RETRAIN_GROWTH:
+            self.build_ivf()
+
+    def _truncate_to_count(self) -> None:
+        """Drop rows left behind by an interrupted append"""
+        dimensions = self.meta["dimensions"]
+        vectors_path = self._file("vectors.f32")
+        if os.path.exists(vectors_path):
+            expected = self.count * dimensions * 4
+            if os.path.getsize(vectors_path) > expected:
+                os.truncate(vectors_path, expected)
+        ids_path = self._file("ids.jsonl")
+        if (
+            os.path.exists(ids_path)
+            and os.path.getsize(ids_path) > self.meta["ids_bytes"]
+        ):
+            os.truncate(ids_path, self.meta["ids_bytes"])
+        if self.meta["ivf"]:
+            lists_path = self._file("lists.i32")
+            if os.path.getsize(lists_path) > self.count * 4:
+                os.truncate(lists_path, self.count * 4)
+
+    def _centroids(self) -> np.ndarray:
+        return np.fromfile(self._file("centroids.f32"), dtype=np.float32).reshape(
+            self.meta["ivf"]["nlist"], self.meta["dimensions"]
+        )
+
+    def build_ivf(self, nlist: Optional[int] = None) -> None:
+        """Train IVF clusters over the whole matrix and assign every row"""
+        vectors = self.vectors()
+        nlist = nlist or max(1, int(np.sqrt(self.count)))
+        print(f"Training IVF index with {nlist} lists over {self.count} vectors...")
+        centroids = _kmeans(vectors, nlist)
+        centroids.tofile(self._file("centroids.f32"))
+        _nearest_centroids(vectors, centroids).tofile(self._file("lists.i32"))
+        self.meta["ivf"] = {"nlist": nlist, "trained_count": self.count}
+        self._lists = None
+        self._save_meta()
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Row numbers grouped by cluster, plus each cluster's offset"""
+        if self._lists is None:
+            assignments = np.fromfile(self._file("lists.i32"), dtype=np.int32)
+            assignments = assignments[: self.count]
+            order = np.argsort(assignments, kind="stable").astype(np.int64)
+            counts = np.bincount(assignments, minlength=self.meta["ivf"]["nlist"])
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            self._lists = (order, offsets)
+        return self._lists
+
+    def search(
+        self, query: np.ndarray, k: int = 10, nprobe: int = DEFAULT_NPROBE
+    ) -> List[Tuple[float, Dict]]:
+        """Top-k rows by cosine similarity, as (score, record) pairs
+
+        Uses the IVF index when there is one (scanning the nprobe closest
+        clusters), otherwise scans the whole matrix block by block.
+        """
+        if not self.count:
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        vectors = self.vectors()
+
+        if self.meta["ivf"]:
+            order, offsets = self._inverted_lists()
+            probes = np.argsort(-(self._centroids() @ query))[:nprobe]
+            rows = np.sort(
+                np.concatenate([order[offsets[c] : offsets[c + 1]] for c in probes])
+            )
+            scores, rows = _top_k(np.asarray(vectors[rows]) @ query, rows, k)
+        else:
+            best_scores = np.empty(0, dtype=np.float32)
+            best_rows = np.empty(0, dtype=np.int64)
+            for start in range(0, self.count, _BLOCK_ROWS):
+                block = np.asarray(vectors[start : start + _BLOCK_ROWS])
+                rows = np.arange(start, start + len(block))
+                scores, rows = _top_k(block @ query, rows, k)
+                best_scores, best_rows = _top_k(
+                    np.concatenate([best_scores, scores]),
+                    np.concatenate([best_rows, rows]),
+                    k,
+                )
+            scores, rows = best_scores, best_rows
+
+        records = self.records()
+        return [(float(score), records[row]) for score, row in zip(scores, rows)]
+
+    def get_cursor(self, relay: str, query_filter: Dict) -> Optional[int]:
+        """Newest created_at already read from relay for this filter"""
+        return self.meta.get("cursors", {}).get(_cursor_key(relay, query_filter))
+
+    def set_cursor(self, relay: str, query_filter: Dict, since: int) -> None:
+        """Record that relay was read to the end for this filter up to since"""
+        cursors = self.meta.setdefault("cursors", {})
+        key = _cursor_key(relay, query_filter)
+        cursors[key] = max(since, cursors.get(key) or since)
+        self._save_meta()
+
+    def clear(self) -> None:
+        """Remove all index files (the directory is kept)"""
+        for name in (
+            "meta.json",
+            "vectors.f32",
+            "ids.jsonl",
+            "centroids.f32",
+            "lists.i32",
+        ):
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+        self.meta = _empty_meta(self.meta["ivf_threshold"])
+        self._records = None
+        self._lists = None
+
+
+def read_archive(paths: List[str]) -> Iterable[Dict]:
+    """Yield events from JSONL archives (one event per line)"""
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def rebuild_index(
+    path: str, archive_paths: List[str], ivf_threshold: Optional[int] = None
+) -> VectorIndex:
+    """Rebuild an index from local event archives, without network access"""
+    index = VectorIndex(path, ivf_threshold)
+    index.clear()
+    batch = []
+    for event in read_archive(archive_paths):
+        batch.append(event)
+        if len(batch) >= 10000:
+            index.add_events(batch)
+            batch = []
+    index.add_events(batch)
+    return index
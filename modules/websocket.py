@@ -0,0 +1,274 @@
+"""
+Minimal RFC 6455 websocket client built on asyncio streams.
+
+Only what Nostr relays need: text frames, ping/pong, close and
+fragmented messages. No extensions or subprotocols. `accept` upgrades the
+server side of a connection, for local relay stand-ins, and can answer
+plain NIP-11 information requests.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import ssl
+import struct
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class ConnectionClosed(Exception):
+    """Raised when the websocket is closed by either side"""
+
+
+def _mask(data: bytes, key: bytes) -> bytes:
+    """XOR data with the 4-byte masking key (whole-buffer integer XOR)"""
+    if not data:
+        return data
+    repeated = (key * (len(data) // 4 + 1))[: len(data)]
+    return (
+        int.from_bytes(data, "little") ^ int.from_bytes(repeated, "little")
+    ).to_bytes(len(data), "little")
+
+
+def accept_key(key: str) -> str:
+    """Compute Sec-WebSocket-Accept for a Sec-WebSocket-Key"""
+    digest = hashlib.sha1((key + _WS_GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+class WebSocket:
+    """A websocket over an established asyncio stream pair"""
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        is_client: bool = True,
+        max_size: int = 16 * 1024 * 1024,
+    ):
+        self.reader = reader
+        self.writer = writer
+        self.is_client = is_client
+        self.max_size = max_size
+        self.closed = False
+        self._write_lock = asyncio.Lock()
+
+    async def _write_frame(self, opcode: int, payload: bytes) -> None:
+        header = bytearray([0x80 | opcode])
+        mask_bit = 0x80 if self.is_client else 0
+        length = len(payload)
+        if length < 126:
+            header.append(mask_bit | length)
+        elif length < 65536:
+            header.append(mask_bit | 126)
+            header += struct.pack("!H", length)
+        else:
+            header.append(mask_bit | 127)
+            header += struct.pack("!Q", length)
+        if self.is_client:
+            key = os.urandom(4)
+            header += key
+            payload = _mask(payload, key)
+        async with self._write_lock:
+            if self.writer.is_closing():
+                raise ConnectionError("transport is closing")
+            self.writer.write(bytes(header) + payload)
+            await self.writer.drain()
+
+    async def send(self, message: str) -> None:
+        """Send a text message"""
+        if self.closed:
+            raise ConnectionClosed("websocket is closed")
+        try:
+            await self._write_frame(OP_TEXT, message.encode("utf-8"))
+        except (ConnectionError, OSError) as e:
+            self.closed = True
+            raise ConnectionClosed(str(e))
+
+    async def _read_frame(self) -> Tuple[bool, int, bytes]:
+        first, second = await self.reader.readexactly(2)
+        fin = bool(first & 0x80)
+        opcode = first & 0x0F
+        masked = bool(second & 0x80)
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+        if length > self.max_size:
+            raise ConnectionClosed(f"frame of {length} bytes exceeds max size")
+        key = await self.reader.readexactly(4) if masked else None
+        payload = await self.reader.readexactly(length)
+        if key:
+            payload = _mask(payload, key)
+        return fin, opcode, payload
+
+    async def recv(self) -> str:
+        """Receive the next text message, answering pings along the way"""
+        fragments = []
+        message_opcode = None
+        while True:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+                self.closed = True
+                raise ConnectionClosed(str(e) or "connection lost")
+
+            if opcode == OP_PING:
+                await self._write_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                if not self.closed:
+                    self.closed = True
+                    try:
+                        await self._write_frame(OP_CLOSE, payload[:2])
+                    except (ConnectionError, OSError):
+                        pass
+                raise ConnectionClosed("closed by peer")
+
+            if opcode != OP_CONTINUATION:
+                message_opcode = opcode
+            fragments.append(payload)
+            if sum(len(f) for f in fragments) > self.max_size:
+                raise ConnectionClosed("message exceeds max size")
+            if fin:
+                data = b"".join(fragments)
+                if message_opcode == OP_BINARY:
+                    return data.decode("utf-8", errors="replace")
+                return data.decode("utf-8")
+
+    async def close(self) -> None:
+        """Send a close frame and shut the connection down"""
+        if not self.closed:
+            self.closed = True
+            try:
+                await self._write_frame(OP_CLOSE, struct.pack("!H", 1000))
+            except (ConnectionError, OSError):
+                pass
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def connect(
+    url: str, timeout: float = 10, max_size: int = 16 * 1024 * 1024
+) -> WebSocket:
+    """Open a client websocket to a ws:// or wss:// URL"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("ws", "wss"):
+        raise ValueError(f"Unsupported relay URL: {url}")
+    secure = parsed.scheme == "wss"
+    host = parsed.hostname
+    port = parsed.port or (443 if secure else 80)
+    path = parsed.path or "/"
+    if parsed.query:
+        path += "?" + parsed.query
+
+    ssl_context: Optional[ssl.SSLContext] = (
+        ssl.create_default_context() if secure else None
+    )
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(
+            host,
+            port,
+            ssl=ssl_context,
+            server_hostname=host if secure else None,
+            limit=max_size,
+        ),
+        timeout,
+    )
+
+    key = base64.b64encode(os.urandom(16)).decode()
+    host_header = host if parsed.port is None else f"{host}:{parsed.port}"
+    request = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host_header}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n"
+        "\r\n"
+    )
+    writer.write(request.encode())
+    await writer.drain()
+
+    response = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    lines = response.decode("latin-1").split("\r\n")
+    status = lines[0].split(" ")
+    if len(status) < 2 or status[1] != "101":
+        writer.close()
+        raise ConnectionError(f"Websocket upgrade failed: {lines[0]}")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get("sec-websocket-accept") != accept_key(key):
+        writer.close()
+        raise ConnectionError("Websocket upgrade failed: bad accept key")
+
+    return WebSocket(reader, writer, is_client=True, max_size=max_size)
+
+
+async def accept(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    timeout: float = 10,
+    max_size: int = 16 * 1024 * 1024,
+    info: Optional[Dict] = None,
+) -> WebSocket:
+    """Answer a client's upgrade request on an accepted connection
+
+    Args:
+        info: NIP-11 document served to plain HTTP requests that accept
+            application/nostr+json
+    """
+    request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    headers = {}
+    for line in request.decode("latin-1").split("\r\n")[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    key = headers.get("sec-websocket-key")
+    if info is not None and "application/nostr+json" in headers.get("accept", ""):
+        body = json.dumps(info).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/nostr+json\r\n"
+            b"Access-Control-Allow-Origin: *\r\nConnection: close\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+        raise ConnectionError("Answered a NIP-11 information request")
+    if headers.get("upgrade", "").lower() != "websocket" or not key:
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        writer.close()
+        raise ConnectionError("Not a websocket upgrade request")
+
+    response = (
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {accept_key(key)}\r\n"
+        "\r\n"
+    )
+    writer.write(response.encode())
+    await writer.drain()
+    return WebSocket(reader, writer, is_client=False, max_size=max_size)
@@ -4,10 +4,10 @@ import sys
 import argparse
 import json
 import os
-import re
 from typing import Dict, List, Optional, Tuple
 
-from modules.adoc_parser import parse_adoc_file
+from modules import metrics, profiler
+from modules.adoc_parser import parse_adoc_document
 from modules.tag_utils import (
     clean_tag,
     create_section_tags,
@@ -15,12 +15,30 @@ from modules.tag_utils import (
     add_reference_to_index,
 )
 from modules.key_utils import read_encrypted_key
-from modules.event_creator import create_event
+from modules.event_creator import create_event, create_events, get_signer_pubkey
 from modules.event_verifier import verify_event
 from modules.event_encoder import encode_event_id
-from modules.event_publisher import publish_event
+from modules.event_publisher import (
+    publish_event,
+    publish_events,
+)
+from modules.event_bundle import (
+    bundle_header,
+    dependency_order,
+    save_bundle,
+    write_bundle,
+)
 from modules.event_utils import print_event_summary, get_title_from_tags
 from modules.nak_utils import nak_decode
+from modules.publish_journal import PublishJournal, publish_journaled
+from modules.publication_manifest import (
+    MANIFEST_VERSION,
+    create_events_incremental,
+    load_manifest,
+    mark_published,
+    published_to,
+    save_manifest,
+)
 import warnings
 
 
@@ -29,77 +47,13 @@ def extract_metadata(file_path: str) -> Dict[str, str]:
     Extract metadata from the section between title and first section.
     Returns a dictionary with metadata keys and values.
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    # Extract document title
-    title_match = re.search(r"^=\s+(.+?)$", content, re.MULTILINE)
-    if not title_match:
-        print("Error: No document title found")
-        return {}
-
-    title = title_match.group(1).strip()
-
-    # Find the position of the title and the first section heading
-    title_pos = title_match.start()
-    first_section_match = re.search(r"^==\s+.+?$", content, re.MULTILINE)
-    first_section_pos = (
-        first_section_match.start() if first_section_match else len(content)
-    )
-
-    # Extract the metadata section
-    metadata_section = content[title_match.end() : first_section_pos].strip()
-
-    # Initialize metadata dictionary with title
-    metadata = {"title": title}
-
-    # Extract image if it exists (usually right after title)
-    image_match = re.search(r"image::([^\[]+)", metadata_section)
-    if image_match:
-        metadata["image"] = image_match.group(1).strip()
-
-    # Extract author information
-    author_match = re.search(r"^:author:\s+(.+?)$", metadata_section, re.MULTILINE)
-    if author_match:
-        metadata["author"] = author_match.group(1).strip()
-
-    # Extract summary - usually a paragraph before the first section
-    # Look for a paragraph that's not attribute definition
-    summary_lines = []
-    for line in metadata_section.split("\n"):
-        line = line.strip()
-        if line and not line.startswith(":") and not line.startswith("image::"):
-            summary_lines.append(line)
-
-    if summary_lines:
-        metadata["summary"] = " ".join(summary_lines)
-
-    # Extract other AsciiDoc attributes
-    for match in re.finditer(r"^:([^:]+):\s+(.+?)$", metadata_section, re.MULTILINE):
-        key = match.group(1).strip().lower()
-        value = match.group(2).strip()
-        metadata[key] = value
-
-    # Extract tags (could be specified in different ways)
-    tags = []
-    tags_match = re.search(r"^:tags:\s+(.+?)$", metadata_section, re.MULTILINE)
-    if tags_match:
-        tags = [tag.strip() for tag in tags_match.group(1).split(",")]
+    return parse_adoc_document(file_path, quiet=True)["metadata"]
 
-    # Some documents use keywords instead of tags
-    keywords_match = re.search(r"^:keywords:\s+(.+?)$", metadata_section, re.MULTILINE)
-    if keywords_match:
-        tags.extend([tag.strip() for tag in keywords_match.group(1).split(",")])
 
-    if tags:
-        metadata["tags"] = tags
-
-    return metadata
-
-
-def extract_title_image(file_path: str) -> str:
+def extract_title_image(file_path: str, metadata: Optional[Dict] = None) -> str:
     """Extract the title image from an AsciiDoc file."""
-    metadata = extract_metadata(file_path)
+    if metadata is None:
+        metadata = extract_metadata(file_path)
     return metadata.get("image", "")
 
 
@@ -191,15 +145,13 @@ def _group_l2_sections(sections: List[Dict]) -> List[Dict]:
     return l2_sections
 
 
-def create_content_event(
+def content_event_template(
     content: str,
     title: str,
     parent_title: str,
-    key: str,
     author: Optional[str] = None,
-    decrypt=True,
 ) -> Dict:
-    """Create a 30041 event for a section"""
+    """Build the unsigned 30041 event for a section"""
     tags = create_section_tags(parent_title, title)
     images = extract_images(content)
 
@@ -211,7 +163,22 @@ def create_content_event(
     if author:
         tags.append(["author", author])
 
-    event = create_event(30041, content, tags, key, decrypt=decrypt)
+    return {"kind": 30041, "content": content, "tags": tags}
+
+
+def create_content_event(
+    content: str,
+    title: str,
+    parent_title: str,
+    key: str,
+    author: Optional[str] = None,
+    decrypt=True,
+) -> Dict:
+    """Create a 30041 event for a section"""
+    template = content_event_template(content, title, parent_title, author)
+    event = create_event(
+        template["kind"], template["content"], template["tags"], key, decrypt=decrypt
+    )
     if verify_event(event):
         print(f"Event verified: {event['id']}")
         return event
@@ -220,17 +187,49 @@ def create_content_event(
         sys.exit(1)
 
 
-def create_index_event(
+def create_content_events(
+    sections: List[Dict],
+    parent_title: str,
+    key: str,
+    author: Optional[str] = None,
+    decrypt=True,
+    manifest: Optional[Dict] = None,
+    pubkey: Optional[str] = None,
+) -> List[Dict]:
+    """Create 30041 events for a list of sections, signed as one batch
+
+    With a manifest, sections whose content and tags are unchanged reuse
+    their previously signed event.
+    """
+    templates = [
+        content_event_template(
+            section["content"], section["title"], parent_title, author
+        )
+        for section in sections
+    ]
+    events, reused = create_events_incremental(
+        templates, key, pubkey, manifest, decrypt=decrypt
+    )
+    for event, was_reused in zip(events, reused):
+        if was_reused:
+            print(f"Unchanged, reusing event: {event['id']}")
+        elif verify_event(event):
+            print(f"Event verified: {event['id']}")
+        else:
+            print("Event verification failed!")
+            sys.exit(1)
+    return events
+
+
+def index_event_template(
     title: str,
     section_events: List[Dict],
-    key: str,
     primary_relay: str,
     metadata: Optional[Dict] = None,
     author: Optional[str] = None,
     author_pubkey: Optional[str] = None,
-    decrypt=True,
 ) -> Dict:
-    """Create a 30040 event linking to section events with metadata"""
+    """Build the unsigned 30040 event linking to section events with metadata"""
     index_tags = create_index_tags(title)
 
     # Add metadata tags
@@ -261,8 +260,8 @@ def create_index_event(
             index_tags.append(["l", metadata["language"]])
 
         # Add any other metadata as tags
-        for key, value in metadata.items():
-            if key not in [
+        for meta_key, value in metadata.items():
+            if meta_key not in [
                 "image",
                 "summary",
                 "tags",
@@ -273,7 +272,7 @@ def create_index_event(
                 "author",
             ]:
                 # Convert multi-word keys to kebab-case
-                tag_key = key.replace("_", "-")
+                tag_key = meta_key.replace("_", "-")
                 index_tags.append([tag_key, value])
 
     # Add author
@@ -290,7 +289,35 @@ def create_index_event(
             index_tags, section["event"], section["d_tag"], primary_relay
         )
 
-    event = create_event(30040, "", index_tags, key, decrypt=decrypt)
+    return {"kind": 30040, "content": "", "tags": index_tags}
+
+
+def create_index_event(
+    title: str,
+    section_events: List[Dict],
+    key: str,
+    primary_relay: str,
+    metadata: Optional[Dict] = None,
+    author: Optional[str] = None,
+    author_pubkey: Optional[str] = None,
+    decrypt=True,
+    manifest: Optional[Dict] = None,
+    pubkey: Optional[str] = None,
+) -> Dict:
+    """Create a 30040 event linking to section events with metadata
+
+    With a manifest, an index whose references and metadata are unchanged
+    reuses its previously signed event.
+    """
+    template = index_event_template(
+        title, section_events, primary_relay, metadata, author, author_pubkey
+    )
+    (event,), (reused,) = create_events_incremental(
+        [template], key, pubkey, manifest, decrypt=decrypt
+    )
+    if reused:
+        print(f"Unchanged, reusing index event: {event['id']}")
+        return event
     if verify_event(event):
         print(f"Event verified: {event['id']}")
         return event
@@ -310,8 +337,61 @@ def main():
     parser.add_argument("--adoc-file", required=True, help="AsciiDoc file to convert")
     parser.add_argument("--author", help="Author name to include in tags")
     parser.add_argument("--author-pubkey", help="Author public key to include in tags")
+    parser.add_argument(
+        "--verify-mode",
+        choices=["ok", "req"],
+        default="req",
+        help="Publish confirmation: relay OK only, or OK plus one batched REQ "
+        "per relay that re-sends missing events (default: req)",
+    )
+    parser.add_argument(
+        "--manifest",
+        help="Publication manifest used to skip unchanged events "
+        "(default: <adoc-file>.manifest.json)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the manifest and re-sign and re-publish every event",
+    )
+    parser.add_argument(
+        "--journal",
+        help="Publish journal used to resume interrupted or partly failed runs "
+        "(default: <adoc-file>.journal.jsonl)",
+    )
+    parser.add_argument(
+        "--build-bundle",
+        metavar="PATH",
+        help="Sign the events and write them to a JSONL bundle ('-' for stdout) "
+        "instead of publishing; publish it later with publish_bundle.py",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="Record per-stage timings, call latencies, event sizes and relay "
+        "results, and write them to PATH on exit",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=metrics.FORMATS,
+        default="json",
+        help="Format of the --metrics report (default: json)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Profile each pipeline stage separately and write pstats files, "
+        "a speedscope flame graph and CPU/blocked time totals to DIR",
+    )
 
     args = parser.parse_args()
+    if args.build_bundle == "-":
+        # The bundle owns stdout; progress output goes to stderr
+        bundle_out, sys.stdout = sys.stdout, sys.stderr
+    if args.metrics:
+        metrics.report_at_exit(args.metrics, args.metrics_format)
+    if args.profile:
+        profiler.profile_at_exit(args.profile)
 
     print("\nStarting conversion process...")
     print(f"Input file: {args.adoc_file}")
@@ -321,23 +401,31 @@ def main():
 
     # Read the key
     key = read_encrypted_key(args.nsec) if args.nsec.startswith("/") else args.nsec
+    pubkey = get_signer_pubkey(key)
+
+    # Load the manifest of previously signed events
+    manifest_path = args.manifest or f"{args.adoc_file}.manifest.json"
+    manifest = (
+        {"version": MANIFEST_VERSION, "events": {}}
+        if args.force
+        else load_manifest(manifest_path)
+    )
 
-    # Extract metadata from the document
-    metadata = extract_metadata(args.adoc_file)
+    # Parse the AsciiDoc file and its metadata in one read
+    doc = parse_adoc_document(args.adoc_file)
+    metadata = doc["metadata"]
     print("\nExtracted metadata:")
     for k, v in metadata.items():
         print(f"  {k}: {v}")
 
-    # Parse the AsciiDoc file
-    doc = parse_adoc_file(args.adoc_file)
-
     # Use metadata author if not provided in command line
     if not args.author and "author" in metadata:
         args.author = metadata["author"]
         print(f"Using author from document: {args.author}")
 
     # Organize sections using document title as root if needed
-    organized = organize_sections(doc["title"], doc["sections"])
+    with metrics.stage("organize"):
+        organized = organize_sections(doc["title"], doc["sections"])
     if not organized:
         print("Error: No sections found in document")
         sys.exit(1)
@@ -351,15 +439,15 @@ def main():
         section_events = []
 
         # Handle L2 sections under this L1
-        for l2_section in l1_section["l2_sections"]:
-            event = create_content_event(
-                l2_section["content"],
-                l2_section["title"],
-                l1_section["title"],
-                key,
-                args.author,
-            )
-
+        l2_events = create_content_events(
+            l1_section["l2_sections"],
+            l1_section["title"],
+            key,
+            args.author,
+            manifest=manifest,
+            pubkey=pubkey,
+        )
+        for l2_section, event in zip(l1_section["l2_sections"], l2_events):
             section_events.append(
                 {
                     "event": event,
@@ -379,6 +467,8 @@ def main():
                 primary_relay,
                 author=args.author,
                 author_pubkey=args.author_pubkey,
+                manifest=manifest,
+                pubkey=pubkey,
             )
             all_events.append(("Index", l1_index))
             root_references.append(
@@ -410,12 +500,54 @@ def main():
         metadata=metadata,
         author=args.author,
         author_pubkey=args.author_pubkey,
+        manifest=manifest,
+        pubkey=pubkey,
     )
     all_events.append(("Root Index", root_index))
+    save_manifest(manifest_path, manifest)
+
+    if args.build_bundle:
+        events = dependency_order([event for _, event in all_events])
+        header = bundle_header(events, args.adoc_file, args.relays)
+        if args.build_bundle == "-":
+            count = write_bundle(bundle_out, header, events)
+        else:
+            count = save_bundle(args.build_bundle, header, events)
+        print(f"\nWrote {count} signed events to {args.build_bundle}")
+        return
+
+    # The journal plans the whole publication, so that each relay gets
+    # the root only once it has everything the root references. Relays
+    # the manifest says have an event from an earlier run, or that an
+    # interrupted run got to confirm it, are not sent it again
+    journal = PublishJournal(args.journal or f"{args.adoc_file}.journal.jsonl")
+    journal.begin([event for _, event in all_events], args.relays, args.adoc_file)
+    journal.record_known(
+        {event["id"]: published_to(manifest, event) for _, event in all_events}
+    )
+    for _, event in all_events:
+        mark_published(
+            manifest,
+            event,
+            [relay for relay in args.relays if journal.accepted(event["id"], relay)],
+        )
+    save_manifest(manifest_path, manifest)
+    pending_events = [
+        (event_type, event)
+        for event_type, event in all_events
+        if not journal.confirmed(event["id"])
+    ]
+    print(
+        f"\n{len(all_events) - len(pending_events)} of {len(all_events)} events "
+        "already on every relay"
+    )
+    if not pending_events:
+        print("Nothing to publish.")
+        sys.exit(0)
 
-    # Print summary of all events
+    # Print summary of events to publish
     print("\n=== Events Summary ===")
-    for event_type, event in all_events:
+    for event_type, event in pending_events:
         print(f"\n{event_type}:")
         print_event_summary(event)
 
@@ -424,15 +556,27 @@ def main():
         print("Publication cancelled.")
         sys.exit(0)
 
-    # Publish events in order: content -> indexes -> root
+    # Publish events in order: content -> indexes -> root, the root to
+    # each relay only once that relay confirmed everything it references
     print(f"\nPublishing events to relays: {', '.join(args.relays)}")
 
+    results = publish_journaled(journal, verify=args.verify_mode == "req")
+    journal.close()
+
     all_success = True
-    for event_type, event in all_events:
-        print(f"\nPublishing {event_type}...")
-        if not publish_event(event, args.relays):
-            print(f"Failed to publish {event_type} event!")
+    for event_type, event in pending_events:
+        relay_results = results[event["id"]]
+        mark_published(
+            manifest, event, [relay for relay, (ok, _) in relay_results.items() if ok]
+        )
+        missing = [r for r in args.relays if not relay_results.get(r, (False, ""))[0]]
+        if missing:
+            print(
+                f"Failed to publish {event_type} event {event['id']} "
+                f"to {', '.join(missing)}!"
+            )
             all_success = False
+    save_manifest(manifest_path, manifest)
 
     if all_success:
         print("\nAll events published successfully!")
@@ -447,6 +591,10 @@ def main():
         print(f"naddr:  {naddr}")
     else:
         print("\nSome events failed to publish.")
+        print(
+            "Run the converter again, or publish just the remaining events "
+            f"with: ./resume_publish.py {journal.path}"
+        )
 
 
 if __name__ == "__main__":
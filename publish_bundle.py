@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+"""
+publish_bundle.py - Publish event bundles written by --build-bundle
+
+Streams each bundle to the relays in batches, in the order the events
+were written (sections before the indexes that reference them). Only one
+batch per bundle is in memory at a time; several bundles are published
+concurrently over one connection per relay.
+
+Usage:
+  ./publish_bundle.py --relays wss://relay.example BUNDLE [BUNDLE ...]
+  ./nip62_converter.py ... --build-bundle - | ./publish_bundle.py --relays ... -
+"""
+
+import argparse
+import asyncio
+import contextlib
+import sys
+from typing import List, Tuple
+
+from modules import metrics
+from modules.event_bundle import read_bundle, read_chunks, root_coordinate
+from modules.event_publisher import publish_events_async, publish_succeeded
+from modules.event_verifier import filter_valid_events
+from modules.nip19 import encode_naddr
+from modules.relay_pool import RelayPool
+
+
+def open_bundle(path: str):
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, "r", encoding="utf-8")
+
+
+async def publish_bundle(
+    pool: RelayPool,
+    path: str,
+    batch_size: int = 100,
+    max_retries: int = 3,
+    delay: float = 1,
+    verify: bool = False,
+    check: bool = True,
+) -> Tuple[int, int]:
+    """Publish one bundle batch by batch
+
+    Args:
+        verify: Confirm each batch with one REQ per relay
+        check: Discard events whose id or signature does not check out
+
+    Returns:
+        (events published, events failed)
+    """
+    published = failed = 0
+    with open_bundle(path) as f:
+        header, events = read_bundle(f)
+        print(
+            f"Publishing {header['events']} event(s) from {path} "
+            f"(source: {header.get('source')})"
+        )
+        for chunk in read_chunks(events, batch_size):
+            if check:
+                valid = filter_valid_events(chunk, "bundle event")
+                failed += len(chunk) - len(valid)
+                chunk = valid
+            results = await publish_events_async(
+                pool, chunk, max_retries, delay, verify
+            )
+            for event in chunk:
+                if publish_succeeded(results[event["id"]]):
+                    published += 1
+                else:
+                    failed += 1
+            print(f"Debug: {path}: {published + failed}/{header['events']} sent")
+
+    root = root_coordinate(header)
+    if root and not failed:
+        print(f"{path}: naddr {encode_naddr(*root, pool.relays)}")
+    return published, failed
+
+
+async def publish_bundles(
+    paths: List[str], relays: List[str], jobs: int, **options
+) -> List[Tuple[int, int]]:
+    """Publish several bundles concurrently, at most jobs at a time"""
+    semaphore = asyncio.Semaphore(max(1, jobs))
+
+    async def run(pool: RelayPool, path: str) -> Tuple[int, int]:
+        async with semaphore:
+            try:
+                return await publish_bundle(pool, path, **options)
+            except (OSError, ValueError) as e:
+                print(f"Error: {path}: {e}")
+                return 0, -1
+
+    async with RelayPool(relays) as pool:
+        return await asyncio.gather(*(run(pool, path) for path in paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish event bundles written by --build-bundle"
+    )
+    parser.add_argument(
+        "bundles", nargs="+", help="Bundle files to publish ('-' for stdin)"
+    )
+    parser.add_argument(
+        "--relays", required=True, nargs="+", help="Relay URLs to publish to"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="Events read and published at a time per bundle (default: 100)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Bundles published concurrently (default: 4)",
+    )
+    parser.add_argument(
+        "--verify-mode",
+        choices=["ok", "req"],
+        default="req",
+        help="Publish confirmation: relay OK only, or OK plus one batched REQ "
+        "per relay that re-sends missing events (default: req)",
+    )
+    parser.add_argument(
+        "--max-retries", type=int, default=3, help="Publish attempts per batch"
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=1,
+        help="Base seconds of the exponential backoff between attempts (default: 1)",
+    )
+    parser.add_argument(
+        "--no-check",
+        action="store_true",
+        help="Publish without checking event ids and signatures first",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="Record publish latencies, event sizes and relay results to PATH",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=metrics.FORMATS,
+        default="json",
+        help="Format of the --metrics report (default: json)",
+    )
+
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.report_at_exit(args.metrics, args.metrics_format)
+    if args.bundles.count("-") > 1:
+        print("Error: stdin ('-') can only be given once")
+        sys.exit(1)
+
+    results = asyncio.run(
+        publish_bundles(
+            args.bundles,
+            args.relays,
+            args.jobs,
+            batch_size=args.batch_size,
+            max_retries=args.max_retries,
+            delay=args.delay,
+            verify=args.verify_mode == "req",
+            check=not args.no_check,
+        )
+    )
+
+    print("\n=== Bundles ===")
+    all_success = True
+    for path, (published, failed) in zip(args.bundles, results):
+        if failed < 0:
+            print(f"✗ {path}: bundle could not be read (see error above)")
+        else:
+            status = "✓" if not failed else "✗"
+            print(f"{status} {path}: {published} published, {failed} failed")
+        all_success = all_success and failed == 0
+    if not all_success:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+resume_publish.py - Finish a publish run from its journal
+
+Publishes only the events no relay of the run has confirmed yet, in the
+journal's order (sections before indexes), and the root index last once
+everything it references is confirmed. Nothing is parsed or signed again.
+
+Usage:
+  ./resume_publish.py doc.adoc.journal.jsonl [--verify-mode ok]
+"""
+
+import argparse
+import os
+import sys
+
+from modules.publish_journal import PublishJournal, publish_journaled
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish the unconfirmed events of an interrupted run"
+    )
+    parser.add_argument("journal", help="Publish journal of the run")
+    parser.add_argument(
+        "--verify-mode",
+        choices=["ok", "req"],
+        default="req",
+        help="Publish confirmation: relay OK only, or OK plus one batched REQ "
+        "per relay that re-sends missing events (default: req)",
+    )
+    parser.add_argument(
+        "--max-retries", type=int, default=3, help="Publish attempts per relay"
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=1,
+        help="Base seconds of the exponential backoff between attempts (default: 1)",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.journal):
+        print(f"Error: Journal {args.journal} not found")
+        sys.exit(1)
+
+    with PublishJournal(args.journal) as journal:
+        pending = journal.pending()
+        print(
+            f"Run of {journal.source}: {len(journal.events) - len(pending)} of "
+            f"{len(journal.events)} events confirmed on {', '.join(journal.relays)}"
+        )
+        if not pending:
+            print("Nothing left to publish.")
+            return
+
+        print(f"Publishing {len(pending)} remaining event(s)...")
+        publish_journaled(
+            journal, args.max_retries, args.delay, args.verify_mode == "req"
+        )
+
+        remaining = journal.pending()
+        if remaining:
+            print(f"\n{len(remaining)} event(s) still unconfirmed:")
+            for event in remaining:
+                failures = {
+                    relay: message
+                    for relay, (ok, message) in journal.results.get(
+                        event["id"], {}
+                    ).items()
+                    if not ok
+                }
+                print(f"  {event['kind']} {event['id']}: {failures or 'not sent'}")
+            sys.exit(1)
+        print("\nAll events published successfully!")
+
+
+if __name__ == "__main__":
+    main()
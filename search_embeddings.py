@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""
+search_embeddings.py - Semantic search over kind 1987 embedding events
+
+Ingests embedding events from a relay (or local JSONL archives) into a
+local vector index and answers top-k cosine similarity queries.
+
+Usage:
+  ./search_embeddings.py ingest --index <dir> --relay <relay_url> [--author <npub>]
+  ./search_embeddings.py ingest --index <dir> --archive <events.jsonl> ...
+  ./search_embeddings.py rebuild --index <dir> [--archive <events.jsonl> ...]
+  ./search_embeddings.py search --index <dir> "query text" [-k 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from modules.event_fetcher import PaginationError, stream_events_paginated
+from modules.event_verifier import filter_valid_events
+from modules.nip19 import decode
+from modules.relay_pool import RelayPool
+from modules.vector_index import (
+    DEFAULT_IVF_THRESHOLD,
+    DEFAULT_NPROBE,
+    VectorIndex,
+    read_archive,
+    rebuild_index,
+)
+
+ARCHIVE_NAME = "events.jsonl"
+
+
+def archive_path(index_dir: str) -> str:
+    """The index's own archive of every ingested event"""
+    return os.path.join(index_dir, ARCHIVE_NAME)
+
+
+def parse_author(author: str) -> str:
+    """Accept an npub or a hex pubkey"""
+    if author.startswith("npub"):
+        return decode(author)["pubkey"]
+    return author
+
+
+def embedding_filter(authors: Optional[List[str]] = None) -> Dict:
+    query_filter = {"kinds": [1987]}
+    if authors:
+        query_filter["authors"] = authors
+    return query_filter
+
+
+async def fetch_embedding_events(
+    relay: str, query_filter: Dict, since: Optional[int] = None
+) -> Tuple[List[Dict], Optional[int]]:
+    """Fetch every event matching the filter from a relay, paging backward
+    with until cursors, from `since` (inclusive) if given
+
+    Returns:
+        The events and the newest created_at among them, or None as the
+        newest when there were none or the relay was not read to the end
+
+    Raises:
+        PaginationError: The relay could not be read to the end
+    """
+    relay_filter = dict(query_filter)
+    if since is not None:
+        relay_filter["since"] = since
+    async with RelayPool([relay]) as pool:
+        connection = pool.connections[relay]
+        incomplete = connection.incomplete_reads
+        events = [event async for event in stream_events_paginated(pool, relay_filter)]
+        if connection.incomplete_reads > incomplete:
+            print(f"Debug: {relay} was not read to the end, keeping its cursor")
+            return events, None
+    newest = max((event["created_at"] for event in events), default=None)
+    return events, newest
+
+
+def ingest(index: VectorIndex, events: List[Dict], archive: Optional[str]) -> None:
+    """Verify events, add them to the index and archive the ones it took"""
+    events = filter_valid_events(events, label="embedding")
+    known = {record["id"] for record in index.records()}
+    new_events = [event for event in events if event["id"] not in known]
+    before = index.count
+    added = index.add_events(new_events)
+    if archive and added:
+        # Only what the index accepted, so a rebuild never meets bad events
+        added_ids = {record["id"] for record in index.records()[before:]}
+        with open(archive, "a", encoding="utf-8") as f:
+            for event in new_events:
+                if event["id"] in added_ids:
+                    f.write(json.dumps(event) + "\n")
+    print(f"Added {added} embeddings ({index.count} in index, model {index.model})")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Semantic search over kind 1987 embedding events"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Add embedding events")
+    ingest_parser.add_argument("--index", required=True, help="Index directory")
+    source = ingest_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--relay", help="Relay URL to fetch embeddings from")
+    source.add_argument("--archive", nargs="+", help="Local JSONL event archives")
+    ingest_parser.add_argument(
+        "--author", action="append", help="Only embeddings by this npub/hex pubkey"
+    )
+    ingest_parser.add_argument(
+        "--ivf-threshold",
+        type=int,
+        help=f"Build an IVF index once this many vectors are stored "
+        f"(default: {DEFAULT_IVF_THRESHOLD}, 0 disables)",
+    )
+
+    rebuild_parser = subparsers.add_parser(
+        "rebuild", help="Rebuild the index from local archives (no network)"
+    )
+    rebuild_parser.add_argument("--index", required=True, help="Index directory")
+    rebuild_parser.add_argument(
+        "--archive", nargs="+", help=f"JSONL archives (default: <index>/{ARCHIVE_NAME})"
+    )
+    rebuild_parser.add_argument("--ivf-threshold", type=int, help="IVF size threshold")
+
+    search_parser = subparsers.add_parser("search", help="Query the index")
+    search_parser.add_argument("--index", required=True, help="Index directory")
+    search_parser.add_argument("query", help="Text to search for")
+    search_parser.add_argument("-k", type=int, default=10, help="Number of results")
+    search_parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=DEFAULT_NPROBE,
+        help=f"IVF clusters to scan (default: {DEFAULT_NPROBE})",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        index = VectorIndex(args.index, args.ivf_threshold)
+        if args.relay:
+            authors = [parse_author(a) for a in args.author] if args.author else None
+            query_filter = embedding_filter(authors)
+            # Only ask for what is newer than the last complete read of this
+            # relay with this filter; the cursor is inclusive, since events
+            # at that second may have arrived after the read
+            since = index.get_cursor(args.relay, query_filter)
+            print(f"Fetching embeddings from {args.relay}...")
+            try:
+                events, newest = asyncio.run(
+                    fetch_embedding_events(args.relay, query_filter, since)
+                )
+            except PaginationError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            print(f"Received {len(events)} embedding events")
+            ingest(index, events, archive_path(args.index))
+            if newest is not None:
+                index.set_cursor(args.relay, query_filter, newest)
+        else:
+            ingest(index, list(read_archive(args.archive)), archive_path(args.index))
+
+    elif args.command == "rebuild":
+        archives = args.archive or [archive_path(args.index)]
+        missing = [path for path in archives if not os.path.exists(path)]
+        if missing:
+            print(f"Error: Archive not found: {', '.join(missing)}")
+            sys.exit(1)
+        index = rebuild_index(args.index, archives, args.ivf_threshold)
+        print(f"Rebuilt index with {index.count} embeddings")
+
+    elif args.command == "search":
+        index = VectorIndex(args.index)
+        if not index.count:
+            print("Error: Index is empty, run ingest first")
+            sys.exit(1)
+
+        # Imported here so ingest and rebuild never load the embedding model
+        from modules.event_embedder import embed_texts
+
+        try:
+            query = embed_texts([args.query], model_name=index.model)[0]
+        except ImportError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        for rank, (score, record) in enumerate(
+            index.search(query, args.k, args.nprobe), 1
+        ):
+            print(f"{rank:3}. {score:.4f}  {record['a'] or record['e']}")
+
+
+if __name__ == "__main__":
+    main()
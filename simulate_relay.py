@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+simulate_relay.py - Run a local Nostr relay stand-in with fault injection
+
+Serves an in-memory NIP-01 relay (with replaceable events and NIP-09
+deletions) so publishing, retries and deletion can be exercised without
+touching production relays.
+
+Usage:
+  ./simulate_relay.py [--port 7447] [--latency 0.05] [--rate-limit 100] [options]
+"""
+
+import argparse
+import asyncio
+import json
+
+from modules.relay_simulator import RelaySimulator
+
+
+async def serve(relay: RelaySimulator, stats_interval: float) -> None:
+    async with relay:
+        print(f"Relay simulator listening on {relay.url}")
+        while True:
+            await asyncio.sleep(stats_interval or 3600)
+            if stats_interval:
+                print(f"Debug: {len(relay.events)} stored, {json.dumps(relay.stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a local Nostr relay stand-in with fault injection"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=7447, help="Port to listen on")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds before each reply"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Random extra seconds per reply"
+    )
+    parser.add_argument(
+        "--max-message-bytes",
+        type=int,
+        default=0,
+        help="Reject larger client messages (default: 0, no limit)",
+    )
+    parser.add_argument(
+        "--max-limit",
+        type=int,
+        default=0,
+        help="Most events returned per REQ filter (default: 0, no limit)",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help="EVENTs per second per connection (default: 0, unlimited)",
+    )
+    parser.add_argument(
+        "--burst", type=int, default=0, help="EVENTs allowed at once before limiting"
+    )
+    parser.add_argument(
+        "--drop-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of messages silently ignored (default: 0)",
+    )
+    parser.add_argument("--seed", type=int, help="Random seed for jitter and drops")
+    parser.add_argument(
+        "--no-verify",
+        action="store_true",
+        help="Accept events without checking ids and signatures",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between stats lines (0 disables)",
+    )
+    args = parser.parse_args()
+
+    relay = RelaySimulator(
+        args.host,
+        args.port,
+        verify=not args.no_verify,
+        latency=args.latency,
+        jitter=args.jitter,
+        max_message_bytes=args.max_message_bytes,
+        max_limit=args.max_limit,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+    try:
+        asyncio.run(serve(relay, args.stats_interval))
+    except KeyboardInterrupt:
+        print(f"\nStopped. {len(relay.events)} stored, {json.dumps(relay.stats)}")
+
+
+if __name__ == "__main__":
+    main()
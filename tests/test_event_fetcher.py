@@ -0,0 +1,108 @@
+"""
+Paging and store sync in modules/event_fetcher.py, against the bundled
+relay simulator.
+"""
+
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+from modules.event_fetcher import (
+    PaginationError,
+    stream_events_paginated,
+    sync_to_store,
+)
+from modules.event_signer import sign_events
+from modules.event_store import EventStore
+from modules.relay_pool import RelayPool
+from modules.relay_simulator import RelaySimulator
+
+SECRET = "0000000000000000000000000000000000000000000000000000000000000001"
+QUERY = {"kinds": [1]}
+
+
+def make_events(count):
+    templates = [
+        {"kind": 1, "content": f"note {i}", "tags": [], "created_at": 1700000000 + i}
+        for i in range(count)
+    ]
+    return sign_events(templates, SECRET, workers=1)
+
+
+def stop_answering_after(relay, reqs):
+    """Make the relay ignore every REQ after the first `reqs`"""
+    on_message = relay._on_message
+
+    def limited(client, raw):
+        if raw.startswith('["REQ"'):
+            if relay.stats["reqs"] >= reqs:
+                return
+        on_message(client, raw)
+
+    relay._on_message = limited
+
+
+async def sync(relay, store, page_size):
+    async with RelayPool([relay.url], timeout=0.5) as pool:
+        added = await sync_to_store(pool, store, QUERY, page_size)
+        return added, pool.connections[relay.url].incomplete_reads
+
+
+def run(coroutine):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(coroutine)
+
+
+def test_sync_reads_every_page(tmp_path):
+    async def main():
+        store = EventStore(str(tmp_path / "events.db"))
+        async with RelaySimulator(verify=False, max_limit=10) as relay:
+            for event in make_events(30):
+                relay.accept_event(event)
+            result = await sync(relay, store, page_size=10)
+            return result, store.get_cursor(relay.url, QUERY)
+
+    (added, incomplete), cursor = run(main())
+    assert (added, incomplete) == (30, 0)
+    assert cursor == 1700000029
+
+
+def test_sync_keeps_cursor_after_incomplete_read(tmp_path):
+    async def main():
+        store = EventStore(str(tmp_path / "events.db"))
+        async with RelaySimulator(verify=False, max_limit=10) as relay:
+            for event in make_events(30):
+                relay.accept_event(event)
+            on_message = relay._on_message
+            stop_answering_after(relay, 1)
+            with pytest.raises(PaginationError):
+                await sync(relay, store, page_size=10)
+            kept = len(list(store.iter_events([1])))
+            cursor = store.get_cursor(relay.url, QUERY)
+            relay._on_message = on_message
+            second = await sync(relay, store, page_size=10)
+            return kept, cursor, second
+
+    kept, cursor, second = run(main())
+    assert kept == 10
+    assert cursor is None
+    assert second == (20, 0)
+
+
+def test_pager_raises_when_a_page_times_out():
+    async def main():
+        async with RelaySimulator(verify=False, max_limit=10) as relay:
+            for event in make_events(30):
+                relay.accept_event(event)
+            stop_answering_after(relay, 2)
+            received = []
+            async with RelayPool([relay.url], timeout=0.5) as pool:
+                with pytest.raises(PaginationError):
+                    async for event in stream_events_paginated(pool, QUERY, 10):
+                        received.append(event)
+            return len(received)
+
+    # Two pages arrived before the relay went quiet
+    assert 10 < run(main()) < 30
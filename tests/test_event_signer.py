@@ -0,0 +1,90 @@
+"""
+Event serialization and signing in modules/event_signer.py.
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.event_signer import (
+    compute_event_id,
+    get_public_key,
+    serialize_event,
+    sign_event,
+    sign_events,
+)
+from modules.event_verifier import verify_events
+
+# Private key 1, the key nak signs with when no --sec is given
+SECRET = "0000000000000000000000000000000000000000000000000000000000000001"
+
+TEMPLATE = {
+    "kind": 30041,
+    "created_at": 1700000000,
+    "tags": [["d", "chapter-1"], ["title", 'Über "Notes"']],
+    "content": "Line one\nLine two: café ☕",
+}
+
+# NIP-01 canonical form: no whitespace, non-ASCII as raw UTF-8, only the
+# JSON string escapes
+SERIALIZED = (
+    '[0,"79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798",'
+    '1700000000,30041,[["d","chapter-1"],["title","Über \\"Notes\\""]],'
+    '"Line one\\nLine two: café ☕"]'
+).encode("utf-8")
+
+# The template signed with RFC6979 nonces, printed in nak's field order
+SIGNED = (
+    '{"kind": 30041, '
+    '"id": "af134dfe4a5d51cbd972b184c6e541c63656a693959c09de69d59ae14d2f9f4d", '
+    '"pubkey": "79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798", '
+    '"created_at": 1700000000, '
+    '"tags": [["d", "chapter-1"], ["title", "Über \\"Notes\\""]], '
+    '"content": "Line one\\nLine two: café ☕", '
+    '"sig": "96ae15615a9c3ef68dd4fe61d614e555e88b805157d25cc8a2f71b219a1faf2b'
+    '13a373858e6714fe3ceae5442d4c002b8a2e6fd1c0974fff8d5456ba6fc795c1"}'
+)
+
+
+def test_public_key():
+    assert get_public_key(SECRET) == (
+        "79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798"
+    )
+
+
+def test_serialize_event():
+    event = dict(TEMPLATE, pubkey=get_public_key(SECRET))
+    assert serialize_event(event) == SERIALIZED
+
+
+def test_sign_event_byte_for_byte():
+    event = sign_event(TEMPLATE, SECRET)
+    assert json.dumps(event, ensure_ascii=False) == SIGNED
+    assert compute_event_id(event) == event["id"]
+
+
+def test_sign_events_matches_sign_event():
+    templates = [dict(TEMPLATE, content=f"event {i}") for i in range(8)]
+    serial = sign_events(templates, SECRET, workers=1)
+    parallel = sign_events(templates, SECRET, workers=2)
+    assert serial == parallel == [sign_event(t, SECRET) for t in templates]
+    assert all(result["valid"] for result in verify_events(parallel, workers=1))
+
+
+def test_shared_executor():
+    templates = [dict(TEMPLATE, content=f"event {i}") for i in range(8)]
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        signed = sign_events(templates, SECRET, workers=2, executor=pool)
+        results = verify_events(signed, workers=2, executor=pool)
+    assert signed == [sign_event(t, SECRET) for t in templates]
+    assert all(result["valid"] for result in results)
+
+
+def test_tampered_event_fails_verification():
+    event = sign_event(TEMPLATE, SECRET)
+    results = verify_events(
+        [dict(event, content="changed"), dict(event, sig="00" * 64)], workers=1
+    )
+    assert [result["error"] for result in results] == [
+        "id mismatch",
+        "invalid signature",
+    ]
@@ -0,0 +1,61 @@
+"""
+Ingesting kind 1987 events into modules/vector_index.py.
+"""
+
+import base64
+import contextlib
+import io
+
+import numpy as np
+
+from modules.vector_codec import encode_vector
+from modules.vector_index import VectorIndex
+
+
+def embedding_event(event_id, content, tags=(), model="test-model"):
+    return {
+        "id": event_id,
+        "kind": 1987,
+        "created_at": 1700000000,
+        "content": content,
+        "tags": [["e", "00" * 32], ["model", model]] + list(tags),
+    }
+
+
+def vector_event(event_id, values, model="test-model"):
+    content, tags = encode_vector(values)
+    return embedding_event(event_id, content, tags, model)
+
+
+def add(index, events):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return index.add_events(events)
+
+
+def test_undecodable_events_are_skipped(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    junk_float32 = base64.b64encode(b"").decode()
+    events = [
+        embedding_event("a" * 64, "not,a,vector", model="junk-model"),
+        embedding_event("b" * 64, junk_float32, [["encoding", "float32"]]),
+        embedding_event("c" * 64, "!!!", [["encoding", "float16"]]),
+        vector_event("d" * 64, [1.0, 0.0, 0.0]),
+        vector_event("e" * 64, [0.0, 1.0, 0.0]),
+    ]
+    assert add(index, events) == 2
+    assert index.model == "test-model"
+    assert index.meta["dimensions"] == 3
+    assert [record["id"] for record in index.records()] == ["d" * 64, "e" * 64]
+
+
+def test_mismatched_events_are_skipped(tmp_path):
+    index = VectorIndex(str(tmp_path))
+    assert add(index, [vector_event("a" * 64, [1.0, 2.0])]) == 1
+    events = [
+        vector_event("b" * 64, [1.0, 2.0, 3.0]),
+        vector_event("c" * 64, [1.0, 2.0], model="other-model"),
+        vector_event("d" * 64, [np.inf, 1.0]),
+        vector_event("e" * 64, [2.0, 1.0]),
+    ]
+    assert add(index, events) == 1
+    assert index.count == 2